@@ -1,4 +1,6 @@
 from .ping import router as health_router
 from .auth import router as auth_router
 from .amount import router as amount_router
-__all__ = ["health_router", "auth_router", "amount_router"]
\ No newline at end of file
+from .metrics import router as metrics_router
+from .admin import router as admin_router
+__all__ = ["health_router", "auth_router", "amount_router", "metrics_router", "admin_router"]
\ No newline at end of file
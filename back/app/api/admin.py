@@ -0,0 +1,76 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.pool import pool_status
+from app.core.query_log import query_stats
+from app.core.session import engines
+from app.schemas.admin import PoolStatusResponse, QueryStatsResponse
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+logger = get_logger(__name__)
+
+
+async def verify_internal_token(
+    internal_token: str | None = Header(default=None, alias="X-Internal-Token"),
+):
+    """
+    Служебные эндпоинты доступны только по внутреннему сервисному токену.
+    """
+    if not (settings.SERVICE_API_TOKEN and internal_token == settings.SERVICE_API_TOKEN):
+        logger.warning("Admin endpoint access denied")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Forbidden",
+        )
+
+
+@router.get(
+    "/queries",
+    response_model=QueryStatsResponse,
+    summary="Статистика SQL запросов",
+    dependencies=[Depends(verify_internal_token)],
+)
+async def get_query_stats(
+    limit: int = Query(50, ge=1, le=1000),
+    sort: Literal["total", "mean", "max", "calls"] = Query("total"),
+):
+    """
+    Агрегированная статистика по нормализованным SQL запросам обоих движков:
+    число вызовов, суммарное/среднее/максимальное время, медленные вызовы,
+    методы репозиториев и последний план EXPLAIN.
+    """
+    return QueryStatsResponse(
+        slow_query_ms=settings.SLOW_QUERY_MS,
+        untracked_calls=query_stats.untracked_calls,
+        queries=query_stats.snapshot(limit=limit, sort=sort),
+    )
+
+
+@router.delete(
+    "/queries",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Сбросить статистику SQL запросов",
+    dependencies=[Depends(verify_internal_token)],
+)
+async def reset_query_stats():
+    query_stats.reset()
+
+
+@router.get(
+    "/pools",
+    response_model=PoolStatusResponse,
+    summary="Состояние пулов соединений",
+    dependencies=[Depends(verify_internal_token)],
+)
+async def get_pool_status():
+    """
+    Занятые/свободные соединения, переполнение, среднее ожидание
+    соединения и результат последней проверки живости для всех движков,
+    включая реплики.
+    """
+    return PoolStatusResponse(
+        pools=[pool_status(value, name) for name, value in engines.items()],
+    )
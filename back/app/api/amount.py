@@ -10,9 +10,8 @@ from fastapi import (
     Security,
 )
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.session import get_mock_session
+from app.core.session import LazySession, get_mock_session, set_session_user
 from app.core.logger import get_logger
 from app.repo.amount import AmountRepository
 from app.services.amount import AmountService
@@ -59,20 +58,24 @@ async def verify_token(
     token = credentials.credentials
 
     try:
-        SecurityManager.decode_access_token(token)
+        payload = SecurityManager.decode_access_token(token)
         logger.debug("Token verified successfully")
     except Exception as e:
-        logger.warning(f"Token verification failed: Invalid token - {e}")
+        logger.warning("Token verification failed: Invalid token - %s", e)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="JWT NOT FOUND",
         )
 
+    # Чтения этого пользователя сразу после его записи пойдут на primary
+    sub = payload.get("sub")
+    set_session_user(str(sub) if sub is not None else None)
+
 
 # ---------- Зависимость: AmountService ----------
 
 async def get_amount_service(
-    session: AsyncSession = Depends(get_mock_session),
+    session: LazySession = Depends(get_mock_session, scope="function"),
 ) -> AmountService:
     """
     Создаёт экземпляр AmountService с репозиторием.
@@ -7,9 +7,8 @@ from fastapi import (
     Header,
     status,
 )
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.session import get_session
+from app.core.session import LazySession, get_session, set_session_user
 from app.core.logger import get_logger
 from app.repo.user import UsersRepository
 from app.services.users import UsersService
@@ -27,7 +26,7 @@ logger = get_logger(__name__)
 # ---------- Зависимость: UsersService ----------
 
 async def get_users_service(
-    session: AsyncSession = Depends(get_session),
+    session: LazySession = Depends(get_session, scope="function"),
 ) -> UsersService:
     repo = UsersRepository(session)
     return UsersService(repo)
@@ -75,18 +74,21 @@ async def get_current_user(
             )
         user_id = int(sub)
     except Exception as e:
-        logger.warning(f"Authentication failed: Invalid JWT token - {e}")
+        logger.warning("Authentication failed: Invalid JWT token - %s", e)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="JWT not found",
         )
 
+    # Чтения этого пользователя сразу после его записи пойдут на primary
+    set_session_user(str(user_id))
+
     try:
         user = await users_service.get_user_by_id(user_id)
-        logger.debug(f"User authenticated successfully: user_id={user_id}")
+        logger.debug("User authenticated successfully: user_id=%s", user_id)
         return user
     except UserNotFoundError:
-        logger.warning(f"Authentication failed: User not found - user_id={user_id}")
+        logger.warning("Authentication failed: User not found - user_id=%s", user_id)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="JWT not found",
@@ -121,13 +123,13 @@ async def login(
     404: "NOT FOUND"
     401: "wrong login or password"
     """
-    logger.info(f"Login attempt for user: {credentials.login}")
+    logger.info("Login attempt for user: %s", credentials.login)
     
     # Сначала проверяем, что пользователь с таким логином существует
     try:
         await users_service.get_user_by_login(credentials.login)
     except UserNotFoundError:
-        logger.warning(f"Login failed: User not found - login={credentials.login}")
+        logger.warning("Login failed: User not found - login=%s", credentials.login)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="NOT FOUND",
@@ -139,16 +141,16 @@ async def login(
             login=credentials.login,
             password=credentials.password,
         )
-        logger.info(f"User authenticated successfully: user_id={user.id}, login={credentials.login}")
+        logger.info("User authenticated successfully: user_id=%s, login=%s", user.id, credentials.login)
     except InvalidCredentialsError:
-        logger.warning(f"Login failed: Invalid credentials - login={credentials.login}")
+        logger.warning("Login failed: Invalid credentials - login=%s", credentials.login)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="wrong login or password",
         )
 
     token = SecurityManager.create_access_token(subject=str(user.id))
-    logger.debug(f"Access token created for user_id={user.id}")
+    logger.debug("Access token created for user_id=%s", user.id)
     return TokenResponse(token=token)
 
 
@@ -174,7 +176,7 @@ async def get_me(
 
     403: "JWT not found"
     """
-    logger.debug(f"User info requested: user_id={user.id}, login={user.login}")
+    logger.debug("User info requested: user_id=%s, login=%s", user.id, user.login)
     return UserInfoResponse(
         username=user.username,
         login=user.login,
@@ -199,5 +201,5 @@ async def logout(
 
     Здесь просто «забываем» JWT на стороне клиента.
     """
-    logger.info(f"User logged out: user_id={user.id}, login={user.login}")
+    logger.info("User logged out: user_id=%s, login=%s", user.id, user.login)
     return {}
@@ -24,6 +24,65 @@ class Settings(BaseSettings):
     MOCK_POSTGRES_DB: str
     SERVICE_API_TOKEN: str | None = None
 
+    # Пулы соединений (одинаковые для основной и mock БД).
+    # Вместо pre-ping на каждую выдачу соединения — pool_recycle и фоновая
+    # проверка живости раз в DB_POOL_LIVENESS_INTERVAL секунд (0 — выключена).
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_LIVENESS_INTERVAL: float = 30.0
+    # Кэш подготовленных выражений asyncpg на каждое соединение (0 — выключен)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 256
+
+    # Реплики для чтения (необязательно). Чтения идут на реплику, записи и
+    # чтения пользователя в течение READ_YOUR_WRITES_SECONDS после его
+    # записи — на primary (окно переносится между воркерами в cookie rw_until).
+    REPLICA_ASYNC_DATABASE_URL: str | None = None
+    MOCK_REPLICA_ASYNC_DATABASE_URL: str | None = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Сколько shutdown lifespan ждёт запросы, не завершившиеся за
+    # --timeout-graceful-shutdown uvicorn (их задачи уже отменены)
+    SHUTDOWN_DRAIN_TIMEOUT: float = 5.0
+
+    # Монитор задержки event loop: пульс раз в LOOP_MONITOR_INTERVAL секунд,
+    # при блокировке дольше LOOP_LAG_THRESHOLD_MS в лог пишется стек
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_MONITOR_INTERVAL: float = 0.25
+    LOOP_LAG_THRESHOLD_MS: float = 100.0
+
+    # Сброс нагрузки: при превышении любого порога (0 — порог выключен)
+    # новые запросы сразу получают 503 с Retry-After. Пути из
+    # LOAD_SHED_PRIORITY_PATHS (префиксы через запятую) не отклоняются.
+    # Порог задержки loop работает при LOOP_MONITOR_ENABLED.
+    LOAD_SHED_ENABLED: bool = True
+    LOAD_SHED_MAX_IN_FLIGHT: int = 256
+    LOAD_SHED_MAX_LOOP_LAG_MS: float = 200.0
+    LOAD_SHED_MAX_POOL_WAIT_MS: float = 1000.0
+    LOAD_SHED_MAX_POOL_WAITERS: int = 50
+    LOAD_SHED_RETRY_AFTER: int = 2
+    LOAD_SHED_PRIORITY_PATHS: str = "/api/auth,/ping,/metrics,/api/admin"
+
+    # Профилирование отдельных запросов (см. app.core.profiling): по заголовку
+    # X-Profile: <SERVICE_API_TOKEN> или доле PROFILING_SAMPLE_RATE запросов
+    PROFILING_ENABLED: bool = False
+    PROFILING_DIR: str = "logs/profiles"
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_SAMPLE_RATE: float = 0.0
+
+    # Трассировка: none | console | file (JSON Lines в TRACING_FILE)
+    TRACING_EXPORTER: str = "none"
+    TRACING_FILE: str = "logs/traces.jsonl"
+    TRACING_SERVICE_NAME: str = "backend"
+
+    # Журнал медленных запросов: порог, доля EXPLAIN (ANALYZE, BUFFERS)
+    # для медленных SELECT и лимит числа различных запросов в статистике
+    SLOW_QUERY_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN_RATE: float = 0.0
+    QUERY_STATS_MAX_ENTRIES: int = 1000
+
     @property
     def ASYNC_DATABASE_URL_computed(self) -> str:
         """Вычисляемый URL для основной БД, использует имя сервиса 'db' в Docker"""
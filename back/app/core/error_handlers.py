@@ -214,8 +214,9 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException)
         JSON ответ с ошибкой
     """
     logger.warning(
-        f"HTTP exception: {exc.status_code} - {exc.detail} - "
-        f"Path: {request.url.path} - Method: {request.method}"
+        "HTTP exception: %s - %s - "
+        "Path: %s - Method: %s",
+        exc.status_code, exc.detail, request.url.path, request.method
     )
     
     formatted_error = format_http_error(exc, request)
@@ -240,8 +241,9 @@ async def validation_exception_handler(
         JSON ответ с ошибкой валидации
     """
     logger.warning(
-        f"Validation error: {exc.errors()} - "
-        f"Path: {request.url.path} - Method: {request.method}"
+        "Validation error: %s - "
+        "Path: %s - Method: %s",
+        exc.errors(), request.url.path, request.method
     )
     
     formatted_error = format_validation_error(exc.errors())
@@ -264,8 +266,9 @@ async def general_exception_handler(request: Request, exc: Exception) -> JSONRes
         JSON ответ с ошибкой
     """
     logger.error(
-        f"Unhandled exception: {type(exc).__name__} - {str(exc)} - "
-        f"Path: {request.url.path} - Method: {request.method}",
+        "Unhandled exception: %s - %s - "
+        "Path: %s - Method: %s",
+        type(exc).__name__, exc, request.url.path, request.method,
         exc_info=True,
     )
     
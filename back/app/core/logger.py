@@ -1,35 +1,112 @@
 """
 Модуль для настройки логирования приложения.
+
+Обработчики, которые пишут в stdout и в файл, работают в отдельном потоке
+(QueueListener). В потоке event loop остаётся только QueueHandler, который
+кладёт запись в ограниченную очередь и никогда не блокируется на I/O.
 """
+import atexit
 import logging
+import queue
+import random
 import sys
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Optional
 
 from app.core.config import settings
 
 
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler с ограниченной очередью.
+
+    Если фоновый поток не успевает писать логи и очередь переполнена,
+    запись отбрасывается, а не блокирует вызывающий код. Количество
+    отброшенных записей доступно в ``dropped``.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Очередь внутрипроцессная, сериализовать запись не нужно:
+        # %-форматирование сообщения выполняется уже в фоновом потоке.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BoundedQueueListener(QueueListener):
+    """
+    QueueListener для ограниченной очереди.
+
+    Стандартный stop() кладёт сентинел через put_nowait и на полной очереди
+    падает с queue.Full, не дождавшись потока. Здесь сентинел ждёт места до
+    SENTINEL_TIMEOUT секунд, пока поток разбирает очередь, а если поток не
+    успевает — вытесняет самую старую запись.
+    """
+
+    SENTINEL_TIMEOUT = 5.0
+
+    def enqueue_sentinel(self) -> None:
+        try:
+            self.queue.put(self._sentinel, timeout=self.SENTINEL_TIMEOUT)
+            return
+        except queue.Full:
+            pass
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        sys.stderr.write("logging: queue still full at shutdown, dropped a record\n")
+        self.queue.put_nowait(self._sentinel)
+
+
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler, который создаёт директорию и открывает файл только
+    при первой записи — то есть уже в потоке QueueListener, а не при импорте.
+    """
+
+    def __init__(self, filename: Path, **kwargs) -> None:
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[BoundedQueueListener] = None
+
+
 def setup_logging(
     log_level: str = "INFO",
     log_file: Optional[str] = None,
     log_dir: str = "logs",
+    queue_size: int = 10000,
 ) -> None:
     """
     Настраивает логирование для приложения.
-    
+
     Args:
         log_level: Уровень логирования (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Имя файла для логов (если None, логи только в консоль)
-        log_dir: Директория для логов
+        log_dir: Директория для логов (создаётся при первой записи в файл)
+        queue_size: Размер очереди записей; при переполнении записи отбрасываются
     """
-    # Создаём директорию для логов, если указан файл
-    if log_file:
-        log_path = Path(log_dir)
-        log_path.mkdir(exist_ok=True)
-        log_file_path = log_path / log_file
-    else:
-        log_file_path = None
+    global _queue_handler, _listener
+
+    # Повторный вызов перенастраивает логирование с нуля
+    shutdown_logging()
+
+    level = getattr(logging, log_level.upper())
 
     # Формат логов
     log_format = (
@@ -38,33 +115,36 @@ def setup_logging(
     )
     date_format = "%Y-%m-%d %H:%M:%S"
 
-    # Настройка корневого логгера
-    root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, log_level.upper()))
-
-    # Удаляем существующие обработчики
-    root_logger.handlers.clear()
-
     # Форматтер
     formatter = logging.Formatter(log_format, date_format)
 
     # Консольный обработчик
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(getattr(logging, log_level.upper()))
+    console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers: list[logging.Handler] = [console_handler]
 
-    # Файловый обработчик (с ротацией)
-    if log_file_path:
-        file_handler = RotatingFileHandler(
-            log_file_path,
+    # Файловый обработчик (с ротацией, ротация происходит в фоновом потоке)
+    if log_file:
+        file_handler = LazyRotatingFileHandler(
+            Path(log_dir) / log_file,
             maxBytes=10 * 1024 * 1024,  # 10 MB
             backupCount=5,
             encoding="utf-8",
         )
-        file_handler.setLevel(getattr(logging, log_level.upper()))
+        file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    # Настройка корневого логгера: в нём остаётся только QueueHandler
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _listener = BoundedQueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.handlers.clear()
+    root_logger.addHandler(_queue_handler)
+    _listener.start()
 
     # Настройка уровней для внешних библиотек
     logging.getLogger("uvicorn").setLevel(logging.INFO)
@@ -73,25 +153,160 @@ def setup_logging(
     logging.getLogger("asyncpg").setLevel(logging.WARNING)
 
 
-def get_logger(name: str) -> logging.Logger:
+def shutdown_logging() -> None:
+    """
+    Останавливает фоновый поток логирования, дописав всё, что осталось в очереди.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    if _queue_handler is not None and _queue_handler.dropped:
+        sys.stderr.write(f"logging: dropped {_queue_handler.dropped} records due to full queue\n")
+
+
+def get_dropped_records() -> int:
+    """
+    Количество записей, отброшенных из-за переполнения очереди логов.
+    """
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+class SampledLogger:
+    """
+    Обёртка над logging.Logger с ленивым форматированием и сэмплированием.
+
+    - Сообщение форматируется только если запись реально будет записана,
+      поэтому аргументы передаются %-стилем: ``logger.info("id=%s", user_id)``.
+    - Записи ниже WARNING пропускаются с вероятностью ``1 - sample_rate``.
+    - WARNING и выше пишутся всегда; отдельную запись можно пометить
+      ``always=True`` (например, медленный запрос), чтобы миновать сэмплирование.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = 1.0) -> None:
+        self.logger = logger
+        self.sample_rate = sample_rate
+
+    def sample(self) -> bool:
+        """
+        Бросает монетку с вероятностью sample_rate. Нужна, когда решение
+        «логировать или нет» должно быть общим для нескольких записей.
+        """
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def debug(self, msg, *args, **kwargs) -> None:
+        self._log(logging.DEBUG, msg, args, **kwargs)
+
+    def info(self, msg, *args, **kwargs) -> None:
+        self._log(logging.INFO, msg, args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs) -> None:
+        self._log(logging.WARNING, msg, args, **kwargs)
+
+    def error(self, msg, *args, **kwargs) -> None:
+        self._log(logging.ERROR, msg, args, **kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs) -> None:
+        self._log(logging.ERROR, msg, args, exc_info=exc_info, **kwargs)
+
+    def critical(self, msg, *args, **kwargs) -> None:
+        self._log(logging.CRITICAL, msg, args, **kwargs)
+
+    def _log(self, level: int, msg, args, always: bool = False, stacklevel: int = 1, **kwargs) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if (
+            level < logging.WARNING
+            and not always
+            and self.sample_rate < 1.0
+            and random.random() >= self.sample_rate
+        ):
+            return
+        # +2: пропускаем кадры info()/_log(), чтобы filename:lineno указывали на вызывающий код
+        self.logger._log(level, msg, args, stacklevel=stacklevel + 2, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.logger, name)
+
+
+_sample_rates: dict[str, float] = {}
+
+
+def set_sample_rates(rates: dict[str, float]) -> None:
+    """
+    Задаёт доли записываемых записей по префиксу имени логгера,
+    например ``{"app.core.middleware": 0.01}``.
+    Действует на логгеры, полученные через get_logger после вызова.
+    """
+    _sample_rates.clear()
+    _sample_rates.update(rates)
+
+
+def parse_sample_rates(raw: str) -> dict[str, float]:
+    """
+    Разбирает строку вида ``"app.core.middleware=0.01,app.services=0.1"``.
+    """
+    rates = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        name, rate = item.split("=", 1)
+        try:
+            value = float(rate)
+        except ValueError:
+            # Разбирается при импорте: опечатка в настройке не должна ронять сервис
+            sys.stderr.write(f"logging: ignoring LOG_SAMPLE_RATES entry {item.strip()!r}\n")
+            continue
+        rates[name.strip()] = min(max(value, 0.0), 1.0)
+    return rates
+
+
+def _sample_rate_for(name: str) -> float:
+    # Самый длинный совпавший префикс побеждает
+    best, rate = -1, 1.0
+    for prefix, prefix_rate in _sample_rates.items():
+        if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+            best, rate = len(prefix), prefix_rate
+    return rate
+
+
+def get_logger(name: str, sample_rate: Optional[float] = None) -> SampledLogger:
     """
     Получить логгер с указанным именем.
-    
+
     Args:
         name: Имя логгера (обычно __name__)
-        
+        sample_rate: Доля записываемых записей ниже WARNING (по умолчанию
+            берётся из LOG_SAMPLE_RATES, иначе 1.0)
+
     Returns:
         Настроенный логгер
     """
-    return logging.getLogger(name)
+    if sample_rate is None:
+        sample_rate = _sample_rate_for(name)
+    return SampledLogger(logging.getLogger(name), sample_rate)
 
 
-# Инициализация логирования при импорте модуля
+# Инициализация логирования при импорте модуля.
+# Файловую систему здесь не трогаем: файл и директория создаются
+# фоновым потоком при первой записи.
 # Можно переопределить через переменные окружения
 import os
 log_level = os.getenv("LOG_LEVEL", "INFO")
 log_file = os.getenv("LOG_FILE", "app.log")
 log_dir = os.getenv("LOG_DIR", "logs")
+log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Доли записываемых INFO/DEBUG логов по логгерам, например
+# LOG_SAMPLE_RATES="app.core.middleware=0.01,app.services.amount=0.1"
+set_sample_rates(parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")))
+# Запросы дольше этого порога логируются всегда, независимо от сэмплирования
+slow_request_threshold = float(os.getenv("LOG_SLOW_REQUEST_MS", "1000")) / 1000
 
-setup_logging(log_level=log_level, log_file=log_file, log_dir=log_dir)
-
+setup_logging(log_level=log_level, log_file=log_file, log_dir=log_dir, queue_size=log_queue_size)
+atexit.register(shutdown_logging)
@@ -0,0 +1,429 @@
+"""
+Минимальный реестр метрик в формате Prometheus (text exposition 0.0.4).
+
+Метрики обновляются только из потока event loop, поэтому обходимся без
+блокировок: обновление — это пара операций со словарём и списком.
+Для тестов и отладки Prometheus не нужен — достаточно вызвать
+``REGISTRY.render()``.
+"""
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.logger import get_dropped_records
+
+# Границы бакетов по умолчанию (секунды): от 5 мс до 2 минут — покрывают
+# и быстрые запросы к БД, и долгие генерации LLM.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение счётчика, который ведётся вне реестра, читается при каждом чтении метрики."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение будет вычисляться при каждом чтении метрики."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # Последний элемент — бакет +Inf; хранятся некумулятивные счётчики
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: Optional["Registry"] = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self.labels()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Возвращает дочернюю метрику для набора значений меток (кэшируется)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+            for values, child in self._children.items()
+        ]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+            for values, child in self._children.items()
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["Registry"] = None) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Набор метрик, которые отдаются на /metrics."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ---------- HTTP ----------
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed",
+)
+
+load_shed_requests = Counter(
+    "load_shed_requests_total",
+    "Requests rejected with 503 by load shedding (reason=in_flight|loop_lag|pool_wait)",
+    ("reason",),
+)
+shutdown_drain_duration = Histogram(
+    "shutdown_drain_duration_seconds",
+    "Time from the shutdown signal until in-flight requests finished (outcome=drained|timeout)",
+    ("outcome",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+shutdown_requests = Counter(
+    "shutdown_requests_total",
+    "Requests affected by shutdown (result=rejected|aborted)",
+    ("result",),
+)
+
+
+
+# ---------- Event loop ----------
+
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between the scheduled and actual wake-up of the loop monitor heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+event_loop_stalls = Counter(
+    "event_loop_stalls_total",
+    "Heartbeats whose lag exceeded the loop monitor threshold",
+)
+
+# ---------- Пулы соединений SQLAlchemy ----------
+
+db_pool_checkouts = Counter(
+    "db_pool_checkouts_total",
+    "Connections checked out from the pool",
+    ("engine",),
+)
+db_pool_checkout_failures = Counter(
+    "db_pool_checkout_failures_total",
+    "Checkouts that failed to get a connection by reason (timeout|error)",
+    ("engine", "reason"),
+)
+db_pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection (including connect on overflow)",
+    ("engine",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out",
+    ("engine",),
+)
+db_pool_overflow = Gauge(
+    "db_pool_overflow",
+    "Connections opened above pool_size (negative while the pool is not yet filled)",
+    ("engine",),
+)
+db_pool_size = Gauge(
+    "db_pool_size",
+    "Configured pool_size",
+    ("engine",),
+)
+db_pool_waiting = Gauge(
+    "db_pool_waiting",
+    "Checkouts currently waiting for a pooled connection",
+    ("engine",),
+)
+
+# Сглаженное (EWMA) время ожидания соединения по движкам: сигнал перегрузки
+# БД для LoadShedMiddleware, в отличие от гистограммы — только недавнее
+pool_recent_wait: Dict[str, float] = {}
+POOL_WAIT_EWMA_ALPHA = 0.2
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который считает выдачи соединений, время ожидания
+    и число ожидающих прямо сейчас.
+
+    Время ожидания и его EWMA записываются только для успешных выдач:
+    таймауты пула и ошибки подключения считаются в
+    db_pool_checkout_failures.
+
+    Метка ``engine`` берётся из ``pool_logging_name`` движка — она
+    сохраняется при пересоздании пула (engine.dispose()).
+    """
+
+    def _do_get(self):
+        name = self._orig_logging_name or "default"
+        waiting = db_pool_waiting.labels(name)
+        waiting.inc()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception as e:
+            reason = "timeout" if isinstance(e, exc.TimeoutError) else "error"
+            db_pool_checkout_failures.labels(name, reason).inc()
+            raise
+        finally:
+            waiting.dec()
+        elapsed = time.perf_counter() - start
+        db_pool_wait.labels(name).observe(elapsed)
+        db_pool_checkouts.labels(name).inc()
+        previous = pool_recent_wait.get(name, elapsed)
+        pool_recent_wait[name] = previous + POOL_WAIT_EWMA_ALPHA * (elapsed - previous)
+        return connection
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """
+    Регистрирует метрики текущего состояния пула движка.
+    Значения читаются при каждом запросе /metrics.
+    """
+    sync_engine = engine.sync_engine
+    db_pool_checked_out.labels(name).set_function(lambda: sync_engine.pool.checkedout())
+    db_pool_overflow.labels(name).set_function(lambda: sync_engine.pool.overflow())
+    db_pool_size.labels(name).set_function(lambda: sync_engine.pool.size())
+
+
+# ---------- Ollama ----------
+
+ollama_request_duration = Histogram(
+    "ollama_request_duration_seconds",
+    "Ollama request latency by pipeline stage",
+    ("stage",),
+)
+ollama_tokens = Counter(
+    "ollama_tokens_total",
+    "Tokens processed by Ollama (kind=prompt|completion)",
+    ("stage", "kind"),
+)
+
+
+def observe_ollama(stage: str, seconds: float, response: Optional[dict] = None) -> None:
+    """
+    Записывает длительность вызова Ollama и количество токенов из ответа
+    (поля prompt_eval_count / eval_count финального чанка).
+    """
+    ollama_request_duration.labels(stage).observe(seconds)
+    if response:
+        ollama_tokens.labels(stage, "prompt").inc(response.get("prompt_eval_count") or 0)
+        ollama_tokens.labels(stage, "completion").inc(response.get("eval_count") or 0)
+
+
+# ---------- Кэши ----------
+
+cache_requests = Counter(
+    "cache_requests_total",
+    "Cache lookups by result (hit|miss)",
+    ("cache", "result"),
+)
+cache_hit_ratio = Gauge(
+    "cache_hit_ratio",
+    "Share of cache lookups that were hits since start",
+    ("cache",),
+)
+
+
+coalesced_requests = Counter(
+    "coalesced_requests_total",
+    "Requests that joined an identical in-flight call instead of running their own",
+    ("flight",),
+)
+
+
+_cache_names: set = set()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Учитывает обращение к кэшу; при первом обращении регистрирует hit ratio."""
+    result = "hit" if hit else "miss"
+    if cache not in _cache_names:
+        _cache_names.add(cache)
+        hits = cache_requests.labels(cache, "hit")
+        misses = cache_requests.labels(cache, "miss")
+        cache_hit_ratio.labels(cache).set_function(
+            lambda: hits.value / (hits.value + misses.value) if hits.value + misses.value else 0.0
+        )
+    cache_requests.labels(cache, result).inc()
+
+
+# ---------- Логирование ----------
+
+# Счётчик ведёт DroppingQueueHandler (из любого потока), здесь он только читается
+log_records_dropped = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+)
+log_records_dropped.set_function(get_dropped_records)
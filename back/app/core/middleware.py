@@ -1,65 +1,264 @@
 """
-Middleware для логирования HTTP запросов.
+Middleware для логирования, трассировки, метрик HTTP запросов и сброса нагрузки.
 """
-import time
+import json
 import logging
-from typing import Callable
+import time
+from typing import Optional
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app.core.logger import get_logger
+from app.core.config import settings
+from app.core.logger import get_logger, slow_request_threshold
+from app.core.loop_monitor import current_lag
+from app.core.metrics import (
+    db_pool_waiting,
+    http_request_duration,
+    http_requests_in_flight,
+    load_shed_requests,
+    pool_recent_wait,
+)
+from app.core.shutdown import drain_state
+from app.core.tracing import SERVER, current_trace_id, start_span, tracing_enabled
 
 logger = get_logger(__name__)
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+class LoggingMiddleware:
     """
     Middleware для логирования всех HTTP запросов и ответов.
+
+    Реализован как «чистый» ASGI middleware: не оборачивает запрос в отдельную
+    задачу и не буферизует тело ответа, поэтому не ломает StreamingResponse.
+    Время ответа, time-to-first-byte и количество отданных байт считаются
+    через перехват сообщений в ``send``.
+
+    Успешные GET-запросы логируются с долей из LOG_SAMPLE_RATES для этого
+    логгера; ошибки, медленные и изменяющие запросы — всегда. Если включена
+    трассировка, в запись о завершении попадает trace id.
     """
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """
-        Обрабатывает запрос и логирует информацию о нём.
-        """
-        start_time = time.time()
-
-        # Логируем входящий запрос
-        client_ip = request.client.host if request.client else "unknown"
-        method = request.method
-        path = request.url.path
-        query_params = str(request.query_params) if request.query_params else ""
-
-        logger.info(
-            f"Request started: {method} {path}"
-            + (f"?{query_params}" if query_params else "")
-            + f" from {client_ip}"
-        )
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-        # Обрабатываем запрос
-        try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-            # Логируем успешный ответ
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        # Решение о сэмплировании общее для записей о начале и конце запроса
+        sampled = method != "GET" or logger.sample()
+
+        if sampled and logger.isEnabledFor(logging.INFO):
+            query_string = scope.get("query_string", b"")
+            client = scope.get("client")
             logger.info(
-                f"Request completed: {method} {path} - "
-                f"Status: {response.status_code} - "
-                f"Time: {process_time:.3f}s"
+                "Request started: %s %s%s from %s",
+                method,
+                path,
+                "?" + query_string.decode("latin-1") if query_string else "",
+                client[0] if client else "unknown",
+                always=True,
             )
 
-            return response
+        status_code = 500
+        first_byte_time = None
+        bytes_sent = 0
 
-        except Exception as e:
-            process_time = time.time() - start_time
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, first_byte_time, bytes_sent
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                status_code = message["status"]
+            elif message_type == "http.response.body":
+                if first_byte_time is None:
+                    first_byte_time = time.perf_counter()
+                bytes_sent += len(message.get("body", b""))
+            await send(message)
 
-            # Логируем ошибку
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
             logger.error(
-                f"Request failed: {method} {path} - "
-                f"Error: {str(e)} - "
-                f"Time: {process_time:.3f}s",
+                "Request failed: %s %s - Error: %s - Time: %.3fs",
+                method,
+                path,
+                e,
+                time.perf_counter() - start_time,
                 exc_info=True,
             )
             raise
 
+        end_time = time.perf_counter()
+        process_time = end_time - start_time
+        if sampled or status_code >= 400 or process_time >= slow_request_threshold:
+            logger.info(
+                "Request completed: %s %s - Status: %d - Time: %.3fs - TTFB: %.3fs - Bytes: %d - Trace: %s",
+                method,
+                path,
+                status_code,
+                process_time,
+                (first_byte_time or end_time) - start_time,
+                bytes_sent,
+                current_trace_id() or "-",
+                always=True,
+            )
+
+
+class TracingMiddleware:
+    """
+    Открывает серверный спан на каждый HTTP запрос.
+
+    Если запрос пришёл с заголовком ``traceparent`` (например, из сервиса
+    solution), спан продолжает трассу вызывающей стороны. Спан остаётся
+    текущим до конца обработки, в том числе для спанов запросов к БД,
+    и закрывается после отправки последнего чанка ответа.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracing_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        method = scope["method"]
+        with start_span(
+            method,
+            kind=SERVER,
+            traceparent=traceparent,
+            **{"http.method": method, "http.target": scope["path"]},
+        ) as span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Имя спана — шаблон маршрута, он известен только после роутинга
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None:
+                    span.name = f"{method} {route}"
+                    span.set_attribute("http.route", route)
+
+
+class MetricsMiddleware:
+    """
+    Middleware для метрик HTTP: латентность по шаблону маршрута
+    (``/api/amount/history``, а не конкретный URL) и число запросов в обработке.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # Роутер FastAPI кладёт найденный маршрут в scope
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            http_request_duration.labels(scope["method"], route, str(status_code)).observe(
+                time.perf_counter() - start_time
+            )
+
+
+class LoadShedMiddleware:
+    """
+    Сброс нагрузки. Пока сервис перегружен, новые запросы сразу получают
+    503 с Retry-After, а не ждут в очереди до таймаута. Признаки перегрузки:
+
+    - запросов в обработке больше LOAD_SHED_MAX_IN_FLIGHT;
+    - сглаженная задержка event loop выше LOAD_SHED_MAX_LOOP_LAG_MS;
+    - к пулу БД стоит очередь, и она длиннее LOAD_SHED_MAX_POOL_WAITERS
+      или соединения недавно ждали дольше LOAD_SHED_MAX_POOL_WAIT_MS.
+
+    Пути из LOAD_SHED_PRIORITY_PATHS (авторизация, health, метрики)
+    обслуживаются всегда.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.priority_paths = tuple(
+            path.strip() for path in settings.LOAD_SHED_PRIORITY_PATHS.split(",") if path.strip()
+        )
+        self.max_in_flight = settings.LOAD_SHED_MAX_IN_FLIGHT
+        self.max_loop_lag = settings.LOAD_SHED_MAX_LOOP_LAG_MS / 1000
+        self.max_pool_wait = settings.LOAD_SHED_MAX_POOL_WAIT_MS / 1000
+        self.max_pool_waiters = settings.LOAD_SHED_MAX_POOL_WAITERS
+        self.shedding: Optional[str] = None
+        self.headers = [
+            (b"content-type", b"application/json"),
+            (b"retry-after", str(settings.LOAD_SHED_RETRY_AFTER).encode()),
+        ]
+        self.body = json.dumps({
+            "error": "Сервис недоступен",
+            "message": "Сервис перегружен, повторите запрос позже",
+            "status_code": 503,
+        }, ensure_ascii=False).encode()
+
+    def overload_reason(self) -> Optional[str]:
+        if self.max_in_flight and drain_state.in_flight > self.max_in_flight:
+            return "in_flight"
+        if self.max_loop_lag and current_lag() > self.max_loop_lag:
+            return "loop_lag"
+        for name, recent_wait in pool_recent_wait.items():
+            waiters = db_pool_waiting.labels(name).value
+            if waiters <= 0:
+                continue
+            if (self.max_pool_waiters and waiters > self.max_pool_waiters) or (
+                self.max_pool_wait and recent_wait > self.max_pool_wait
+            ):
+                return "pool_wait"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.priority_paths):
+            await self.app(scope, receive, send)
+            return
+
+        reason = self.overload_reason()
+        if reason is None:
+            if self.shedding is not None:
+                logger.info("Load shedding stopped (%s)", self.shedding)
+                self.shedding = None
+            await self.app(scope, receive, send)
+            return
+
+        load_shed_requests.labels(reason).inc()
+        # В лог — только начало сброса, отказы считаются в метрике
+        if self.shedding != reason:
+            logger.warning("Load shedding started (%s): in_flight=%s loop_lag=%.0fms",
+                           reason, drain_state.in_flight, current_lag() * 1000)
+            self.shedding = reason
+        await send({"type": "http.response.start", "status": 503, "headers": self.headers})
+        await send({"type": "http.response.body", "body": self.body})
@@ -0,0 +1,83 @@
+"""
+Фоновая проверка живости пулов соединений и их текущее состояние.
+
+pool_pre_ping выключен, поэтому разорванные соединения (перезапуск БД,
+обрыв сети) обнаруживаются здесь: раз в DB_POOL_LIVENESS_INTERVAL секунд
+на одном из свободных соединений выполняется ``SELECT 1``. Если соединение
+оказалось разорванным, SQLAlchemy инвалидирует весь пул, и при следующей
+выдаче запросы получат новые соединения вместо ошибки.
+"""
+import asyncio
+import time
+from typing import Any, Dict
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import db_pool_checkout_failures, db_pool_checkouts, db_pool_wait
+from app.core.query_log import SKIP_OPTION
+
+logger = get_logger(__name__)
+
+_liveness: Dict[str, Dict[str, Any]] = {}
+
+
+async def check_pool_liveness(engine: AsyncEngine, name: str) -> bool:
+    """
+    Проверяет одно свободное соединение пула. Если свободных нет,
+    пул занят запросами — значит, соединения и так живые.
+    """
+    if engine.sync_engine.pool.checkedin() == 0:
+        return True
+    started = time.perf_counter()
+    try:
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1", execution_options={SKIP_OPTION: True})
+        ok = True
+    except Exception as e:
+        ok = False
+        logger.warning("%s pool liveness check failed, pool invalidated: %s", name, e)
+    _liveness[name] = {
+        "ok": ok,
+        "checked_at": time.time(),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+    return ok
+
+
+async def run_pool_liveness(engines: Dict[str, AsyncEngine], interval: float) -> None:
+    """Бесконечный цикл проверок; запускается задачей в lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        for name, engine in engines.items():
+            await check_pool_liveness(engine, name)
+
+
+def pool_status(engine: AsyncEngine, name: str) -> Dict[str, Any]:
+    """
+    Текущее состояние пула: занятые и свободные соединения, переполнение,
+    время ожидания соединения, неудачные выдачи и последняя проверка
+    живости.
+    """
+    pool = engine.sync_engine.pool
+    wait = db_pool_wait.labels(name)
+    waits = sum(wait.counts)
+    return {
+        "engine": name,
+        "pool_size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "timeout": settings.DB_POOL_TIMEOUT,
+        "recycle": settings.DB_POOL_RECYCLE,
+        "pre_ping": settings.DB_POOL_PRE_PING,
+        "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        "checkouts": int(db_pool_checkouts.labels(name).value),
+        "checkout_failures": {
+            reason: int(db_pool_checkout_failures.labels(name, reason).value) for reason in ("timeout", "error")
+        },
+        "wait_mean_ms": round(wait.sum / waits * 1000, 3) if waits else 0.0,
+        "liveness": _liveness.get(name),
+    }
@@ -0,0 +1,162 @@
+"""
+Сэмплирующий профайлер отдельных запросов.
+
+Профилируется запрос с заголовком ``X-Profile: <SERVICE_API_TOKEN>`` или
+доля PROFILING_SAMPLE_RATE всех запросов. Пока запрос обрабатывается,
+фоновый поток раз в PROFILING_INTERVAL_MS снимает стек потока event loop
+(``sys._current_frames``). Результат — файл collapsed stacks
+(``кадр;кадр;кадр N``) в PROFILING_DIR с методом, маршрутом и trace id
+в имени; его открывают speedscope и flamegraph.pl. Имя файла
+возвращается в заголовке ответа ``X-Profile-File``.
+
+Стек снимается со всего потока loop, поэтому в профиль попадают и
+корутины параллельных запросов. Ожидание I/O видно как кадры селектора
+asyncio. Поток профайлера получает GIL не чаще ``sys.getswitchinterval()``
+(5 мс), поэтому интервал меньше этого не даёт больше сэмплов.
+
+Без PROFILING_ENABLED middleware не подключается, и запросы не платят
+ничего. Одновременно профилируется не больше одного запроса.
+"""
+import asyncio
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.tracing import current_trace_id
+
+logger = get_logger(__name__)
+
+MAX_DEPTH = 128
+_CWD = os.getcwd() + os.sep
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_CWD):
+        filename = filename[len(_CWD):]
+    else:
+        # Стандартная библиотека и пакеты: хватает пакета и модуля
+        filename = "/".join(filename.replace(os.sep, "/").split("/")[-2:])
+    # ';' — разделитель кадров формата collapsed stacks
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Снимает стеки одного потока в фоне и считает одинаковые."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _safe_name(value: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in value).strip("_") or "root"
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по заголовку X-Profile или по доле PROFILING_SAMPLE_RATE."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.directory = settings.PROFILING_DIR
+        self.interval = settings.PROFILING_INTERVAL_MS / 1000
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.token = (settings.SERVICE_API_TOKEN or "").encode()
+        self._busy = False
+
+    def _requested(self, scope: Scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        if not self.token:
+            return False
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._busy or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        started = time.time()
+        filename = None
+        sampler = StackSampler(threading.get_ident(), self.interval)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal filename
+            if message["type"] == "http.response.start":
+                # Маршрут уже известен: имя файла отдаём клиенту заранее
+                filename = self._filename(scope, started)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", filename.encode())]
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.time() - started
+            try:
+                # Остановка сэмплера (join потока) и запись файла — вне event
+                # loop, иначе профилируемый запрос задержал бы все остальные
+                await asyncio.to_thread(
+                    self._finish, filename or self._filename(scope, started), sampler, duration
+                )
+            finally:
+                self._busy = False
+
+    def _filename(self, scope: Scope, started: float) -> str:
+        route = getattr(scope.get("route"), "path", scope["path"])
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started))
+        return f"{stamp}-{scope['method']}-{_safe_name(route)}-{current_trace_id() or 'notrace'}.collapsed"
+
+    def _finish(self, filename: str, sampler: StackSampler, duration: float) -> None:
+        sampler.stop()
+        self._write(filename, sampler, duration)
+
+    def _write(self, filename: str, sampler: StackSampler, duration: float) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, filename)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(sampler.collapsed())
+        except OSError as e:
+            logger.warning("Failed to write request profile %s: %s", filename, e)
+            return
+        logger.info(
+            "Request profile written: %s (%.0fms, %s samples)",
+            path, duration * 1000, sum(sampler.samples.values()),
+        )
@@ -0,0 +1,266 @@
+"""
+Журнал медленных SQL запросов и агрегированная статистика по запросам.
+
+На каждый запрос движка вешаются события SQLAlchemy: время выполнения
+накапливается по нормализованному тексту запроса (литералы и списки IN
+свёрнуты), запросы дольше SLOW_QUERY_MS пишутся в лог вместе с формой
+параметров и методом репозитория, из которого они пришли.
+
+Для доли медленных SELECT (SLOW_QUERY_EXPLAIN_RATE), кроме блокирующих
+строки (FOR UPDATE/SHARE), в фоне выполняется ``EXPLAIN (ANALYZE, BUFFERS)``
+— план попадает в лог и в статистику.
+"""
+import asyncio
+import functools
+import inspect
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Метод репозитория, который выполняет текущий запрос (см. track_query_origin)
+_query_origin: ContextVar[Optional[str]] = ContextVar("query_origin", default=None)
+
+# Опция выполнения, которой помечаются служебные запросы (EXPLAIN)
+SKIP_OPTION = "query_log_skip"
+
+# Не чаще одного EXPLAIN на запрос за этот интервал
+EXPLAIN_INTERVAL = 600.0
+
+MAX_ORIGINS = 10
+
+
+def track_query_origin(cls):
+    """
+    Декоратор класса репозитория: на время каждого публичного async-метода
+    запоминает ``Класс.метод``, чтобы журнал знал, откуда пришёл запрос.
+    """
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(attr):
+            continue
+        setattr(cls, name, _with_origin(attr, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _with_origin(method, origin: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = _query_origin.set(origin)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            _query_origin.reset(token)
+
+    return wrapper
+
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_POSITIONAL = re.compile(r"\$\d+")
+_PARAM = r"(?:\$\?|\?|%\(\w+\)s)(?:::\w+)?"
+_LIST = re.compile(rf"([(\[])\s*{_PARAM}(?:\s*,\s*{_PARAM})+\s*([)\]])")
+_LOCKING_CLAUSE = re.compile(r"\bFOR (?:NO KEY )?(?:UPDATE|SHARE|KEY SHARE)\b", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    """
+    Приводит запрос к виду, одинаковому для всех значений параметров:
+    литералы заменяются на ``?``, номера параметров asyncpg — на ``$?``
+    (они сдвигаются вместе с длиной списков), списки параметров в IN
+    и ARRAY — на ``(...)`` и ``[...]``.
+    """
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _POSITIONAL.sub("$?", statement)
+    return _LIST.sub(r"\1...\2", statement)
+
+
+def parameter_shape(parameters: Any, executemany: bool = False) -> str:
+    """
+    Описывает параметры запроса без значений, например ``(int, datetime)``.
+    """
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+class _QueryStat:
+    __slots__ = (
+        "engine", "statement", "calls", "total", "max", "rows", "slow_calls",
+        "origins", "last_params", "last_plan", "last_plan_at",
+    )
+
+    def __init__(self, engine: str, statement: str) -> None:
+        self.engine = engine
+        self.statement = statement
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow_calls = 0
+        self.origins: Dict[str, int] = {}
+        self.last_params: Optional[str] = None
+        self.last_plan: Optional[str] = None
+        self.last_plan_at = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "engine": self.engine,
+            "statement": self.statement,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "slow_calls": self.slow_calls,
+            "origins": dict(self.origins),
+            "last_params": self.last_params,
+            "last_plan": self.last_plan,
+        }
+
+
+class QueryStats:
+    """
+    Статистика по нормализованным запросам. Обновляется только из потока
+    event loop, поэтому обходится без блокировок.
+    """
+
+    def __init__(self, max_entries: int = 1000) -> None:
+        self.max_entries = max_entries
+        self.untracked_calls = 0
+        self._stats: Dict[Tuple[str, str], _QueryStat] = {}
+
+    def record(self, engine: str, statement: str, elapsed: float, rows: int, origin: Optional[str]) -> Optional[_QueryStat]:
+        key = (engine, statement)
+        stat = self._stats.get(key)
+        if stat is None:
+            if len(self._stats) >= self.max_entries:
+                self.untracked_calls += 1
+                return None
+            stat = self._stats[key] = _QueryStat(engine, statement)
+        stat.calls += 1
+        stat.total += elapsed
+        if elapsed > stat.max:
+            stat.max = elapsed
+        if rows > 0:
+            stat.rows += rows
+        origin = origin or "<unknown>"
+        if origin in stat.origins or len(stat.origins) < MAX_ORIGINS:
+            stat.origins[origin] = stat.origins.get(origin, 0) + 1
+        return stat
+
+    def snapshot(self, limit: int = 50, sort: str = "total") -> List[Dict[str, Any]]:
+        key = {
+            "total": lambda stat: stat.total,
+            "mean": lambda stat: stat.total / stat.calls,
+            "max": lambda stat: stat.max,
+            "calls": lambda stat: stat.calls,
+        }[sort]
+        return [stat.as_dict() for stat in sorted(self._stats.values(), key=key, reverse=True)[:limit]]
+
+    def reset(self) -> None:
+        self._stats.clear()
+        self.untracked_calls = 0
+
+
+query_stats = QueryStats(settings.QUERY_STATS_MAX_ENTRIES)
+
+# Ссылки на фоновые задачи EXPLAIN, чтобы их не собрал GC
+_explain_tasks: set = set()
+
+
+def instrument_engine_queries(engine: AsyncEngine, name: str) -> None:
+    """
+    Подключает к движку замер времени запросов, журнал медленных
+    запросов и EXPLAIN для их доли.
+    """
+    sync_engine = engine.sync_engine
+    threshold = settings.SLOW_QUERY_MS / 1000
+    explain_rate = settings.SLOW_QUERY_EXPLAIN_RATE
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and not context.execution_options.get(SKIP_OPTION):
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        origin = _query_origin.get()
+        normalized = normalize_sql(statement)
+        stat = query_stats.record(name, normalized, elapsed, cursor.rowcount, origin)
+        if elapsed < threshold:
+            return
+
+        shape = parameter_shape(parameters, executemany)
+        logger.warning(
+            "Slow query: %.1fms [%s] origin=%s params=%s sql=%s",
+            elapsed * 1000, name, origin or "<unknown>", shape, normalized,
+        )
+        if stat is None:
+            return
+        stat.slow_calls += 1
+        stat.last_params = shape
+        if _should_explain(stat, normalized, executemany, explain_rate):
+            task = asyncio.get_running_loop().create_task(
+                _explain(engine, name, stat, statement, parameters)
+            )
+            _explain_tasks.add(task)
+            task.add_done_callback(_explain_tasks.discard)
+
+
+def _should_explain(stat: _QueryStat, normalized: str, executemany: bool, explain_rate: float) -> bool:
+    """
+    Нужен ли EXPLAIN медленного запроса: только SELECT без блокировки строк
+    (EXPLAIN ANALYZE выполняет запрос и взял бы те же блокировки), не чаще
+    раза в EXPLAIN_INTERVAL на запрос и с вероятностью explain_rate.
+    Помечает stat сразу, чтобы параллельные медленные вызовы не запускали
+    EXPLAIN повторно.
+    """
+    if (
+        explain_rate <= 0
+        or executemany
+        or normalized[:6].upper() != "SELECT"
+        or _LOCKING_CLAUSE.search(normalized)
+        or time.time() - stat.last_plan_at <= EXPLAIN_INTERVAL
+        or random.random() >= explain_rate
+    ):
+        return False
+    stat.last_plan_at = time.time()
+    return True
+
+
+async def _explain(engine: AsyncEngine, name: str, stat: _QueryStat, statement: str, parameters: Any) -> None:
+    """Выполняет EXPLAIN (ANALYZE, BUFFERS) медленного запроса на отдельном соединении."""
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS) " + statement,
+                parameters,
+                execution_options={SKIP_OPTION: True},
+            )
+            plan = "\n".join(row[0] for row in result)
+    except Exception as e:
+        logger.warning("EXPLAIN failed for slow query [%s]: %s", name, e)
+        return
+    stat.last_plan = plan
+    logger.warning("EXPLAIN for slow query [%s] %s\n%s", name, stat.statement, plan)
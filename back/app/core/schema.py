@@ -0,0 +1,116 @@
+"""
+Готовность БД и создание таблиц при старте приложения.
+
+Версия схемы — хэш DDL таблиц из моделей. Она хранится в таблице
+``schema_version`` каждой БД; если сохранённая версия совпадает с текущей,
+create_all не выполняется и старт обходится одним SELECT на БД.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Отдельные метаданные: таблица версий не должна попадать в хэш моделей
+_version_metadata = MetaData()
+schema_version_table = Table(
+    "schema_version",
+    _version_metadata,
+    Column("name", String(100), primary_key=True),
+    Column("version", String(64), nullable=False),
+    Column("updated_at", DateTime, nullable=False, server_default=func.now()),
+)
+
+
+async def wait_for_db(
+    engine: AsyncEngine,
+    db_name: str,
+    timeout: float = 60.0,
+    initial_delay: float = 0.05,
+    max_delay: float = 2.0,
+) -> None:
+    """
+    Ждёт, пока БД начнёт принимать соединения. Пауза между попытками
+    растёт экспоненциально от initial_delay до max_delay, поэтому уже
+    готовая БД отвечает с первой попытки, а поднимающаяся не засыпается
+    запросами.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            async with engine.connect() as conn:
+                await conn.exec_driver_sql("SELECT 1")
+            logger.info("%s database is ready (attempt %s)", db_name, attempt)
+            return
+        except Exception as e:
+            if time.monotonic() + delay > deadline:
+                logger.error("%s database failed to become ready after %s attempts", db_name, attempt)
+                raise
+            logger.warning("%s database not ready yet (attempt %s): %s", db_name, attempt, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+def schema_hash(engine: AsyncEngine, tables: Iterable[Table]) -> str:
+    """Хэш DDL таблиц и их индексов в диалекте движка."""
+    dialect = engine.dialect
+    digest = hashlib.sha256()
+    for table in sorted(tables, key=lambda t: t.name):
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+async def _stored_version(engine: AsyncEngine, name: str) -> Optional[str]:
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(schema_version_table.c.version).where(schema_version_table.c.name == name)
+            )
+            return result.scalar_one_or_none()
+    except ProgrammingError:
+        # Таблицы версий ещё нет — первый запуск на этой БД
+        return None
+
+
+async def ensure_schema(engine: AsyncEngine, name: str, tables: list[Table]) -> bool:
+    """
+    Создаёт недостающие таблицы, если версия схемы изменилась.
+
+    Returns:
+        True, если DDL выполнялся, False — если схема уже актуальна.
+    """
+    version = schema_hash(engine, tables)
+    if await _stored_version(engine, name) == version:
+        logger.info("%s database schema is up to date (%s)", name, version[:12])
+        return False
+
+    def create(sync_conn):
+        for table in tables:
+            table.create(sync_conn, checkfirst=True)
+        schema_version_table.create(sync_conn, checkfirst=True)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(create)
+        statement = insert(schema_version_table).values(name=name, version=version)
+        await conn.execute(
+            statement.on_conflict_do_update(
+                index_elements=[schema_version_table.c.name],
+                set_={"version": statement.excluded.version, "updated_at": func.now()},
+            )
+        )
+    logger.info("%s database tables created, schema version %s", name, version[:12])
+    return True
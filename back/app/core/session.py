@@ -1,47 +1,297 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import math
+import time
+from contextvars import ContextVar
+
+from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
 from app.core.config import settings
+from app.core.metrics import InstrumentedAsyncAdaptedQueuePool, instrument_engine
+from app.core.query_log import instrument_engine_queries
+from app.core.tracing import instrument_engine_tracing
 from collections.abc import AsyncGenerator
+from typing import Any, Callable, Dict, Optional
 
-# Основная БД
-engine = create_async_engine(
-    settings.ASYNC_DATABASE_URL_computed,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-    echo=False,  
-)
 
-AsyncSessionLocal = async_sessionmaker(
-    bind=engine,
-    expire_on_commit=False,
-    class_=AsyncSession,
-)
+def create_engine(url: str, name: str) -> AsyncEngine:
+    """
+    Создаёт движок с пулом из настроек и подключает к нему метрики,
+    трассировку и журнал запросов.
+
+    pool_pre_ping по умолчанию выключен: он добавляет round trip к каждой
+    выдаче соединения. Разорванные соединения отсеиваются pool_recycle
+    и фоновой проверкой (app.core.pool.run_pool_liveness).
+    """
+    new_engine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_logging_name=name,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args={"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+        echo=False,
+    )
+    instrument_engine(new_engine, name)
+    instrument_engine_tracing(new_engine, name)
+    instrument_engine_queries(new_engine, name)
+    return new_engine
+
+
+class LazySession:
+    """
+    Ленивая единица работы с БД для зависимостей FastAPI.
+
+    AsyncSession создаётся при первом обращении к любому её атрибуту
+    (``execute``, ``get``, ``add``...), а соединение из пула берётся
+    при первом запросе. Запросы, которые завершились раньше (ответ из
+    кэша, 403, ошибка валидации), не создают сессию и не трогают пул.
+    Репозитории работают с ней как с обычной AsyncSession.
+
+    ``primary_only=True`` отправляет все запросы сессии на primary,
+    даже при настроенной реплике (см. RoutingSession).
+    """
+
+    __slots__ = ("_factory", "_session", "_primary_only")
+
+    def __init__(self, factory: Callable[[], AsyncSession], primary_only: bool = False) -> None:
+        self._factory = factory
+        self._session: AsyncSession | None = None
+        self._primary_only = primary_only
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._factory()
+            if self._primary_only:
+                self._session.info["primary_only"] = True
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        """Возвращает соединение в пул; если сессия не создавалась — ничего не делает."""
+        if self._session is not None:
+            await self._session.close()
+
+
+# ---------- Реплики и read-your-writes ----------
+
+# Пользователь текущего запроса (выставляется при проверке JWT)
+_session_user: ContextVar[Optional[str]] = ContextVar("session_user", default=None)
+# Пользователь -> момент (time.monotonic), до которого его чтения идут на primary
+_recent_writes: Dict[str, float] = {}
+_MAX_RECENT_WRITES = 10000
+
+# Окно read-your-writes клиента на время запроса (ReadYourWritesMiddleware):
+# until — момент (time.time()), до которого чтения идут на primary,
+# wrote — была ли в запросе запись
+_request_writes: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_writes", default=None)
+READ_YOUR_WRITES_COOKIE = "rw_until"
+
+
+def set_session_user(user_key: Optional[str]) -> None:
+    """Запоминает пользователя текущего запроса для read-your-writes."""
+    _session_user.set(user_key)
+
+
+def _mark_write() -> None:
+    state = _request_writes.get()
+    if state is not None:
+        state["until"] = time.time() + settings.READ_YOUR_WRITES_SECONDS
+        state["wrote"] = True
+    user = _session_user.get()
+    if user is None:
+        return
+    now = time.monotonic()
+    _recent_writes[user] = now + settings.READ_YOUR_WRITES_SECONDS
+    if len(_recent_writes) > _MAX_RECENT_WRITES:
+        for key in [key for key, until in _recent_writes.items() if until <= now]:
+            del _recent_writes[key]
+
+
+def _recently_wrote() -> bool:
+    state = _request_writes.get()
+    if state is not None and state["until"] > time.time():
+        return True
+    user = _session_user.get()
+    if user is None:
+        return False
+    until = _recent_writes.get(user)
+    return until is not None and until > time.monotonic()
+
+
+def _cookie_until(scope: Scope) -> float:
+    """Окно из cookie запроса; окно длиннее READ_YOUR_WRITES_SECONDS обрезается."""
+    for name, value in scope["headers"]:
+        if name != b"cookie":
+            continue
+        for part in value.decode("latin-1").split(";"):
+            key, _, raw = part.strip().partition("=")
+            if key == READ_YOUR_WRITES_COOKIE:
+                try:
+                    until = float(raw)
+                except ValueError:
+                    return 0.0
+                return min(until, time.time() + settings.READ_YOUR_WRITES_SECONDS)
+    return 0.0
+
+
+class ReadYourWritesMiddleware:
+    """
+    Переносит окно read-your-writes между воркерами.
+
+    _recent_writes живёт в памяти процесса: при нескольких воркерах
+    следующий запрос пользователя может попасть в другой процесс и
+    прочитать с реплики данные до своей записи. Поэтому после записи
+    ответ ставит cookie ``rw_until`` с моментом конца окна, а пока cookie
+    действует, чтения этого клиента в любом воркере идут на primary.
+    Клиенты без cookie (вызовы API без сохранения cookie) получают
+    read-your-writes только внутри одного процесса.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state: Dict[str, Any] = {"until": _cookie_until(scope), "wrote": False}
+        token = _request_writes.set(state)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and state["wrote"]:
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={state['until']:.3f}; "
+                    f"Max-Age={math.ceil(settings.READ_YOUR_WRITES_SECONDS)}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async with AsyncSessionLocal() as session:
         try:
-            yield session
+            await self.app(scope, receive, send_wrapper)
         finally:
-            await session.close()
+            _request_writes.reset(token)
 
-# Mock БД (отдельная БД для mock-service)
-mock_engine = create_async_engine(
-    settings.MOCK_ASYNC_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-    echo=False,
+
+class RoutingSession(Session):
+    """
+    Session, которая отправляет чтения на реплику, а на primary — записи
+    (flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE), все запросы
+    сессии после первой записи или с ``info["primary_only"]`` и чтения
+    пользователя или клиента, который недавно писал (см.
+    ReadYourWritesMiddleware). Без реплики ведёт себя как обычная Session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is None:
+            return super().get_bind(mapper, clause=clause, **kw)
+        if (
+            self._flushing
+            or isinstance(clause, UpdateBase)
+            or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self.info["primary_only"] = True
+            _mark_write()
+            return self.info["primary"]
+        if _reads_primary(self.info):
+            return self.info["primary"]
+        return replica
+
+
+def _reads_primary(info: Dict[str, Any]) -> bool:
+    return bool(info.get("primary_only")) or _recently_wrote()
+
+
+def read_target(session: Any) -> str:
+    """
+    Куда сейчас пойдут чтения сессии: ``primary`` или ``replica``.
+
+    Объединяемые чтения (app.core.singleflight) различаются по нему в
+    ключе: иначе пользователь, который только что писал, присоединится к
+    чтению с реплики, начатому другим пользователем, и получит данные до
+    своей записи. Без реплики всегда ``primary``.
+    """
+    info = session.info
+    if info.get("replica") is None or _reads_primary(info):
+        return "primary"
+    return "replica"
+
+
+def routing_sessionmaker(primary: AsyncEngine, replica: Optional[AsyncEngine]) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind=primary,
+        sync_session_class=RoutingSession,
+        info={
+            "primary": primary.sync_engine,
+            "replica": replica.sync_engine if replica is not None else None,
+        },
+        expire_on_commit=False,
+        class_=AsyncSession,
+    )
+
+
+# Основная БД
+engine = create_engine(settings.ASYNC_DATABASE_URL_computed, "main")
+replica_engine = (
+    create_engine(settings.REPLICA_ASYNC_DATABASE_URL, "main_replica")
+    if settings.REPLICA_ASYNC_DATABASE_URL else None
 )
 
-MockAsyncSessionLocal = async_sessionmaker(
-    bind=mock_engine,
-    expire_on_commit=False,
-    class_=AsyncSession,
+AsyncSessionLocal = routing_sessionmaker(engine, replica_engine)
+
+# Запросы, которые только читают: их сессии можно отправлять на реплику.
+# В изменяющих запросах чтения тоже идут на primary, чтобы запись
+# не строилась на отстающих данных реплики.
+_READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+async def get_session(request: Request) -> AsyncGenerator[LazySession, None]:
+    """
+    Сессия основной БД на время обработчика. Подключайте с
+    ``Depends(get_session, scope="function")``, чтобы соединение вернулось
+    в пул сразу после обработчика, а не после отправки ответа клиенту.
+    """
+    session = LazySession(AsyncSessionLocal, primary_only=request.method not in _READ_METHODS)
+    try:
+        yield session
+    finally:
+        await session.close()
+
+# Mock БД (отдельная БД для mock-service)
+mock_engine = create_engine(settings.MOCK_ASYNC_DATABASE_URL, "mock")
+mock_replica_engine = (
+    create_engine(settings.MOCK_REPLICA_ASYNC_DATABASE_URL, "mock_replica")
+    if settings.MOCK_REPLICA_ASYNC_DATABASE_URL else None
 )
 
-async def get_mock_session() -> AsyncGenerator[AsyncSession, None]:
-    async with MockAsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
\ No newline at end of file
+MockAsyncSessionLocal = routing_sessionmaker(mock_engine, mock_replica_engine)
+
+async def get_mock_session(request: Request) -> AsyncGenerator[LazySession, None]:
+    """Сессия mock БД; см. get_session."""
+    session = LazySession(MockAsyncSessionLocal, primary_only=request.method not in _READ_METHODS)
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+# Все пулы приложения по имени: для проверки живости и /api/admin/pools
+engines: Dict[str, AsyncEngine] = {
+    name: value
+    for name, value in (
+        ("main", engine),
+        ("main_replica", replica_engine),
+        ("mock", mock_engine),
+        ("mock_replica", mock_replica_engine),
+    )
+    if value is not None
+}
@@ -0,0 +1,86 @@
+"""
+Single-flight: одинаковые одновременные чтения выполняются один раз.
+
+Первый запрос с ключом запускает работу, остальные с тем же ключом ждут
+её результат (или исключение). После завершения ключ забывается, то есть
+это не кэш: запрос, пришедший после завершения, выполнит работу заново.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.core.metrics import coalesced_requests
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Группа одинаковых вызовов по ключу, общая для процесса.
+
+    Отмена безопасна для ожидающих: отмена одного из них не отменяет
+    работу остальных. Работа выполняется на ресурсах первого запроса
+    (сессия БД, HTTP клиент), поэтому при его отмене он дожидается
+    завершения работы, если её ещё ждут другие. Когда отменены все
+    ожидающие, отменяется и работа.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is not None:
+            coalesced_requests.labels(self.name).inc()
+            return await self._wait(call, owner=False)
+
+        call = _Call(asyncio.ensure_future(fn()))
+        self._calls[key] = call
+        call.task.add_done_callback(lambda task: self._done(key, call))
+        return await self._wait(call, owner=True)
+
+    def forget(self) -> None:
+        """
+        Новые запросы не присоединятся к уже идущим вызовам. Вызывается
+        после записи, чтобы чтения после неё не получили данные до неё.
+        """
+        self._calls.clear()
+
+    def _done(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled():
+            # Исключение забирают ожидающие; без них asyncio ругался бы в лог
+            call.task.exception()
+
+    async def _wait(self, call: _Call, owner: bool) -> Any:
+        call.waiters += 1
+        waiting = True
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            call.waiters -= 1
+            waiting = False
+            if not call.task.done():
+                if call.waiters == 0:
+                    call.task.cancel()
+                elif owner:
+                    # Работа идёт на ресурсах владельца, а её ещё ждут;
+                    # если отменят и их, последний отменит работу
+                    while not call.task.done():
+                        try:
+                            await asyncio.wait([call.task])
+                        except asyncio.CancelledError:
+                            continue
+            raise
+        finally:
+            if waiting:
+                call.waiters -= 1
@@ -0,0 +1,328 @@
+"""
+Трассировка запросов с распространением контекста W3C Trace Context.
+
+Входящий заголовок ``traceparent`` (его проставляет сервис solution при
+запросах к backend) продолжает трассу, иначе начинается новая. Текущий спан
+хранится в contextvar, поэтому дочерние спаны (запросы к БД, вызовы Ollama)
+привязываются к нему автоматически.
+
+Завершённые спаны пишутся JSON-строками в stdout или в файл фоновым
+потоком — по ним можно офлайн восстановить латентность каждого этапа запроса.
+Если TRACING_EXPORTER=none (по умолчанию), спаны не создаются вовсе.
+"""
+import atexit
+import json
+import queue
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+SERVER = "server"
+CLIENT = "client"
+INTERNAL = "internal"
+
+# Длина SQL, которая попадает в атрибуты спана
+MAX_STATEMENT_LENGTH = 500
+
+
+class Span:
+    """
+    Один этап обработки запроса. Завершается вызовом ``end()``,
+    после чего передаётся экспортёру.
+    """
+
+    __slots__ = (
+        "name", "kind", "trace_id", "span_id", "parent_id", "sampled",
+        "attributes", "status", "start_time", "_start", "_ended",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = INTERNAL,
+        parent: Optional["Span"] = None,
+        remote_parent: Optional[Tuple[str, str, bool]] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        if parent is not None:
+            self.trace_id, self.parent_id, self.sampled = parent.trace_id, parent.span_id, parent.sampled
+        elif remote_parent is not None:
+            self.trace_id, self.parent_id, self.sampled = remote_parent
+        else:
+            self.trace_id, self.parent_id, self.sampled = secrets.token_hex(16), None, True
+        self.span_id = secrets.token_hex(8)
+        self.attributes = attributes or {}
+        self.status = "ok"
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._ended = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.attributes["error.type"] = type(exc).__name__
+        self.attributes["error.message"] = str(exc)[:200]
+
+    def traceparent(self) -> str:
+        return format_traceparent(self.trace_id, self.span_id, self.sampled)
+
+    def end(self) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        if self.sampled and _exporter is not None:
+            _exporter.export({
+                "service": _service_name,
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "name": self.name,
+                "kind": self.kind,
+                "start": round(self.start_time, 6),
+                "duration_ms": round((time.perf_counter() - self._start) * 1000, 3),
+                "status": self.status,
+                "attributes": self.attributes,
+            })
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Разбирает заголовок ``traceparent`` (версия 00).
+
+    Returns:
+        (trace_id, parent_span_id, sampled) или None, если заголовок некорректен
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    trace_id, span_id, flags = parts[1].lower(), parts[2].lower(), parts[3]
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 0x01)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, sampled
+
+
+def format_traceparent(trace_id: str, span_id: str, sampled: bool = True) -> str:
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+
+class JsonLinesExporter:
+    """
+    Пишет спаны JSON-строками из фонового потока.
+
+    Как и логирование, поток event loop только кладёт спан в ограниченную
+    очередь; при переполнении спан отбрасывается и учитывается в ``dropped``.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: Optional[str] = None, queue_size: int = 10000) -> None:
+        self.path = path
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        if self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            stream = open(self.path, "a", encoding="utf-8")
+        else:
+            stream = sys.stdout
+        try:
+            while True:
+                item = self._queue.get()
+                if item is self._STOP:
+                    break
+                stream.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+                if self._queue.empty():
+                    stream.flush()
+        finally:
+            stream.flush()
+            if stream is not sys.stdout:
+                stream.close()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Дописывает оставшиеся спаны и останавливает поток."""
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+_exporter: Optional[JsonLinesExporter] = None
+_service_name = "backend"
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def configure_tracing(exporter: str, path: Optional[str] = None, service_name: str = "backend") -> None:
+    """
+    Включает трассировку.
+
+    Args:
+        exporter: none — выключено, console — stdout, file — JSON Lines в ``path``
+        path: Файл для экспортёра file
+        service_name: Имя сервиса в спанах
+    """
+    global _exporter, _service_name
+    shutdown_tracing()
+    _service_name = service_name
+    exporter = exporter.lower()
+    if exporter == "console":
+        _exporter = JsonLinesExporter()
+    elif exporter == "file":
+        _exporter = JsonLinesExporter(path or "logs/traces.jsonl")
+    elif exporter != "none":
+        raise ValueError(f"Unknown tracing exporter: {exporter}")
+
+
+def shutdown_tracing() -> None:
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter = None
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+@contextmanager
+def start_span(
+    name: str,
+    kind: str = INTERNAL,
+    traceparent: Optional[str] = None,
+    **attributes: Any,
+) -> Iterator[Optional[Span]]:
+    """
+    Открывает спан и делает его текущим на время блока ``with``.
+
+    Родитель — текущий спан, либо удалённый из ``traceparent``.
+    Если трассировка выключена, возвращает None.
+    """
+    if _exporter is None:
+        yield None
+        return
+    parent = _current_span.get()
+    remote_parent = parse_traceparent(traceparent) if parent is None else None
+    span = Span(name, kind, parent, remote_parent, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.record_exception(exc)
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Асинхронный генератор закрыт из другого контекста
+            pass
+        span.end()
+
+
+def inject_traceparent(headers: Dict[str, str]) -> Dict[str, str]:
+    """Добавляет ``traceparent`` текущего спана в заголовки исходящего запроса."""
+    span = _current_span.get()
+    if span is not None:
+        headers["traceparent"] = span.traceparent()
+    return headers
+
+
+def set_ollama_attributes(span: Optional[Span], response: Optional[dict]) -> None:
+    """
+    Переносит в спан счётчики токенов и собственные тайминги Ollama
+    (в наносекундах) из ответа или финального чанка стрима.
+    """
+    if span is None or not response:
+        return
+    for key in ("prompt_eval_count", "eval_count"):
+        if key in response:
+            span.set_attribute(f"ollama.{key}", response[key])
+    for key in ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration"):
+        if key in response:
+            span.set_attribute(f"ollama.{key}_ms", round(response[key] / 1e6, 3))
+
+
+def instrument_engine_tracing(engine: AsyncEngine, name: str) -> None:
+    """
+    Создаёт спан ``db.query`` на каждый SQL запрос движка.
+    Спан привязывается к текущему спану запроса (contextvar доходит
+    до событий SQLAlchemy через greenlet).
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _exporter is None or context is None:
+            return
+        parent = _current_span.get()
+        if parent is None:
+            return
+        context._trace_span = Span(
+            "db.query",
+            CLIENT,
+            parent,
+            attributes={
+                "db.system": "postgresql",
+                "db.engine": name,
+                "db.statement": statement[:MAX_STATEMENT_LENGTH],
+                "db.executemany": executemany,
+            },
+        )
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.end()
+
+
+configure_tracing(settings.TRACING_EXPORTER, settings.TRACING_FILE, settings.TRACING_SERVICE_NAME)
+atexit.register(shutdown_tracing)
@@ -3,12 +3,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.core.db import AmountORM, TransactionORM
 from app.core.logger import get_logger
+from app.core.query_log import track_query_origin
 from typing import List, Optional
 from datetime import datetime
 
 logger = get_logger(__name__)
 
 
+@track_query_origin
 class AmountRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -24,16 +26,16 @@ class AmountRepository:
         return list(result.scalars().all())
 
     async def create_amount(self, name: str, count: float = 0.0) -> AmountORM:
-        logger.debug(f"Creating amount in database: name={name}, count={count}")
+        logger.debug("Creating amount in database: name=%s, count=%s", name, count)
         try:
             amount = AmountORM(name=name, count=count)
             self.session.add(amount)
             await self.session.commit()
             await self.session.refresh(amount)
-            logger.debug(f"Amount created in database: id={amount.id}, name={name}, count={count}")
+            logger.debug("Amount created in database: id=%s, name=%s, count=%s", amount.id, name, count)
             return amount
         except Exception as e:
-            logger.error(f"Failed to create amount in database: name={name}, error={e}", exc_info=True)
+            logger.error("Failed to create amount in database: name=%s, error=%s", name, e, exc_info=True)
             await self.session.rollback()
             raise
 
@@ -75,8 +77,9 @@ class AmountRepository:
         count: float
     ) -> TransactionORM:
         logger.debug(
-            f"Creating transaction in database: amount_id={amount_id}, "
-            f"type={transaction_type}, category={category}, count={count}"
+            "Creating transaction in database: amount_id=%s, "
+            "type=%s, category=%s, count=%s",
+            amount_id, transaction_type, category, count
         )
         try:
             transaction = TransactionORM(
@@ -96,21 +99,22 @@ class AmountRepository:
                 elif transaction_type == 'outcome':
                     amount.count -= count
                 logger.debug(
-                    f"Amount balance updated: amount_id={amount_id}, "
-                    f"old_balance={old_balance}, new_balance={amount.count}"
+                    "Amount balance updated: amount_id=%s, "
+                    "old_balance=%s, new_balance=%s",
+                    amount_id, old_balance, amount.count
                 )
             else:
-                logger.warning(f"Amount not found for transaction: amount_id={amount_id}")
+                logger.warning("Amount not found for transaction: amount_id=%s", amount_id)
             
             await self.session.commit()
             await self.session.refresh(transaction)
             if amount:
                 await self.session.refresh(amount)
-            logger.debug(f"Transaction created in database: id={transaction.id}")
+            logger.debug("Transaction created in database: id=%s", transaction.id)
             return transaction
         except Exception as e:
             logger.error(
-                f"Failed to create transaction in database: amount_id={amount_id}, error={e}",
+                "Failed to create transaction in database: amount_id=%s, error=%s", amount_id, e,
                 exc_info=True
             )
             await self.session.rollback()
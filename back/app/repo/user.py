@@ -5,10 +5,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import UsersORM
 from app.core.logger import get_logger
+from app.core.query_log import track_query_origin
 
 logger = get_logger(__name__)
 
 
+@track_query_origin
 class UsersRepository:
     """Репозиторий для работы с таблицей users"""
 
@@ -43,7 +45,7 @@ class UsersRepository:
         login: str,
         hash_password: str,
     ) -> UsersORM:
-        logger.debug(f"Creating user in database: login={login}")
+        logger.debug("Creating user in database: login=%s", login)
         try:
             user = UsersORM(
                 username=username,
@@ -53,10 +55,10 @@ class UsersRepository:
             self.session.add(user)
             await self.session.commit()
             await self.session.refresh(user)
-            logger.debug(f"User created in database: id={user.id}, login={login}")
+            logger.debug("User created in database: id=%s, login=%s", user.id, login)
             return user
         except Exception as e:
-            logger.error(f"Failed to create user in database: login={login}, error={e}", exc_info=True)
+            logger.error("Failed to create user in database: login=%s, error=%s", login, e, exc_info=True)
             await self.session.rollback()
             raise
 
@@ -70,11 +72,11 @@ class UsersRepository:
         login: Optional[str] = None,
         hash_password: Optional[str] = None,
     ) -> Optional[UsersORM]:
-        logger.debug(f"Updating user in database: id={user_id}")
+        logger.debug("Updating user in database: id=%s", user_id)
         try:
             user = await self.get_by_id(user_id)
             if not user:
-                logger.debug(f"User not found for update: id={user_id}")
+                logger.debug("User not found for update: id=%s", user_id)
                 return None
 
             if username is not None:
@@ -86,28 +88,28 @@ class UsersRepository:
 
             await self.session.commit()
             await self.session.refresh(user)
-            logger.debug(f"User updated in database: id={user_id}")
+            logger.debug("User updated in database: id=%s", user_id)
             return user
         except Exception as e:
-            logger.error(f"Failed to update user in database: id={user_id}, error={e}", exc_info=True)
+            logger.error("Failed to update user in database: id=%s, error=%s", user_id, e, exc_info=True)
             await self.session.rollback()
             raise
 
     # ---------- Удаление ----------
 
     async def delete(self, user_id: int) -> bool:
-        logger.debug(f"Deleting user from database: id={user_id}")
+        logger.debug("Deleting user from database: id=%s", user_id)
         try:
             user = await self.get_by_id(user_id)
             if not user:
-                logger.debug(f"User not found for deletion: id={user_id}")
+                logger.debug("User not found for deletion: id=%s", user_id)
                 return False
 
             await self.session.delete(user)
             await self.session.commit()
-            logger.debug(f"User deleted from database: id={user_id}")
+            logger.debug("User deleted from database: id=%s", user_id)
             return True
         except Exception as e:
-            logger.error(f"Failed to delete user from database: id={user_id}, error={e}", exc_info=True)
+            logger.error("Failed to delete user from database: id=%s, error=%s", user_id, e, exc_info=True)
             await self.session.rollback()
             raise
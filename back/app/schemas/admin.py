@@ -0,0 +1,43 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class QueryStat(BaseModel):
+    engine: str
+    statement: str
+    calls: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    rows: int
+    slow_calls: int
+    origins: Dict[str, int]
+    last_params: Optional[str] = None
+    last_plan: Optional[str] = None
+
+class QueryStatsResponse(BaseModel):
+    slow_query_ms: float
+    untracked_calls: int
+    queries: List[QueryStat]
+
+class PoolLiveness(BaseModel):
+    ok: bool
+    checked_at: float
+    latency_ms: float
+
+class PoolStatus(BaseModel):
+    engine: str
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    timeout: float
+    recycle: int
+    pre_ping: bool
+    prepared_statement_cache_size: int
+    checkouts: int
+    wait_mean_ms: float
+    liveness: Optional[PoolLiveness] = None
+
+class PoolStatusResponse(BaseModel):
+    pools: List[PoolStatus]
@@ -4,11 +4,12 @@ import asyncio
 from datetime import datetime, timedelta
 from typing import Iterable
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 
 from app.core.session import engine, mock_engine
-from app.core.db import Base, UsersORM, AmountORM, TransactionORM
+from app.core.db import AmountORM, TransactionORM, UsersORM
+from app.core.schema import ensure_schema
 
 
 TARGET_LOGINS: tuple[str, ...] = ("admin", "test")
@@ -19,22 +20,36 @@ TARGET_LOGINS: tuple[str, ...] = ("admin", "test")
 VISIBLE_NAME = "test"
 HIDDEN_SUFFIX = "\u200B"   # Zero-Width Space
 
+# Ключ advisory lock: параллельные воркеры не заполнят один счёт дважды
+SEED_LOCK_KEY = 0x5EED_A11
+
 
 async def init_mock_db() -> None:
     """Создаёт таблицы в mock БД (идемпотентно)."""
-    async with mock_engine.begin() as conn:
-        await conn.run_sync(
-            Base.metadata.create_all,
-            tables=[AmountORM.__table__, TransactionORM.__table__],
-        )
+    await ensure_schema(mock_engine, "mock", [AmountORM.__table__, TransactionORM.__table__])
+
 
+async def fetch_existing_logins(logins: Iterable[str]) -> set[str]:
+    """Читаем логины пользователей из ОСНОВНОЙ БД."""
+    async with engine.connect() as conn:
+        res = await conn.execute(select(UsersORM.login).where(UsersORM.login.in_(list(logins))))
+        return set(res.scalars())
 
-async def fetch_users_by_login(logins: Iterable[str]) -> list[UsersORM]:
-    """Читаем пользователей из ОСНОВНОЙ БД по логинам."""
-    session_maker = async_sessionmaker(engine, expire_on_commit=False)
-    async with session_maker() as session:
-        res = await session.execute(select(UsersORM).where(UsersORM.login.in_(list(logins))))
-        return list(res.scalars().all())
+
+async def fetch_seeded_amounts(conn, names: list[str]) -> set[str]:
+    """Имена счетов mock БД, у которых уже есть транзакции."""
+    has_transactions = (
+        select(TransactionORM.id).where(TransactionORM.amount_id == AmountORM.id).exists()
+    )
+    res = await conn.execute(
+        select(AmountORM.name).where(AmountORM.name.in_(names), has_transactions)
+    )
+    return set(res.scalars())
+
+
+async def fetch_seeded_amounts_once(names: list[str]) -> set[str]:
+    async with mock_engine.connect() as conn:
+        return await fetch_seeded_amounts(conn, names)
 
 
 def amount_name_for(owner_login: str) -> str:
@@ -72,71 +87,78 @@ def build_transactions_for(owner_login: str) -> list[dict]:
     ]
 
 
-async def ensure_amount(mock_session, owner_login: str) -> AmountORM:
-    """Создаёт/возвращает счёт для владельца. Имя визуально 'test' для обоих, но в БД разные."""
-    name = amount_name_for(owner_login)
-    res = await mock_session.execute(select(AmountORM).where(AmountORM.name == name))
-    amount = res.scalar_one_or_none()
-    if amount is None:
-        amount = AmountORM(name=name, count=0.0)
-        mock_session.add(amount)
-        await mock_session.flush()
-        shown = VISIBLE_NAME
-        suffix_info = " (zero-width suffix)" if name != VISIBLE_NAME else ""
-        print(f"✅ Created amount '{shown}'{suffix_info} for '{owner_login}' (id={amount.id})")
-    else:
-        print(f"ℹ Amount for '{owner_login}' already exists (id={amount.id}, name stored='{amount.name}')")
-    return amount
-
-
 async def seed_amounts_and_transactions() -> None:
-    """Создаёт у admin и test по отдельному счёту 'test' (визуально) и транзакции к ним."""
-    # Проверяем наличие пользователей в основной БД
-    users = await fetch_users_by_login(TARGET_LOGINS)
-    existing = {u.login for u in users}
+    """
+    Создаёт у admin и test по отдельному счёту 'test' (визуально) и транзакции к ним.
+
+    Если всё уже заполнено, обходится двумя параллельными SELECT (основная
+    и mock БД). Иначе счета, транзакции и балансы пишутся тремя пакетными
+    запросами в одной транзакции.
+    """
+    all_names = [amount_name_for(login) for login in TARGET_LOGINS]
+    existing, seeded = await asyncio.gather(
+        fetch_existing_logins(TARGET_LOGINS),
+        fetch_seeded_amounts_once(all_names),
+    )
     missing = [l for l in TARGET_LOGINS if l not in existing]
     if missing:
         print(f"⚠ Users not found in main DB: {missing}. Сначала запустите seed_users.py")
         # продолжаем для тех, кто есть
-    if not users:
+    if not existing:
         print("⚠ No target users found. Exit.")
         return
 
-    mock_session_maker = async_sessionmaker(mock_engine, expire_on_commit=False)
-    async with mock_session_maker() as mock_session:
-        for owner_login in TARGET_LOGINS:
-            if owner_login not in existing:
-                continue
-
-            amount = await ensure_amount(mock_session, owner_login)
+    pending = [l for l in TARGET_LOGINS if l in existing and amount_name_for(l) not in seeded]
+    if not pending:
+        print("ℹ Amounts for all target users already have transactions. Skip.")
+        return
 
-            # Проверяем, есть ли уже транзакции
-            res = await mock_session.execute(
-                select(TransactionORM).where(TransactionORM.amount_id == amount.id)
-            )
-            existing_tx = list(res.scalars().all())
-            if existing_tx:
-                print(f"ℹ Amount for '{owner_login}' already has {len(existing_tx)} transactions. Skip.")
-                continue
+    async with mock_engine.begin() as conn:
+        await conn.execute(select(func.pg_advisory_xact_lock(SEED_LOCK_KEY)))
+        # Под блокировкой перепроверяем: другой воркер мог успеть раньше
+        seeded = await fetch_seeded_amounts(conn, [amount_name_for(l) for l in pending])
+        pending = [l for l in pending if amount_name_for(l) not in seeded]
+        if not pending:
+            return
+
+        names = {amount_name_for(l): l for l in pending}
+        await conn.execute(
+            insert(AmountORM)
+            .values([{"name": name, "count": 0.0} for name in names])
+            .on_conflict_do_nothing(index_elements=[AmountORM.name])
+        )
+        res = await conn.execute(
+            select(AmountORM.name, AmountORM.id).where(AmountORM.name.in_(list(names)))
+        )
+        amount_ids = {names[name]: amount_id for name, amount_id in res.all()}
 
+        transactions = []
+        balances = []
+        for owner_login in pending:
             tx_data = build_transactions_for(owner_login)
+            delta = 0.0
             for t in tx_data:
-                tx = TransactionORM(
-                    amount_id=amount.id,
-                    type=t["type"],
-                    category=t["category"],
-                    count=t["count"],
-                    created_at=t["created_at"],
-                )
-                mock_session.add(tx)
+                transactions.append({"amount_id": amount_ids[owner_login], **t})
                 if t["type"] == "income":
-                    amount.count += t["count"]
+                    delta += t["count"]
                 elif t["type"] == "outcome":
-                    amount.count -= t["count"]
+                    delta -= t["count"]
+            balances.append({"amount_id": amount_ids[owner_login], "delta": delta})
+
+        await conn.execute(insert(TransactionORM), transactions)
+        await conn.execute(
+            update(AmountORM)
+            .where(AmountORM.id == bindparam("amount_id"))
+            .values(count=AmountORM.count + bindparam("delta")),
+            balances,
+        )
 
-            await mock_session.commit()
-            # Печатаем видимое имя (оба выглядят как 'test')
-            print(f"✅ Created {len(tx_data)} transactions for '{owner_login}', amount '{VISIBLE_NAME}'. Final balance: {amount.count:.2f}")
+    for owner_login, balance in zip(pending, balances):
+        # Печатаем видимое имя (оба выглядят как 'test')
+        print(
+            f"✅ Created {len(build_transactions_for(owner_login))} transactions for '{owner_login}', "
+            f"amount '{VISIBLE_NAME}' (id={amount_ids[owner_login]}). Balance change: {balance['delta']:.2f}"
+        )
 
 
 async def main() -> None:
@@ -2,52 +2,70 @@
 
 import asyncio
 
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.core.session import engine
-from app.core.db import Base
-from app.repo.user import UsersRepository
-from app.services.users import UsersService
-from app.core.exeptions import UserAlreadyExistsError
+from app.core.db import Base, UsersORM
+from app.core.schema import ensure_schema
+from app.services.security import SecurityManager
+
+
+USERS_DATA = [
+    {
+        "username": "Admin",
+        "login": "admin",
+        "password": "admin12345",
+    },
+    {
+        "username": "Test User",
+        "login": "test",
+        "password": "test12345",
+    },
+]
 
 
 async def init_db() -> None:
     """На всякий случай создаём таблицы (идемпотентно)."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await ensure_schema(engine, "main", Base.metadata.sorted_tables)
 
 
 async def seed_users() -> None:
-    """Создаёт тестовых пользователей через UsersService."""
-    async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    """
+    Создаёт тестовых пользователей одним INSERT ... ON CONFLICT DO NOTHING.
 
-    async with async_session_maker() as session:
-        users_repo = UsersRepository(session)
-        users_service = UsersService(users_repo)
+    Сначала одним запросом проверяем, кто уже есть: если все на месте,
+    ничего не пишем и не хэшируем пароли.
+    """
+    logins = [data["login"] for data in USERS_DATA]
+    async with engine.begin() as conn:
+        result = await conn.execute(select(UsersORM.login).where(UsersORM.login.in_(logins)))
+        existing = set(result.scalars())
+        for login in logins:
+            if login in existing:
+                print(f"⚠ User with login={login} already exists, skip")
 
-        users_data = [
-            {
-                "username": "Admin",
-                "login": "admin",
-                "password": "admin12345",
-            },
+        rows = [
             {
-                "username": "Test User",
-                "login": "test",
-                "password": "test12345",
-            },
+                "username": data["username"],
+                "login": data["login"],
+                "hash_password": SecurityManager.hash_password(data["password"]),
+            }
+            for data in USERS_DATA
+            if data["login"] not in existing
         ]
+        if not rows:
+            return
 
-        for data in users_data:
-            try:
-                user = await users_service.register_user(
-                    username=data["username"],
-                    login=data["login"],
-                    password=data["password"],
-                )
-                print(f"✅ Created user: id={user.id}, login={user.login}")
-            except UserAlreadyExistsError:
-                print(f"⚠ User with login={data['login']} already exists, skip")
+        # ON CONFLICT защищает от параллельного запуска нескольких воркеров
+        result = await conn.execute(
+            insert(UsersORM)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[UsersORM.login])
+            .returning(UsersORM.id, UsersORM.login)
+        )
+        for user_id, login in result.all():
+            print(f"✅ Created user: id={user_id}, login={login}")
 
 
 async def main() -> None:
@@ -1,9 +1,12 @@
+import time
 from enum import Enum
 
 import httpx
 
 from app.core.config import settings
 from app.core.logger import get_logger
+from app.core.metrics import observe_ollama
+from app.core.tracing import CLIENT, set_ollama_attributes, start_span
 
 logger = get_logger(__name__)
 
@@ -38,24 +41,34 @@ class AIService:
         INPUT: {prompt}
         """.format(prompt=prompt)
 
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    settings.OLLAMA_URL,
-                    json={"prompt": classification_prompt, "stream": False},
-                    timeout=30.0,
-                )
-            response.raise_for_status()
-        except Exception as exc:
-            logger.error("AI classification request failed: %r", exc, exc_info=True)
-            # Фоллбек - маркетинговый шаблон
-            return AISegment.MRKT
+        started = time.perf_counter()
+        with start_span("ollama.classification", kind=CLIENT, **{"ai.stage": "classification"}) as span:
+            try:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        settings.OLLAMA_URL,
+                        json={"prompt": classification_prompt, "stream": False},
+                        timeout=30.0,
+                    )
+                response.raise_for_status()
+            except Exception as exc:
+                observe_ollama("classification", time.perf_counter() - started)
+                if span is not None:
+                    span.record_exception(exc)
+                logger.error("AI classification request failed: %r", exc, exc_info=True)
+                # Фоллбек - маркетинговый шаблон
+                return AISegment.MRKT
 
-        try:
-            data = response.json()
-        except Exception as exc:
-            logger.error("AI classification invalid JSON: %r", exc, exc_info=True)
-            return AISegment.MRKT
+            try:
+                data = response.json()
+            except Exception as exc:
+                observe_ollama("classification", time.perf_counter() - started)
+                if span is not None:
+                    span.record_exception(exc)
+                logger.error("AI classification invalid JSON: %r", exc, exc_info=True)
+                return AISegment.MRKT
+            observe_ollama("classification", time.perf_counter() - started, data)
+            set_ollama_attributes(span, data)
 
         raw = str(data.get("message", "")).strip()
         # Поддерживаем оба варианта: [FIN] и FIN
@@ -8,6 +8,8 @@ from datetime import datetime
 from app.repo.amount import AmountRepository
 from app.core.db import AmountORM, TransactionORM
 from app.core.logger import get_logger
+from app.core.session import read_target
+from app.core.singleflight import SingleFlight
 from app.core.exeptions import (
     AmountNotFoundError,
     AmountAlreadyExistsError,
@@ -23,6 +25,12 @@ from app.schemas.amount import (
 
 logger = get_logger(__name__)
 
+# Одинаковые одновременные чтения (обновление дашборда во многих вкладках)
+# выполняют один запрос к БД; записи сбрасывают идущие вызовы. Ключ
+# начинается с маршрута чтения (primary/replica), чтобы недавно писавший
+# пользователь не получил результат чтения с реплики
+_reads = SingleFlight("amount_reads")
+
 
 class AmountService:
     """
@@ -34,6 +42,9 @@ class AmountService:
     def __init__(self, amount_repo: AmountRepository) -> None:
         self.amount_repo = amount_repo
 
+    def _read_key(self, *key: Any) -> tuple:
+        return (read_target(self.amount_repo.session), *key)
+
     # ---------- Работа со счетами ----------
 
     async def get_amount_by_name(self, name: str) -> AmountORM:
@@ -49,12 +60,12 @@ class AmountService:
         Raises:
             AmountNotFoundError: Если счёт не найден
         """
-        logger.debug(f"Getting amount by name: {name}")
+        logger.debug("Getting amount by name: %s", name)
         amount = await self.amount_repo.get_amount_by_name(name)
         if not amount:
-            logger.warning(f"Amount not found: {name}")
+            logger.warning("Amount not found: %s", name)
             raise AmountNotFoundError(f"Amount with name={name} not found")
-        logger.debug(f"Amount found: name={name}, count={amount.count}")
+        logger.debug("Amount found: name=%s, count=%s", name, amount.count)
         return amount
 
     async def get_all_amounts(self) -> AmountListResponse:
@@ -64,6 +75,9 @@ class AmountService:
         Returns:
             Список всех счетов
         """
+        return await _reads.do(self._read_key("amounts"), self._load_all_amounts)
+
+    async def _load_all_amounts(self) -> AmountListResponse:
         logger.debug("Getting all amounts")
         amounts = await self.amount_repo.get_all_amounts()
         
@@ -72,7 +86,7 @@ class AmountService:
             for amount in amounts
         ]
         
-        logger.debug(f"Retrieved {len(amount_responses)} amounts")
+        logger.debug("Retrieved %s amounts", len(amount_responses))
         return AmountListResponse(
             amounts=amount_responses,
             limit_data=len(amount_responses)
@@ -93,25 +107,26 @@ class AmountService:
             AmountAlreadyExistsError: Если счёт с таким именем уже существует
             InvalidAmountDataError: Если данные некорректны (отрицательный баланс)
         """
-        logger.info(f"Creating amount: name={name}, count={count}")
+        logger.info("Creating amount: name=%s, count=%s", name, count)
         
         # Проверяем, не существует ли уже счёт с таким именем
         existing_amount = await self.amount_repo.get_amount_by_name(name)
         if existing_amount:
-            logger.warning(f"Amount creation failed: Account already exists - name={name}")
+            logger.warning("Amount creation failed: Account already exists - name=%s", name)
             raise AmountAlreadyExistsError(f"Amount with name={name} already exists")
         
         # Валидация суммы (не может быть отрицательной)
         if count < 0:
-            logger.warning(f"Amount creation failed: Negative count - name={name}, count={count}")
+            logger.warning("Amount creation failed: Negative count - name=%s, count=%s", name, count)
             raise InvalidAmountDataError("Amount count cannot be negative")
         
         try:
             amount = await self.amount_repo.create_amount(name, count)
-            logger.info(f"Amount created successfully: name={amount.name}, count={amount.count}")
+            _reads.forget()
+            logger.info("Amount created successfully: name=%s, count=%s", amount.name, amount.count)
             return amount
         except Exception as e:
-            logger.error(f"Amount creation failed: Unexpected error - name={name}, error={e}", exc_info=True)
+            logger.error("Amount creation failed: Unexpected error - name=%s, error=%s", name, e, exc_info=True)
             raise InvalidAmountDataError(f"Failed to create amount: {str(e)}")
 
     # ---------- Работа с транзакциями ----------
@@ -129,13 +144,19 @@ class AmountService:
         Raises:
             AmountNotFoundError: Если счёт не найден
         """
-        logger.debug(f"Getting latest transaction for account: {account_name}")
+        return await _reads.do(
+            self._read_key("latest_transaction", account_name),
+            lambda: self._load_latest_transaction(account_name),
+        )
+
+    async def _load_latest_transaction(self, account_name: str) -> Optional[Dict[str, Any]]:
+        logger.debug("Getting latest transaction for account: %s", account_name)
         amount = await self.get_amount_by_name(account_name)
         
         transaction = await self.amount_repo.get_latest_transaction(amount.id)
         
         if not transaction:
-            logger.debug(f"No transactions found for account: {account_name}")
+            logger.debug("No transactions found for account: %s", account_name)
             return None
         
         return {
@@ -167,14 +188,27 @@ class AmountService:
             AmountNotFoundError: Если счёт не найден
             InvalidTransactionDataError: Если данные некорректны (неверный тип или формат даты)
         """
+        return await _reads.do(
+            self._read_key("history", account_name, from_date, to_date, transaction_type),
+            lambda: self._load_transaction_history(account_name, from_date, to_date, transaction_type),
+        )
+
+    async def _load_transaction_history(
+        self,
+        account_name: str,
+        from_date: Optional[str],
+        to_date: Optional[str],
+        transaction_type: Optional[str],
+    ) -> HistoryResponse:
         logger.info(
-            f"Getting transaction history: account={account_name}, "
-            f"from={from_date}, to={to_date}, type={transaction_type}"
+            "Getting transaction history: account=%s, "
+            "from=%s, to=%s, type=%s",
+            account_name, from_date, to_date, transaction_type
         )
         
         # Проверка типа транзакции
         if transaction_type and transaction_type not in ['input', 'output', 'income', 'outcome']:
-            logger.warning(f"Invalid transaction type: {transaction_type}")
+            logger.warning("Invalid transaction type: %s", transaction_type)
             raise InvalidTransactionDataError("Incorrect type of request")
         
         # Преобразуем input/output в income/outcome для внутреннего использования
@@ -196,7 +230,7 @@ class AmountService:
             try:
                 from_dt = datetime.strptime(from_date, "%Y-%m-%d")
             except ValueError as e:
-                logger.warning(f"Invalid from_date format: {from_date}")
+                logger.warning("Invalid from_date format: %s", from_date)
                 raise InvalidTransactionDataError("Incorrect type of request") from e
         if to_date:
             try:
@@ -204,7 +238,7 @@ class AmountService:
                 # Добавляем время конца дня
                 to_dt = to_dt.replace(hour=23, minute=59, second=59)
             except ValueError as e:
-                logger.warning(f"Invalid to_date format: {to_date}")
+                logger.warning("Invalid to_date format: %s", to_date)
                 raise InvalidTransactionDataError("Incorrect type of request") from e
         
         # Получаем транзакции
@@ -225,7 +259,7 @@ class AmountService:
             for trans in transactions
         ]
         
-        logger.debug(f"Retrieved {len(transaction_items)} transactions for account: {account_name}")
+        logger.debug("Retrieved %s transactions for account: %s", len(transaction_items), account_name)
         
         return HistoryResponse(
             name=amount.name,
@@ -257,18 +291,19 @@ class AmountService:
             InvalidTransactionDataError: Если данные некорректны
         """
         logger.info(
-            f"Creating transaction: account={account_name}, type={transaction_type}, "
-            f"category={category}, count={count}"
+            "Creating transaction: account=%s, type=%s, "
+            "category=%s, count=%s",
+            account_name, transaction_type, category, count
         )
         
         # Валидация типа транзакции
         if transaction_type not in ['income', 'outcome']:
-            logger.warning(f"Transaction creation failed: Invalid type - type={transaction_type}")
+            logger.warning("Transaction creation failed: Invalid type - type=%s", transaction_type)
             raise InvalidTransactionDataError("Transaction type must be 'income' or 'outcome'")
         
         # Валидация суммы
         if count <= 0:
-            logger.warning(f"Transaction creation failed: Invalid count - count={count}")
+            logger.warning("Transaction creation failed: Invalid count - count=%s", count)
             raise InvalidTransactionDataError("Transaction count must be greater than 0")
         
         # Получаем счёт
@@ -281,16 +316,18 @@ class AmountService:
                 category,
                 count
             )
+            _reads.forget()
             # Получаем обновлённый amount после транзакции
             updated_amount = await self.amount_repo.get_amount_by_name(account_name)
             logger.info(
-                f"Transaction created successfully: account_id={updated_amount.id}, "
-                f"type={transaction_type}, count={count}, new_balance={updated_amount.count}"
+                "Transaction created successfully: account_id=%s, "
+                "type=%s, count=%s, new_balance=%s",
+                updated_amount.id, transaction_type, count, updated_amount.count
             )
             return transaction
         except Exception as e:
             logger.error(
-                f"Transaction creation failed: Unexpected error - account={account_name}, error={e}",
+                "Transaction creation failed: Unexpected error - account=%s, error=%s", account_name, e,
                 exc_info=True
             )
             raise InvalidTransactionDataError(f"Failed to create transaction: {str(e)}") from e
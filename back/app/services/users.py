@@ -26,21 +26,21 @@ class UsersService:
     # ---------- Чтение ----------
 
     async def get_user_by_id(self, user_id: int) -> UsersORM:
-        logger.debug(f"Getting user by id: {user_id}")
+        logger.debug("Getting user by id: %s", user_id)
         user = await self.users_repo.get_by_id(user_id)
         if not user:
-            logger.warning(f"User not found by id: {user_id}")
+            logger.warning("User not found by id: %s", user_id)
             raise UserNotFoundError(f"User with id={user_id} not found")
-        logger.debug(f"User found: id={user_id}, login={user.login}")
+        logger.debug("User found: id=%s, login=%s", user_id, user.login)
         return user
 
     async def get_user_by_login(self, login: str) -> UsersORM:
-        logger.debug(f"Getting user by login: {login}")
+        logger.debug("Getting user by login: %s", login)
         user = await self.users_repo.get_by_login(login)
         if not user:
-            logger.warning(f"User not found by login: {login}")
+            logger.warning("User not found by login: %s", login)
             raise UserNotFoundError(f"User with login={login} not found")
-        logger.debug(f"User found: id={user.id}, login={login}")
+        logger.debug("User found: id=%s, login=%s", user.id, login)
         return user
 
     async def list_users(
@@ -59,11 +59,11 @@ class UsersService:
         login: str,
         password: str,
     ) -> UsersORM:
-        logger.info(f"Registering new user: login={login}, username={username}")
+        logger.info("Registering new user: login=%s, username=%s", login, username)
         # Проверяем, что логин свободен
         existing = await self.users_repo.get_by_login(login)
         if existing:
-            logger.warning(f"User registration failed: Login already exists - login={login}")
+            logger.warning("User registration failed: Login already exists - login=%s", login)
             raise UserAlreadyExistsError(
                 f"User with login={login} already exists"
             )
@@ -74,7 +74,7 @@ class UsersService:
             login=login,
             hash_password=hashed,
         )
-        logger.info(f"User registered successfully: id={user.id}, login={login}")
+        logger.info("User registered successfully: id=%s, login=%s", user.id, login)
         return user
 
     async def authenticate_user(
@@ -83,19 +83,19 @@ class UsersService:
         login: str,
         password: str,
     ) -> UsersORM:
-        logger.debug(f"Authenticating user: login={login}")
+        logger.debug("Authenticating user: login=%s", login)
         user = await self.users_repo.get_by_login(login)
         if not user:
             # логин не существует
-            logger.warning(f"Authentication failed: User not found - login={login}")
+            logger.warning("Authentication failed: User not found - login=%s", login)
             raise InvalidCredentialsError("Invalid login or password")
 
         if not SecurityManager.verify_password(password, user.hash_password):
             # пароль не совпал
-            logger.warning(f"Authentication failed: Invalid password - login={login}")
+            logger.warning("Authentication failed: Invalid password - login=%s", login)
             raise InvalidCredentialsError("Invalid login or password")
 
-        logger.debug(f"User authenticated successfully: id={user.id}, login={login}")
+        logger.debug("User authenticated successfully: id=%s, login=%s", user.id, login)
         return user
 
     # ---------- Обновление ----------
@@ -108,12 +108,12 @@ class UsersService:
         login: Optional[str] = None,
         password: Optional[str] = None,
     ) -> UsersORM:
-        logger.info(f"Updating user: id={user_id}, username={username}, login={login}")
+        logger.info("Updating user: id=%s, username=%s, login=%s", user_id, username, login)
         # Можно добавить отдельные проверки, например уникальность login
         new_hash: Optional[str] = None
         if password is not None:
             new_hash = SecurityManager.hash_password(password)
-            logger.debug(f"Password hash generated for user: id={user_id}")
+            logger.debug("Password hash generated for user: id=%s", user_id)
 
         user = await self.users_repo.update(
             user_id=user_id,
@@ -122,17 +122,17 @@ class UsersService:
             hash_password=new_hash,
         )
         if not user:
-            logger.warning(f"User update failed: User not found - id={user_id}")
+            logger.warning("User update failed: User not found - id=%s", user_id)
             raise UserNotFoundError(f"User with id={user_id} not found")
-        logger.info(f"User updated successfully: id={user_id}")
+        logger.info("User updated successfully: id=%s", user_id)
         return user
 
     # ---------- Удаление ----------
 
     async def delete_user(self, user_id: int) -> None:
-        logger.info(f"Deleting user: id={user_id}")
+        logger.info("Deleting user: id=%s", user_id)
         ok = await self.users_repo.delete(user_id)
         if not ok:
-            logger.warning(f"User deletion failed: User not found - id={user_id}")
+            logger.warning("User deletion failed: User not found - id=%s", user_id)
             raise UserNotFoundError(f"User with id={user_id} not found")
-        logger.info(f"User deleted successfully: id={user_id}")
+        logger.info("User deleted successfully: id=%s", user_id)
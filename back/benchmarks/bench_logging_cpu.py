@@ -0,0 +1,146 @@
+"""
+Бенчмарк CPU, которое тратится на логирование в одном запросе.
+
+Воспроизводится набор записей запроса GET /api/amount/history:
+две записи LoggingMiddleware, INFO и три DEBUG записи AmountService.
+Сравниваются:
+  - legacy:  f-строки через logging.Logger (как было раньше);
+  - lazy:    %-стиль через SampledLogger без сэмплирования;
+  - sampled: %-стиль, успешные запросы пишутся с долей --sample-rate.
+
+Меряется CPU потока, который логирует (time.thread_time), т.е. то, что
+отнимается у event loop. Запись на диск происходит в потоке QueueListener.
+
+Запуск (из директории back/):
+    python -m benchmarks.bench_logging_cpu --requests 50000
+"""
+import argparse
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueListener
+
+for _key, _value in {
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_DB": "bench",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "SECRET_KEY": "bench",
+    "PASSWORD_MIN_LENGTH": "8",
+    "MOCK_POSTGRES_USER": "bench",
+    "MOCK_POSTGRES_PASSWORD": "bench",
+    "MOCK_POSTGRES_DB": "bench",
+    "LOG_FILE": "",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from app.core.logger import DroppingQueueHandler, SampledLogger, shutdown_logging
+
+ACCOUNT = "test"
+QUERY = "name=test&from_date=2024-01-01&to_date=2024-01-31"
+
+
+class Amount:
+    id = 1
+    name = ACCOUNT
+    count = 123456.78
+
+
+def legacy_request(middleware: logging.Logger, service: logging.Logger) -> None:
+    amount = Amount()
+    start = time.time()
+    middleware.info(f"Request started: GET /api/amount/history" + f"?{QUERY}" + f" from 127.0.0.1")
+    service.info(
+        f"Getting transaction history: account={ACCOUNT}, "
+        f"from=2024-01-01, to=2024-01-31, type={None}"
+    )
+    service.debug(f"Getting amount by name: {ACCOUNT}")
+    service.debug(f"Amount found: name={ACCOUNT}, count={amount.count}")
+    service.debug(f"Retrieved {42} transactions for account: {ACCOUNT}")
+    middleware.info(
+        f"Request completed: GET /api/amount/history - "
+        f"Status: {200} - "
+        f"Time: {time.time() - start:.3f}s"
+    )
+
+
+def lazy_request(middleware: SampledLogger, service: SampledLogger) -> None:
+    amount = Amount()
+    start = time.perf_counter()
+    sampled = middleware.sample()
+    if sampled:
+        middleware.info("Request started: %s %s%s from %s", "GET", "/api/amount/history", "?" + QUERY, "127.0.0.1", always=True)
+    service.info(
+        "Getting transaction history: account=%s, "
+        "from=%s, to=%s, type=%s",
+        ACCOUNT, "2024-01-01", "2024-01-31", None
+    )
+    service.debug("Getting amount by name: %s", ACCOUNT)
+    service.debug("Amount found: name=%s, count=%s", ACCOUNT, amount.count)
+    service.debug("Retrieved %s transactions for account: %s", 42, ACCOUNT)
+    if sampled:
+        middleware.info(
+            "Request completed: %s %s - Status: %d - Time: %.3fs - TTFB: %.3fs - Bytes: %d",
+            "GET", "/api/amount/history", 200, time.perf_counter() - start, 0.0, 0,
+            always=True,
+        )
+
+
+def measure(fn, args, total: int) -> float:
+    for _ in range(1000):
+        fn(*args)
+    start = time.thread_time()
+    for _ in range(total):
+        fn(*args)
+    return (time.thread_time() - start) / total * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    # Тот же конвейер, что в приложении: QueueHandler -> поток -> stdout/файл.
+    # Поток пишет в /dev/null, чтобы не упираться в терминал.
+    shutdown_logging()
+    devnull = open(os.devnull, "w")
+    sink = logging.StreamHandler(devnull)
+    sink.setFormatter(logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - "
+        "%(filename)s:%(lineno)d - %(funcName)s() - %(message)s"
+    ))
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=1_000_000))
+    listener = QueueListener(queue_handler.queue, sink)
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(logging.INFO)
+    listener.start()
+
+    middleware = logging.getLogger("bench.middleware")
+    service = logging.getLogger("bench.service")
+
+    results = {
+        "legacy": measure(legacy_request, (middleware, service), args.requests),
+        "lazy": measure(
+            lazy_request,
+            (SampledLogger(middleware), SampledLogger(service)),
+            args.requests,
+        ),
+        f"sampled ({args.sample_rate:g})": measure(
+            lazy_request,
+            (SampledLogger(middleware, args.sample_rate), SampledLogger(service, args.sample_rate)),
+            args.requests,
+        ),
+    }
+    listener.stop()
+
+    baseline = results["legacy"]
+    print(f"{'variant':<16} {'us/request':>11} {'vs legacy':>10}")
+    for name, value in results.items():
+        print(f"{name:<16} {value:>11.2f} {value / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Бенчмарк LoggingMiddleware: старая версия на BaseHTTPMiddleware против
+чистого ASGI middleware.
+
+Запросы гоняются in-process через httpx.ASGITransport, поэтому сеть и
+uvicorn в замер не попадают — видна только стоимость самого middleware.
+
+Запуск (из директории back/):
+    python -m benchmarks.bench_logging_middleware --requests 5000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Callable
+
+# Settings требует обязательные переменные окружения — для бенчмарка
+# подставляем заглушки, к БД никто не подключается.
+for _key, _value in {
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_DB": "bench",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "SECRET_KEY": "bench",
+    "PASSWORD_MIN_LENGTH": "8",
+    "MOCK_POSTGRES_USER": "bench",
+    "MOCK_POSTGRES_PASSWORD": "bench",
+    "MOCK_POSTGRES_DB": "bench",
+    "LOG_FILE": "",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.middleware import LoggingMiddleware
+
+logger = logging.getLogger("benchmarks.legacy_middleware")
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """Копия прежней реализации LoggingMiddleware — точка отсчёта."""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        start_time = time.time()
+        client_ip = request.client.host if request.client else "unknown"
+        method = request.method
+        path = request.url.path
+        query_params = str(request.query_params) if request.query_params else ""
+
+        logger.info(
+            f"Request started: {method} {path}"
+            + (f"?{query_params}" if query_params else "")
+            + f" from {client_ip}"
+        )
+        try:
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            logger.info(
+                f"Request completed: {method} {path} - "
+                f"Status: {response.status_code} - "
+                f"Time: {process_time:.3f}s"
+            )
+            return response
+        except Exception as e:
+            process_time = time.time() - start_time
+            logger.error(
+                f"Request failed: {method} {path} - "
+                f"Error: {str(e)} - "
+                f"Time: {process_time:.3f}s",
+                exc_info=True,
+            )
+            raise
+
+
+def build_app(middleware_cls) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware_cls)
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    @app.get("/stream")
+    async def stream():
+        async def generate():
+            for i in range(50):
+                yield f"chunk {i}\n"
+
+        return StreamingResponse(generate(), media_type="text/plain")
+
+    return app
+
+
+async def run(app: FastAPI, path: str, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Прогрев
+        for _ in range(50):
+            await client.get(path)
+
+        remaining = total
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get(path, params={"name": "test", "from_date": "2024-01-01"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    # Логи уходят в никуда: меряем форматирование и накладные расходы,
+    # а не скорость терминала.
+    root = logging.getLogger()
+    root.handlers[:] = [logging.NullHandler()]
+    root.setLevel(args.log_level.upper())
+
+    print(f"{'endpoint':<10} {'legacy req/s':>14} {'asgi req/s':>12} {'speedup':>9}")
+    for path in ("/ping", "/stream"):
+        legacy = await run(build_app(LegacyLoggingMiddleware), path, args.requests, args.concurrency)
+        asgi = await run(build_app(LoggingMiddleware), path, args.requests, args.concurrency)
+        print(f"{path:<10} {legacy:>14.0f} {asgi:>12.0f} {asgi / legacy:>8.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Бенчмарк выдачи соединения из пула: pool_pre_ping против фоновой проверки.
+
+Каждая итерация — то, что делает типичный запрос к API: открыть сессию,
+выполнить один SELECT и вернуть соединение в пул. С pool_pre_ping к каждой
+выдаче добавляется ping соединения, то есть лишний round trip до БД.
+
+Нужна запущенная PostgreSQL (URL берётся из ASYNC_DATABASE_URL).
+Запуск (из директории back/):
+    python -m benchmarks.bench_pool_checkout --iterations 2000 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import time
+
+for _key, _value in {
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_DB": "bench",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "SECRET_KEY": "bench",
+    "PASSWORD_MIN_LENGTH": "8",
+    "MOCK_POSTGRES_USER": "bench",
+    "MOCK_POSTGRES_PASSWORD": "bench",
+    "MOCK_POSTGRES_DB": "bench",
+    "LOG_FILE": "",
+    "LOG_LEVEL": "WARNING",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+
+
+async def measure(pre_ping: bool, iterations: int) -> float:
+    engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL_computed,
+        pool_pre_ping=pre_ping,
+        pool_size=settings.DB_POOL_SIZE,
+        connect_args={"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+    )
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession)
+    statement = text("SELECT 1")
+    try:
+        for _ in range(100):
+            async with sessions() as session:
+                await session.execute(statement)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            async with sessions() as session:
+                await session.execute(statement)
+        return (time.perf_counter() - start) / iterations * 1e6
+    finally:
+        await engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # Варианты чередуются, берётся лучший раунд — так меньше влияет шум машины
+    results = {"pre_ping": float("inf"), "recycle+liveness": float("inf")}
+    for _ in range(args.rounds):
+        results["pre_ping"] = min(results["pre_ping"], await measure(True, args.iterations))
+        results["recycle+liveness"] = min(results["recycle+liveness"], await measure(False, args.iterations))
+    baseline = results["pre_ping"]
+    print(f"{'variant':<18} {'us/request':>11} {'vs pre_ping':>12}")
+    for name, value in results.items():
+        print(f"{name:<18} {value:>11.1f} {value / baseline:>11.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,23 +1,29 @@
 from contextlib import asynccontextmanager
 import asyncio
 import os
+import time
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from sqlalchemy import text
 
-from app.core.session import engine, mock_engine
-from app.core.db import Base
-from app.core.middleware import LoggingMiddleware
+from app.core.config import settings
+from app.core.loop_monitor import LoopMonitor
+from app.core.pool import run_pool_liveness
+from app.core.profiling import ProfilingMiddleware
+from app.core.schema import ensure_schema, wait_for_db
+from app.core.shutdown import DrainMiddleware, finish_drain, start_drain_tracking
+from app.core.session import ReadYourWritesMiddleware, engine, engines, mock_engine
+from app.core.db import AmountORM, Base, TransactionORM
+from app.core.middleware import LoadShedMiddleware, LoggingMiddleware, MetricsMiddleware, TracingMiddleware
 from app.core.logger import get_logger
 from app.core.error_handlers import (
     http_exception_handler,
     validation_exception_handler,
     general_exception_handler,
 )
-from app.api import health_router, auth_router, amount_router
+from app.api import health_router, auth_router, amount_router, metrics_router, admin_router
 
 logger = get_logger(__name__)
 
@@ -25,89 +31,77 @@ logger = get_logger(__name__)
 AUTO_SEED = os.getenv("AUTO_SEED", "true").lower() == "true"
 
 
-async def wait_for_db(engine_instance, db_name: str, max_retries: int = 30, delay: float = 2.0):
-    """Ожидает готовности БД с повторными попытками"""
-    for attempt in range(max_retries):
-        try:
-            async with engine_instance.begin() as conn:
-                await conn.execute(text("SELECT 1"))
-            logger.info(f"{db_name} database is ready")
-            return True
-        except Exception as e:
-            if attempt < max_retries - 1:
-                logger.warning(f"{db_name} database not ready yet (attempt {attempt + 1}/{max_retries}): {e}")
-                await asyncio.sleep(delay)
-            else:
-                logger.error(f"{db_name} database failed to become ready after {max_retries} attempts")
-                raise
-    return False
+async def prepare_database(engine_instance, name: str, tables) -> None:
+    """Ждёт готовности БД и создаёт таблицы, если схема изменилась."""
+    await wait_for_db(engine_instance, name.capitalize())
+    try:
+        await ensure_schema(engine_instance, name, tables)
+    except Exception as e:
+        logger.error("Failed to create %s database tables: %s", name, e, exc_info=True)
+        raise
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- startup ---
+    started = time.perf_counter()
+    start_drain_tracking()
     logger.info("Application startup: initializing database tables")
-    
-    # Ждём готовности основной БД
-    await wait_for_db(engine, "Main")
-    
-    # Создаём таблицы в основной БД
-    try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Main database tables created successfully")
-    except Exception as e:
-        logger.error(f"Failed to create main database tables: {e}", exc_info=True)
-        raise
-    
-    # Ждём готовности mock БД
-    await wait_for_db(mock_engine, "Mock")
-    
-    # Создаём таблицы в mock БД (только для AmountORM и TransactionORM)
-    from app.core.db import AmountORM, TransactionORM
-    
-    def create_mock_tables(sync_conn):
-        """Создаёт таблицы для mock моделей в синхронном контексте"""
-        AmountORM.__table__.create(sync_conn, checkfirst=True)
-        TransactionORM.__table__.create(sync_conn, checkfirst=True)
-    
-    try:
-        # Создаём таблицы напрямую в mock БД
-        async with mock_engine.begin() as conn:
-            await conn.run_sync(create_mock_tables)
-        logger.info("Mock database tables created successfully")
-    except Exception as e:
-        logger.error(f"Failed to create mock database tables: {e}", exc_info=True)
-        raise
+
+    # Основная и mock БД готовятся параллельно; в mock только AmountORM и TransactionORM
+    await asyncio.gather(
+        prepare_database(engine, "main", Base.metadata.sorted_tables),
+        prepare_database(mock_engine, "mock", [AmountORM.__table__, TransactionORM.__table__]),
+    )
 
     # Автоматический запуск seed скриптов (если включено)
     if AUTO_SEED:
         try:
             logger.info("Running seed scripts...")
-            
-            # Запускаем seed_users
-            from app.scripts.seed_users import main as seed_users_main
-            await seed_users_main()
+
+            # Таблицы уже созданы выше, поэтому вызываем сами seed-функции, без их init
+            from app.scripts.seed_users import seed_users
+            await seed_users()
             logger.info("Seed users completed")
-            
-            # Запускаем seed_amounts
-            from app.scripts.seed_amounts import main as seed_amounts_main
-            await seed_amounts_main()
+
+            from app.scripts.seed_amounts import seed_amounts_and_transactions
+            await seed_amounts_and_transactions()
             logger.info("Seed amounts completed")
-            
+
         except Exception as e:
-            logger.warning(f"Seed scripts failed (non-critical): {e}", exc_info=True)
+            logger.warning("Seed scripts failed (non-critical): %s", e, exc_info=True)
             # Не прерываем запуск приложения, если seed скрипты упали
     else:
         logger.info("Auto-seed disabled (set AUTO_SEED=true to enable)")
 
-    logger.info("Application startup completed")
+    # Фоновая проверка соединений вместо pool_pre_ping
+    liveness_task = None
+    if settings.DB_POOL_LIVENESS_INTERVAL > 0:
+        liveness_task = asyncio.create_task(
+            run_pool_liveness(engines, settings.DB_POOL_LIVENESS_INTERVAL)
+        )
+
+    loop_monitor = None
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor = LoopMonitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_LAG_THRESHOLD_MS / 1000)
+        loop_monitor.start()
+
+    logger.info("Application startup completed in %.3fs", time.perf_counter() - started)
 
     yield
 
     # --- shutdown ---
+    # uvicorn к этому моменту закрыл сокеты и дождался соединений
+    await finish_drain(settings.SHUTDOWN_DRAIN_TIMEOUT)
+    if liveness_task is not None:
+        liveness_task.cancel()
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+
     logger.info("Application shutdown: closing database connections")
-    # если нужно, тут можно сделать await engine.dispose()
+    # Закрываем соединения пулов, чтобы на сервере не оставались сессии
+    await asyncio.gather(*(value.dispose() for value in engines.values()))
+    logger.info("Application shutdown completed")
 
 
 def create_app() -> FastAPI:
@@ -117,8 +111,23 @@ def create_app() -> FastAPI:
         redirect_slashes=False,
     )
 
+    # Окно read-your-writes из cookie нужно только при настроенных репликах
+    if settings.REPLICA_ASYNC_DATABASE_URL or settings.MOCK_REPLICA_ASYNC_DATABASE_URL:
+        app.add_middleware(ReadYourWritesMiddleware)
+    # Профайлер внутри трассировки: в имени файла профиля есть trace id
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
     # Добавляем middleware для логирования (должен быть первым)
     app.add_middleware(LoggingMiddleware)
+    # Трассировка снаружи логирования: в записи о запросе попадает trace id
+    app.add_middleware(TracingMiddleware)
+    # Сброс нагрузки до логирования и трассировки: отказ почти ничего не стоит
+    if settings.LOAD_SHED_ENABLED:
+        app.add_middleware(LoadShedMiddleware)
+    # Метрики снаружи логирования: в латентность попадает и оно
+    app.add_middleware(MetricsMiddleware)
+    # Учёт запросов для плавной остановки снаружи метрик и логирования
+    app.add_middleware(DrainMiddleware)
 
     app.add_middleware(
         CORSMiddleware,
@@ -147,6 +156,8 @@ def create_app() -> FastAPI:
     app.include_router(health_router)
     app.include_router(auth_router)
     app.include_router(amount_router)
+    app.include_router(metrics_router)
+    app.include_router(admin_router)
 
     logger.info("FastAPI application created and configured")
     return app
@@ -0,0 +1,148 @@
+"""
+Бенчмарк очереди к Ollama (src/ollama_scheduler.py) при перегрузке:
+все запросы сразу в Ollama (OLLAMA_SLOTS=0) против слотов с приоритетом
+и бюджетом ожидания.
+
+Ollama заменяет фейковый транспорт httpx с моделью сервера: --capacity
+запросов обрабатываются с полной скоростью, при большем числе скорость
+делится между всеми и дополнительно падает на --degrade за каждый
+лишний запрос (вытеснение KV-кэша, переключения). Классификация —
+--classify-ms работы, ответ — --answer-ms.
+
+Запросы пользователей (классификация, затем стрим ответа) приходят
+пуассоновским потоком --rate в секунду в течение --duration секунд;
+пользователь ждёт не дольше --client-timeout. Печатаются: успешные,
+отклонённые сразу (503), не дождавшиеся ответа, пропускная способность
+и перцентили времени успешных запросов.
+
+Запуск (из директории back/solution/):
+    python -m benchmarks.bench_ollama_scheduler --rate 5 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+
+import httpx
+
+from src.ollama_client import OllamaClient
+from src.ollama_scheduler import OllamaOverloaded, OllamaScheduler
+
+TICK = 0.005
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class FakeOllama:
+    def __init__(self, capacity: int, degrade: float, classify: float, answer: float) -> None:
+        self.capacity = capacity
+        self.degrade = degrade
+        self.work = {"/api/generate": classify, "/api/chat": answer}
+        self.active: dict = {}
+        self.peak = 0
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(TICK)
+            n = len(self.active)
+            if not n:
+                continue
+            self.peak = max(self.peak, n)
+            rate = min(1.0, self.capacity / n) / (1 + self.degrade * max(0, n - self.capacity))
+            for future, remaining in list(self.active.items()):
+                remaining -= TICK * rate
+                if remaining <= 0:
+                    del self.active[future]
+                    if not future.done():
+                        future.set_result(None)
+                else:
+                    self.active[future] = remaining
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        future = asyncio.get_running_loop().create_future()
+        self.active[future] = self.work[request.url.path]
+        try:
+            await future
+        finally:
+            self.active.pop(future, None)
+        if request.url.path == "/api/generate":
+            return httpx.Response(200, json={"response": "[FIN]", "done": True})
+        lines = [{"message": {"content": "ответ"}, "done": False}, {"message": {"content": ""}, "done": True}]
+        return httpx.Response(200, content=b"".join(json.dumps(line).encode() + b"\n" for line in lines))
+
+
+async def user_request(client: OllamaClient, timeout: float) -> tuple:
+    started = time.perf_counter()
+
+    async def pipeline():
+        await client.generate("вопрос", stage="classification")
+        async for _ in client.chat_stream([{"role": "user", "content": "вопрос"}], stage="answer"):
+            pass
+
+    try:
+        await asyncio.wait_for(pipeline(), timeout)
+        return "ok", time.perf_counter() - started
+    except OllamaOverloaded:
+        return "rejected", time.perf_counter() - started
+    except asyncio.TimeoutError:
+        return "timeout", time.perf_counter() - started
+
+
+async def run(args, slots: int) -> dict:
+    fake = FakeOllama(args.capacity, args.degrade, args.classify_ms / 1000, args.answer_ms / 1000)
+    ticker = asyncio.create_task(fake.run())
+    scheduler = OllamaScheduler(slots=slots, max_wait=args.max_wait, queue_limit=0)
+    client = OllamaClient("http://ollama", transport=httpx.MockTransport(fake.handle), scheduler=scheduler)
+    rng = random.Random(args.seed)
+    tasks = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration:
+        tasks.append(asyncio.create_task(user_request(client, args.client_timeout)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    results = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    ticker.cancel()
+    await client.close()
+
+    ok = sorted(seconds for outcome, seconds in results if outcome == "ok")
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(outcome == "rejected" for outcome, _ in results),
+        "timeout": sum(outcome == "timeout" for outcome, _ in results),
+        "throughput": len(ok) / elapsed,
+        "p50": statistics.median(ok) if ok else float("nan"),
+        "p99": ok[min(len(ok) - 1, int(len(ok) * 0.99))] if ok else float("nan"),
+        "peak": fake.peak,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=5.0, help="запросов в секунду")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--capacity", type=int, default=4, help="как OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--degrade", type=float, default=0.05)
+    parser.add_argument("--classify-ms", type=float, default=100)
+    parser.add_argument("--answer-ms", type=float, default=1000)
+    parser.add_argument("--client-timeout", type=float, default=10.0)
+    parser.add_argument("--max-wait", type=float, default=3.0, help="как OLLAMA_QUEUE_MAX_WAIT")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    results = {"unbounded": await run(args, 0), f"slots={args.capacity}": await run(args, args.capacity)}
+
+    print(f"rate {args.rate}/s for {args.duration:.0f}s, capacity {args.capacity}, client timeout {args.client_timeout:.0f}s")
+    print(f"{'mode':<10} {'requests':>8} {'ok':>5} {'503':>5} {'timeout':>7} {'ok/s':>6} {'p50 s':>6} {'p99 s':>6} {'peak':>5}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<10} {r['requests']:>8} {r['ok']:>5} {r['rejected']:>5} {r['timeout']:>7} "
+            f"{r['throughput']:>6.2f} {r['p50']:>6.2f} {r['p99']:>6.2f} {r['peak']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,266 @@
+"""
+Бенчмарк переиспользования KV-кэша Ollama: промпты с пользовательскими
+данными в начале (как до src/prompts.py) против шаблонов с неизменным
+префиксом.
+
+Вместо Ollama — локальный фейк на uvicorn с моделью кэша её runner'а:
+SLOTS слотов (OLLAMA_NUM_PARALLEL), общее начало ищется по всем слотам,
+prompt_eval_count — токены промпта после него, задержка — --eval-ms на
+каждый такой токен. Токены — слова, знаки препинания и пробелы.
+
+Сценарий — поток запросов пользователей: FIN (classification, planning,
+answer) и MRKT (classification, search_queries, competitor_analysis),
+этапы идут вперемешку, как при параллельных пользователях. Печатаются
+средние по этапам: токенов в промпте, prompt_eval_count и задержка.
+
+Запуск (из директории back/solution/):
+    python -m benchmarks.bench_prompt_prefix --requests 40 --slots 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import time
+from collections import defaultdict
+
+FAKE_PORT = 18435
+
+os.environ.update({"OLLAMA_URL": f"http://127.0.0.1:{FAKE_PORT}/"})
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from src import prompts
+from src.ollama_client import ollama
+from src.services.competitor_analyzer import build_analysis_prompt
+from src.views import build_final_prompt
+
+TOKEN = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+def fake_ollama(slots: int, eval_seconds: float) -> Starlette:
+    cache = [[] for _ in range(slots)]
+    used = [0.0] * slots
+    lock = asyncio.Lock()
+
+    def common_prefix(a, b) -> int:
+        n = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            n += 1
+        return n
+
+    async def generate(request: Request):
+        body = await request.json()
+        tokens = TOKEN.findall(body["prompt"])
+        async with lock:
+            shared = [common_prefix(tokens, cached) for cached in cache]
+            best = max(range(slots), key=lambda i: (shared[i], -used[i]))
+            # Как findBestCacheSlot в Ollama: общее начало берётся из лучшего
+            # слота, но если он нужен целиком другим промптам, пишем в давно
+            # не использованный
+            slot = best
+            if shared[best] < len(cache[best]):
+                slot = min(range(slots), key=lambda i: used[i])
+            evaluated = len(tokens) - shared[best]
+            cache[slot], used[slot] = tokens, time.monotonic()
+        await asyncio.sleep(evaluated * eval_seconds)
+        return JSONResponse({
+            "response": "[FIN]",
+            "done": True,
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(evaluated * eval_seconds * 1e9),
+            "eval_count": 1,
+        })
+
+    return Starlette(routes=[Route("/api/generate", generate, methods=["POST"])])
+
+
+# Промпты до src/prompts.py: вопрос пользователя в начале ответа и анализа
+def legacy_classification(prompt: str) -> str:
+    return f"""
+        ROLE: Ты — алгоритм классификации. Ты не даешь ответов на вопросы, а только классифицируешь их.
+        TASK: Проанализируй текст после "INPUT:" и верни ровно один из двух тегов: `[FIN]` или `[MRKT]`.
+        CRITERIA:
+        - `[FIN]` (Finance): Вопросы о денежных потоках, бюджете, прибыли, затратах, отчетности компании.
+        - `[MRKT]` (Market): Вопросы о конкурентах, доле рынка, трендах, потребителях, спросе.
+        OUTPUT_FORMAT: [FIN] или [MRKT]
+
+        INPUT: {prompt}
+    """
+
+
+def legacy_planning(prompt: str) -> str:
+    return f"""
+        Ты - интеллектуальный агент, который помогает пользователю, взаимодействуя с внешним API.
+        Твоя задача - анализировать запрос пользователя и решать, какие эндпоинты вызвать.
+
+        Доступные эндпоинты:
+        1. GET /api/amount/ - данные по счету (name, count)
+        2. GET /api/amount/transaction - данные об одной транзакции (amount_id, created_at, type, category, count)
+        3. GET /api/amount/history - история транзакций (amount_id, created_at, type, category, count)
+
+        Эндпоинт history поддерживает параметры amount_id, from_date, to_date, type, category, count.
+        Пример: /api/amount/history?amount_id=1&from_date=2024-01-01&to_date=2024-01-31&type=income
+
+        Верни JSON строго в формате:
+        {{
+            "endpoints": ["/здесь_нужный_эндпоинт1", "/здесь_нужный_эндпоинт2", ...]
+        }}
+
+        Если вызов API не требуется, ответь как обычный помощник.
+
+        Текущий запрос пользователя: {prompt}
+    """
+
+
+def legacy_answer(api_data, prompt: str) -> str:
+    return f"""
+    Пользователь задал вопрос: {prompt}
+
+    Для ответа на этот вопрос были выполнены следующие запросы к API:
+    {json.dumps(api_data, ensure_ascii=False, indent=2)}
+
+    Проанализируй все полученные данные и дай развернутый ответ на вопрос пользователя.
+    Если в некоторых запросах были ошибки, учти это при формировании ответа.
+    """
+
+
+def legacy_search_queries(prompt: str) -> str:
+    return prompts.SEARCH_QUERIES.render(input=prompt)
+
+
+def legacy_analysis(prompt: str, texts) -> str:
+    pages = "\n".join(f"• {item['url']}: {item['text']}" for item in texts)
+    return f"""Проанализируй конкурентов: {prompt}
+
+ИНФОРМАЦИЯ:
+{pages}
+
+Ответь кратко:
+1. Ключевые конкуренты
+2. Их особенности
+3. Выводы"""
+
+
+def make_api_data(rng: random.Random):
+    transactions = [
+        {
+            "type": rng.choice(["income", "outcome"]),
+            "category": rng.choice(["food", "rent", "salary", "ads", "taxes"]),
+            "count": round(rng.uniform(10, 5000), 2),
+            "created_at": f"2025-03-{rng.randint(1, 28):02d}T12:00:00",
+        }
+        for _ in range(rng.randint(5, 30))
+    ]
+    return [
+        {"endpoint": "/api/amount/", "data": {"amounts": [{"name": "main", "count": 1000.0}], "limit_data": 1}},
+        {"endpoint": "/api/amount/history?name=main", "data": {"name": "main", "transaction": transactions, "limit_data": 1}},
+    ]
+
+
+def make_pages(rng: random.Random):
+    words = "цены доставка бренд рынок клиенты сервис ассортимент отзывы скидки".split()
+    return [
+        {"url": f"https://site{i}.example", "text": " ".join(rng.choice(words) for _ in range(80))}
+        for i in range(3)
+    ]
+
+
+def workload(requests: int, seed: int):
+    """(stage, legacy prompt, prompt) по запросам пользователей вперемешку."""
+    with open("data/classification_prompts.jsonl", encoding="utf-8") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    rng = random.Random(seed)
+    flows = []
+    for _ in range(requests):
+        example = rng.choice(examples)
+        prompt = example["prompt"]
+        steps = [("classification", legacy_classification(prompt), prompts.CLASSIFICATION.render(input=prompt))]
+        if example["label"] == "FIN":
+            api_data = make_api_data(rng)
+            steps.append(("planning", legacy_planning(prompt), prompts.PLANNING.render(input=prompt)))
+            steps.append(("answer", legacy_answer(api_data, prompt), build_final_prompt(api_data, prompt)))
+        else:
+            texts = make_pages(rng)
+            steps.append(("search_queries", legacy_search_queries(prompt), prompts.SEARCH_QUERIES.render(input=prompt)))
+            steps.append(("competitor_analysis", legacy_analysis(prompt, texts), build_analysis_prompt(prompt, texts)))
+        flows.append(steps)
+    # Несколько пользователей одновременно: этапы разных запросов чередуются
+    ordered = []
+    while any(flows):
+        flow = rng.choice([flow for flow in flows if flow])
+        ordered.append(flow.pop(0))
+    return ordered
+
+
+async def run(steps, index: int, restart) -> dict:
+    await restart()
+    stats = defaultdict(lambda: {"tokens": [], "evaluated": [], "ms": []})
+    for step in steps:
+        stage, prompt = step[0], step[index]
+        started = time.perf_counter()
+        data = await ollama.generate(prompt, stage=stage)
+        stats[stage]["ms"].append((time.perf_counter() - started) * 1000)
+        stats[stage]["tokens"].append(len(TOKEN.findall(prompt)))
+        stats[stage]["evaluated"].append(data["prompt_eval_count"])
+    return stats
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--slots", type=int, default=4, help="как OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--eval-ms", type=float, default=0.2, help="время prefill на токен")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    steps = workload(args.requests, args.seed)
+    server = None
+
+    async def restart():
+        # Новый фейк — пустой кэш для каждого прогона
+        nonlocal server
+        if server is not None:
+            server.should_exit = True
+            await asyncio.sleep(0.2)
+        app = fake_ollama(args.slots, args.eval_ms / 1000)
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=FAKE_PORT, log_level="warning"))
+        server.install_signal_handlers = lambda: None
+        asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+
+    try:
+        results = {"before": await run(steps, 1, restart), "after": await run(steps, 2, restart)}
+    finally:
+        server.should_exit = True
+        await ollama.close()
+        await asyncio.sleep(0.2)
+
+    print(f"requests: {args.requests}, slots: {args.slots}, prefill {args.eval_ms} ms/token")
+    print(f"{'stage':<20} {'prompts':<7} {'tokens':>7} {'prompt_eval':>12} {'latency ms':>11}")
+    for stage in results["before"]:
+        for name in ("before", "after"):
+            stat = results[name][stage]
+            print(
+                f"{stage if name == 'before' else '':<20} {name:<7} {statistics.mean(stat['tokens']):>7.0f} "
+                f"{statistics.mean(stat['evaluated']):>12.0f} {statistics.mean(stat['ms']):>11.1f}"
+            )
+    for name in ("before", "after"):
+        stats = results[name].values()
+        print(
+            f"{'total' if name == 'before' else '':<20} {name:<7} {sum(sum(s['tokens']) for s in stats):>7} "
+            f"{sum(sum(s['evaluated']) for s in stats):>12} {sum(sum(s['ms']) for s in stats):>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
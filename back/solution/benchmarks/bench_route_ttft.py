@@ -0,0 +1,141 @@
+"""
+Бенчмарк FIN запроса к /api/ai/message/: классификация и выбор эндпоинтов
+двумя вызовами LLM против одного объединённого (ROUTE_SINGLE_CALL) и
+против двух вызовов, идущих параллельно (SPECULATIVE_EXECUTION).
+
+Ollama и backend заменяет локальный фейк на uvicorn: каждый /api/generate
+отвечает через --generate-ms, стрим /api/chat отдаёт первый токен через
+--first-token-ms. Сервис тоже поднимается на uvicorn, клиент меряет время
+до первого байта ответа (TTFT) — то, что видит пользователь.
+
+Кэш, локальный классификатор и планировщик на правилах выключены:
+классифицирует и выбирает эндпоинты LLM.
+
+Запуск (из директории back/solution/):
+    python -m benchmarks.bench_route_ttft --requests 10 --generate-ms 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+FAKE_PORT = 18434
+SERVICE_PORT = 18401
+
+os.environ.update({
+    "OLLAMA_URL": f"http://127.0.0.1:{FAKE_PORT}/",
+    "API_BASE_URL": f"http://127.0.0.1:{FAKE_PORT}",
+    "CLASSIFICATION_CACHE_SIZE": "0",
+    "LOCAL_CLASSIFIER_ENABLED": "false",
+    "RULE_PLANNER_ENABLED": "false",
+    "LOAD_SHED_ENABLED": "false",
+})
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from src import views
+from src.main import app as service_app
+
+
+def fake_app(generate_delay: float, first_token_delay: float) -> Starlette:
+    async def generate(request: Request):
+        body = await request.json()
+        await asyncio.sleep(generate_delay)
+        if "format" in body:
+            answer = json.dumps({"segment": "FIN", "endpoints": ["/api/amount/history?name=test"]})
+        elif "алгоритм классификации" in body["prompt"]:
+            answer = "[FIN]"
+        else:
+            answer = json.dumps({"endpoints": ["/api/amount/history?name=test"]})
+        return JSONResponse({"response": answer, "done": True})
+
+    async def chat(request: Request):
+        async def stream():
+            await asyncio.sleep(first_token_delay)
+            for word in ("Расходы ", "за ", "май ", "выросли."):
+                yield json.dumps({"message": {"content": word}, "done": False}).encode() + b"\n"
+            yield json.dumps({"message": {"content": ""}, "done": True}).encode() + b"\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    async def amounts(request: Request):
+        return JSONResponse({"amounts": [{"name": "test", "count": 1000.0}], "limit_data": 1})
+
+    async def history(request: Request):
+        return JSONResponse({"transactions": [{"category": "food", "count": 120.0, "type": "outcome"}]})
+
+    return Starlette(routes=[
+        Route("/api/generate", generate, methods=["POST"]),
+        Route("/api/chat", chat, methods=["POST"]),
+        Route("/api/amount/", amounts),
+        Route("/api/amount/history", history),
+    ])
+
+
+async def serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server
+
+
+async def measure(client: httpx.AsyncClient, requests: int) -> tuple[float, float]:
+    ttft, total = [], []
+    for _ in range(requests):
+        started = time.perf_counter()
+        async with client.stream(
+            "POST", "/api/ai/message/", json={"prompt": "Сколько мы потратили на еду в мае?"}
+        ) as response:
+            response.raise_for_status()
+            first = None
+            async for _ in response.aiter_bytes():
+                if first is None:
+                    first = time.perf_counter() - started
+        ttft.append(first)
+        total.append(time.perf_counter() - started)
+    return statistics.median(ttft) * 1000, statistics.median(total) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--generate-ms", type=float, default=400)
+    parser.add_argument("--first-token-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    fake = await serve(fake_app(args.generate_ms / 1000, args.first_token_ms / 1000), FAKE_PORT)
+    service = await serve(service_app, SERVICE_PORT)
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{SERVICE_PORT}", timeout=60) as client:
+            for name, single_call, speculative in (
+                ("two calls", False, False),
+                ("speculative", False, True),
+                ("single call", True, False),
+            ):
+                views.ROUTE_SINGLE_CALL = single_call
+                views.SPECULATIVE_EXECUTION = speculative
+                await measure(client, 1)
+                results[name] = await measure(client, args.requests)
+    finally:
+        service.should_exit = fake.should_exit = True
+        await asyncio.sleep(0.2)
+
+    baseline = results["two calls"][0]
+    print(f"generate {args.generate_ms:.0f}ms, first token {args.first_token_ms:.0f}ms, median of {args.requests}")
+    print(f"{'routing':<12} {'ttft ms':>9} {'total ms':>9} {'ttft vs two calls':>18}")
+    for name, (ttft, total) in results.items():
+        print(f"{name:<12} {ttft:>9.1f} {total:>9.1f} {ttft / baseline:>17.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Офлайн-оценка локального классификатора FIN/MRKT против LLM.
+
+Локальный классификатор проверяется k-fold кросс-валидацией на
+размеченном файле: модель обучается на k-1 частях и классифицирует
+оставшуюся. Печатаются покрытие (доля запросов, решённых без LLM),
+точность на них и время одного решения.
+
+С флагом --llm те же запросы классифицирует Ollama (OLLAMA_URL) тем же
+промптом, что сервис: печатаются её точность и латентность, а также
+точность и средняя латентность связки «локально, а при неуверенности —
+LLM».
+
+Запуск (из директории back/solution/):
+    python -m benchmarks.eval_classifier --folds 5
+    OLLAMA_URL=http://localhost:11434/ python -m benchmarks.eval_classifier --llm
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from src.config import LOCAL_CLASSIFIER_DATA, LOCAL_CLASSIFIER_THRESHOLD
+from src.local_classifier import LocalClassifier, load_examples
+
+
+def cross_validate(examples, folds: int, threshold: float, seed: int):
+    """Возвращает по каждому примеру (метка, предсказание или None, секунды)."""
+    order = list(range(len(examples)))
+    random.Random(seed).shuffle(order)
+    results = [None] * len(examples)
+    for fold in range(folds):
+        test = set(order[fold::folds])
+        classifier = LocalClassifier(threshold)
+        classifier.train([examples[i] for i in order if i not in test])
+        for i in sorted(test):
+            prompt, label = examples[i]
+            started = time.perf_counter()
+            prediction = classifier.predict(prompt)
+            results[i] = (label, prediction.label, time.perf_counter() - started)
+    return results
+
+
+async def classify_with_llm(examples):
+    from src.ollama_client import ollama
+    from src.views import classify_with_llm
+
+    results = []
+    try:
+        for prompt, label in examples:
+            started = time.perf_counter()
+            tag = await classify_with_llm(prompt)
+            results.append((label, tag.strip("[]") or None, time.perf_counter() - started))
+    finally:
+        await ollama.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=LOCAL_CLASSIFIER_DATA)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=LOCAL_CLASSIFIER_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm", action="store_true", help="сравнить с классификацией через Ollama")
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    local = cross_validate(examples, args.folds, args.threshold, args.seed)
+    covered = [(label, predicted) for label, predicted, _ in local if predicted is not None]
+    local_us = statistics.mean(seconds for _, _, seconds in local) * 1e6
+
+    print(f"examples: {len(examples)}, folds: {args.folds}, threshold: {args.threshold}")
+    print(f"{'classifier':<16} {'coverage':>9} {'accuracy':>9} {'latency':>12}")
+    print(
+        f"{'local':<16} {len(covered) / len(local):>9.1%} "
+        f"{sum(label == predicted for label, predicted in covered) / max(len(covered), 1):>9.1%} "
+        f"{local_us:>9.1f} us"
+    )
+    if not args.llm:
+        return
+
+    llm = asyncio.run(classify_with_llm(examples))
+    llm_ms = [seconds * 1000 for _, _, seconds in llm]
+    print(
+        f"{'llm':<16} {1:>9.1%} {sum(label == predicted for label, predicted, _ in llm) / len(llm):>9.1%} "
+        f"{statistics.mean(llm_ms):>9.1f} ms (p50 {statistics.median(llm_ms):.1f} ms)"
+    )
+
+    # Связка: локальное решение, а при неуверенности — ответ LLM
+    combined_correct = 0
+    combined_seconds = 0.0
+    for (label, predicted, local_seconds), (_, llm_predicted, llm_seconds) in zip(local, llm):
+        combined_seconds += local_seconds
+        if predicted is None:
+            predicted = llm_predicted
+            combined_seconds += llm_seconds
+        combined_correct += label == predicted
+    print(
+        f"{'local -> llm':<16} {1:>9.1%} {combined_correct / len(local):>9.1%} "
+        f"{combined_seconds / len(local) * 1000:>9.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
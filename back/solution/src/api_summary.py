@@ -0,0 +1,178 @@
+"""
+Сжатие данных API перед финальным промптом.
+
+Ответ ``/api/amount/history`` — список всех транзакций за период; у
+активного счёта их тысячи, и в промпте они дают десятки тысяч токенов.
+Вместо списка в промпт идёт сводка:
+
+* итоги: доходы, расходы, сальдо, число транзакций, период;
+* суммы по категориям (с долей в своём типе);
+* ряд по дням: доходы и расходы за день;
+* крупнейшие транзакции;
+* изменения: вторая половина периода против первой.
+
+Сводка считается одним проходом по транзакциям. Если она не помещается
+в бюджет токенов, детализация снижается по шагам: ряд по дням → по
+неделям, меньше крупнейших транзакций, хвост категорий → «прочее».
+Поэтому размер промпта (и время prefill) не растёт с длиной истории.
+"""
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from .metrics import api_data_tokens
+from .token_budget import estimate_tokens
+
+HISTORY_PREFIX = "/api/amount/history"
+
+# Шаги снижения детализации: (ряд, крупнейших транзакций, категорий)
+_DETAIL_LEVELS = (
+    ("day", 10, 30),
+    ("week", 10, 30),
+    ("week", 5, 15),
+    ("month", 3, 8),
+    ("month", 0, 5),
+    (None, 0, 3),
+)
+
+
+def dump(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def summarize_history(
+    history: Dict[str, Any],
+    series: Optional[str] = "day",
+    top: int = 10,
+    categories: int = 30,
+) -> Dict[str, Any]:
+    """
+    Сводка ответа /api/amount/history.
+
+    Args:
+        history: Ответ эндпоинта: name, transaction, limit_data
+        series: Шаг ряда: day, week, month; None — без ряда
+        top: Сколько крупнейших транзакций оставить
+        categories: Сколько категорий оставить, остальные — в «прочее»
+    """
+    transactions = history.get("transaction") or []
+    totals = {"income": 0.0, "outcome": 0.0}
+    by_category: Dict[tuple, List[float]] = {}
+    buckets: Dict[str, Dict[str, float]] = {}
+    days: List[str] = []
+    for item in transactions:
+        kind = item.get("type", "outcome")
+        count = float(item.get("count", 0.0))
+        totals[kind] = totals.get(kind, 0.0) + count
+        stats = by_category.setdefault((kind, item.get("category", "")), [0.0, 0])
+        stats[0] += count
+        stats[1] += 1
+        day = str(item.get("created_at", ""))[:10]
+        if day:
+            days.append(day)
+            if series is not None:
+                bucket = buckets.setdefault(_bucket(day, series), {"income": 0.0, "outcome": 0.0})
+                bucket[kind] = bucket.get(kind, 0.0) + count
+
+    summary: Dict[str, Any] = {
+        "name": history.get("name"),
+        "transactions": len(transactions),
+        "period": [min(days), max(days)] if days else None,
+        "totals": {
+            "income": round(totals["income"], 2),
+            "outcome": round(totals["outcome"], 2),
+            "net": round(totals["income"] - totals["outcome"], 2),
+        },
+        "by_category": _categories(by_category, totals, categories),
+    }
+    if series is not None and buckets:
+        summary[f"by_{series}"] = [
+            [key, round(value["income"], 2), round(value["outcome"], 2)] for key, value in sorted(buckets.items())
+        ]
+    if top > 0:
+        largest = sorted(transactions, key=lambda item: float(item.get("count", 0.0)), reverse=True)[:top]
+        summary["largest"] = [
+            {key: item.get(key) for key in ("created_at", "type", "category", "count")} for item in largest
+        ]
+    if days:
+        summary["change"] = _halves_change(transactions, min(days), max(days))
+    return summary
+
+
+def summarize_api_data(all_api_data: List[Dict[str, Any]], token_budget: int) -> List[Dict[str, Any]]:
+    """
+    Заменяет ответы history сводками, укладываясь в token_budget.
+
+    Остальные ответы (баланс, одна транзакция, ошибки) не меняются.
+    Размер данных до и после пишется в api_data_tokens.
+    """
+    api_data_tokens.labels("raw").observe(estimate_tokens(dump(all_api_data)))
+    histories = [
+        index for index, item in enumerate(all_api_data)
+        if item.get("endpoint", "").startswith(HISTORY_PREFIX) and isinstance(item.get("data"), dict)
+    ]
+    result = list(all_api_data)
+    for series, top, categories in _DETAIL_LEVELS:
+        for index in histories:
+            item = all_api_data[index]
+            summary = summarize_history(item["data"], series, top, categories)
+            result[index] = {"endpoint": item["endpoint"], "summary": summary}
+        if not histories or estimate_tokens(dump(result)) <= token_budget:
+            break
+    api_data_tokens.labels("summary").observe(estimate_tokens(dump(result)))
+    return result
+
+
+def _bucket(day: str, series: str) -> str:
+    if series == "day":
+        return day
+    if series == "month":
+        return day[:7]
+    value = date.fromisoformat(day)
+    return (value - timedelta(days=value.weekday())).isoformat()
+
+
+def _categories(by_category: Dict[tuple, List[float]], totals: Dict[str, float], limit: int) -> List[Dict[str, Any]]:
+    ordered = sorted(by_category.items(), key=lambda entry: entry[1][0], reverse=True)
+    rows = []
+    rest: Dict[str, List[float]] = {}
+    for (kind, category), (total, count) in ordered:
+        if len(rows) < limit:
+            rows.append(_category_row(kind, category, total, count, totals))
+        else:
+            other = rest.setdefault(kind, [0.0, 0])
+            other[0] += total
+            other[1] += count
+    for kind, (total, count) in rest.items():
+        rows.append(_category_row(kind, "прочее", total, count, totals))
+    return rows
+
+
+def _category_row(kind: str, category: str, total: float, count: float, totals: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "type": kind,
+        "category": category,
+        "total": round(total, 2),
+        "count": int(count),
+        "share": round(total / totals[kind], 3) if totals.get(kind) else 0.0,
+    }
+
+
+def _halves_change(transactions: List[Dict[str, Any]], first_day: str, last_day: str) -> Dict[str, Any]:
+    """Доходы и расходы второй половины периода против первой, в процентах."""
+    start, end = date.fromisoformat(first_day), date.fromisoformat(last_day)
+    middle = (start + (end - start) / 2).isoformat()
+    halves = {"income": [0.0, 0.0], "outcome": [0.0, 0.0]}
+    for item in transactions:
+        day = str(item.get("created_at", ""))[:10]
+        if day:
+            half = halves.setdefault(item.get("type", "outcome"), [0.0, 0.0])
+            half[day > middle] += float(item.get("count", 0.0))
+    return {
+        kind: {
+            "first_half": round(first, 2),
+            "second_half": round(second, 2),
+            "change_pct": round((second - first) / first * 100, 1) if first else None,
+        }
+        for kind, (first, second) in halves.items()
+    }
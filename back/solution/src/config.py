@@ -14,9 +14,62 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "bambucha/saiga-llama3")
+# Пул keep-alive соединений общего клиента Ollama (см. src/ollama_client.py)
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "10"))
+# Контекст модели в токенах: передаётся в Ollama как num_ctx и делится
+# между частями промптов (см. src/token_budget.py); из него резервируется
+# место под ответ
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+OLLAMA_RESPONSE_RESERVE = int(os.getenv("OLLAMA_RESPONSE_RESERVE", "1024"))
+# keep_alive запросов к Ollama: пока модель загружена, её KV-кэш общих
+# префиксов промптов (src/prompts.py) переиспользуется
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Очередь к Ollama (см. src/ollama_scheduler.py): одновременных запросов
+# (0 — без ограничения), бюджет ожидания слота в секундах и размер очереди
+OLLAMA_SLOTS = int(os.getenv("OLLAMA_SLOTS", "4"))
+OLLAMA_QUEUE_MAX_WAIT = float(os.getenv("OLLAMA_QUEUE_MAX_WAIT", "30"))
+OLLAMA_QUEUE_LIMIT = int(os.getenv("OLLAMA_QUEUE_LIMIT", "64"))
 API_BASE_URL = os.getenv("API_BASE_URL", "http://backend:8000")
 SERVICE_API_TOKEN = os.getenv("SERVICE_API_TOKEN")
 
+# Кэш классификации FIN/MRKT по нормализованному тексту запроса
+# (0 записей — выключен). CLASSIFICATION_CACHE_PATH — файл SQLite, чтобы
+# кэш переживал перезапуск (пусто — только память).
+CLASSIFICATION_CACHE_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", "1024"))
+CLASSIFICATION_CACHE_TTL = float(os.getenv("CLASSIFICATION_CACHE_TTL", "86400"))
+CLASSIFICATION_CACHE_PATH = os.getenv("CLASSIFICATION_CACHE_PATH", "")
+
+# Локальный классификатор FIN/MRKT (см. src/local_classifier.py): отвечает
+# сам при уверенности не ниже порога, иначе классифицирует LLM
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85"))
+LOCAL_CLASSIFIER_DATA = os.getenv("LOCAL_CLASSIFIER_DATA", "data/classification_prompts.jsonl")
+
+# Классификация и выбор эндпоинтов одним вызовом LLM со структурированным
+# ответом (JSON по схеме) вместо двух последовательных
+ROUTE_SINGLE_CALL = os.getenv("ROUTE_SINGLE_CALL", "true").lower() == "true"
+
+# Типовые FIN запросы (баланс, расходы/доходы за период) разбираются
+# правилами (src/endpoint_planner.py); LLM выбирает эндпоинты для остальных
+RULE_PLANNER_ENABLED = os.getenv("RULE_PLANNER_ENABLED", "true").lower() == "true"
+
+# Спекулятивное выполнение: пока LLM классифицирует запрос, FIN ветка уже
+# выбирает эндпоинты и загружает баланс и операции за последние
+# SPECULATIVE_PREFETCH_DAYS дней. Для MRKT запросов это лишняя работа:
+# не больше SPECULATIVE_LLM_LIMIT одновременных вызовов LLM (0 — только
+# правила и предвыборка) и 1 + MAX_ACCOUNTS чтений backend
+SPECULATIVE_EXECUTION = os.getenv("SPECULATIVE_EXECUTION", "false").lower() == "true"
+SPECULATIVE_LLM_LIMIT = int(os.getenv("SPECULATIVE_LLM_LIMIT", "2"))
+SPECULATIVE_PREFETCH_DAYS = int(os.getenv("SPECULATIVE_PREFETCH_DAYS", "30"))
+
+# Бюджет токенов на данные API в финальном промпте: история транзакций
+# заменяется сводкой (src/api_summary.py), детализация которой снижается,
+# пока данные не уложатся в бюджет
+API_DATA_TOKEN_BUDGET = int(os.getenv("API_DATA_TOKEN_BUDGET", "2000"))
+
 # Лимиты для работы с AI и текстом
 MAX_TEXT_LENGTH = int(os.getenv("MAX_TEXT_LENGTH", "3000"))  # Максимальная длина текста для анализа (уменьшено для скорости)
 MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "3"))  # Количество ссылок на запрос (уменьшено для скорости)
@@ -25,3 +78,39 @@ MAX_URLS_TO_ANALYZE = int(os.getenv("MAX_URLS_TO_ANALYZE", "5"))  # Максим
 MAX_TEXT_FOR_AI = int(os.getenv("MAX_TEXT_FOR_AI", "500"))  # Максимальная длина текста для передачи в AI (на страницу)
 PARALLEL_PARSING = os.getenv("PARALLEL_PARSING", "true").lower() == "true"  # Параллельная обработка страниц
 
+
+# Логирование: доли записываемых INFO/DEBUG логов по логгерам, например
+# LOG_SAMPLE_RATES="src.views=0.01,src.services.html_parser=0.1"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+# Трассировка: none | console | file (JSON Lines в TRACING_FILE)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACING_FILE = os.getenv("TRACING_FILE", "logs/traces.jsonl")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "solution")
+
+# Сколько shutdown lifespan ждёт запросы, не завершившиеся за
+# --timeout-graceful-shutdown uvicorn (их задачи уже отменены)
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "5"))
+
+# Монитор задержки event loop: пульс раз в LOOP_MONITOR_INTERVAL секунд,
+# при блокировке дольше LOOP_LAG_THRESHOLD_MS в лог пишется стек
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.25"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+
+# Сброс нагрузки: при превышении порога (0 — порог выключен) новые запросы
+# сразу получают 503 с Retry-After вместо ожидания в очереди к Ollama.
+# Пути из LOAD_SHED_PRIORITY_PATHS (префиксы через запятую) не отклоняются.
+# Порог задержки loop работает при LOOP_MONITOR_ENABLED.
+LOAD_SHED_ENABLED = os.getenv("LOAD_SHED_ENABLED", "true").lower() == "true"
+LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", "32"))
+LOAD_SHED_MAX_LOOP_LAG_MS = float(os.getenv("LOAD_SHED_MAX_LOOP_LAG_MS", "200"))
+LOAD_SHED_RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", "5"))
+LOAD_SHED_PRIORITY_PATHS = os.getenv("LOAD_SHED_PRIORITY_PATHS", "/api/health_check/,/metrics")
+
+# Профилирование отдельных запросов (см. src/profiling.py): по заголовку
+# X-Profile: <SERVICE_API_TOKEN> или доле PROFILING_SAMPLE_RATE запросов
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_DIR = os.getenv("PROFILING_DIR", "logs/profiles")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
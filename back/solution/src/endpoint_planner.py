@@ -0,0 +1,262 @@
+"""
+Детерминированный выбор эндпоинтов API счетов для типовых FIN запросов.
+
+Из запроса извлекаются:
+
+* намерение: баланс (``/api/amount/``), последняя транзакция
+  (``/api/amount/transaction``), история (``/api/amount/history``);
+* период: «сегодня», «вчера», «за прошлую неделю», «в этом месяце»,
+  «за прошлый год», «за последние 10 дней», «в мае», «за март 2024»,
+  «с 1 по 15 число», «с 5 мая по 2 июня», «с 01.01.2024 по 31.01.2024»;
+* тип операций: расходы (outcome) или доходы (income);
+* счёт, если он назван в кавычках: «по счёту "Основной"».
+
+План строится, только если разобран весь запрос: если после извлечения
+периода в тексте остались даты, числа или слова времени, периодов
+несколько или запрос просит сравнение — возвращается None, и эндпоинты
+выбирает LLM.
+"""
+import calendar
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from .prompt_cache import normalize_prompt
+
+# Если счёт не назван, история запрашивается по первым счетам пользователя
+MAX_ACCOUNTS = 4
+
+MONTHS = (
+    r"январ[ьяе]", r"феврал[ьяе]", r"март[ае]?", r"апрел[ьяе]", r"ма[йяе]", r"июн[ьяе]",
+    r"июл[ьяе]", r"август[ае]?", r"сентябр[ьяе]", r"октябр[ьяе]", r"ноябр[ьяе]", r"декабр[ьяе]",
+)
+_MONTH = "(" + "|".join(MONTHS) + ")"
+_MONTH_RES = [re.compile(rf"^{month}$") for month in MONTHS]
+
+_ACCOUNT = re.compile(r"сч[её]т\w*\s+[«\"]([^»\"]+)[»\"]", re.IGNORECASE)
+
+_DATE = r"(\d{4}-\d{2}-\d{2}|\d{1,2}\.\d{1,2}\.\d{4})"
+_EXPLICIT_RANGE = re.compile(rf"\bс\s+{_DATE}\s+(?:по|до)\s+{_DATE}")
+_DAY_RANGE = re.compile(
+    rf"\bс\s+(\d{{1,2}})(?:-?го)?(?:\s+{_MONTH})?\s+(?:по|до)\s+(\d{{1,2}})(?:-?е|-?го)?"
+    rf"(?:\s+{_MONTH})?(?:\s+(\d{{4}}))?(?:\s+числ[оа])?(\s+прошл\w+\s+месяц\w*)?"
+)
+_MONTH_PERIOD = re.compile(rf"\b(?:за|в|во)\s+{_MONTH}(?:\s+(\d{{4}}))?(?:\s+год[уа]?)?\b")
+_LAST_N = re.compile(r"\bпоследни[ехй]\s+(\d{1,3})\s+(дн\w*|день|недел\w*|месяц\w*)")
+_LAST_UNIT = re.compile(r"\bпоследн\w+\s+(недел\w*|месяц\w*|год\w*)")
+_RELATIVE = re.compile(
+    r"\b(?:(позавчера|вчера|сегодня)"
+    r"|(эт\w+|текущ\w+|прошл\w+)\s+(недел\w*|месяц\w*|год\w*))\b"
+)
+
+# Следы периода, который не удалось разобрать
+_TEMPORAL = re.compile(
+    rf"\d|\b{_MONTH}\b|недел|месяц|\bгод|квартал|полугоди|вчера|сегодня|завтра|\bдн[еяи]|\bдень|числ"
+)
+_UNSUPPORTED = re.compile(r"сравн|прогноз|динамик|\bvs\b")
+
+_BALANCE = re.compile(r"баланс|остат(?:ок|к)|сколько\s+денег|состояни\w*\s+сч")
+_LATEST = re.compile(r"последн(?:яя|юю|ий|его|ей)\s+(?:транзакц|операц|плат[её]ж|покупк|списани|поступлени|трат)")
+_HISTORY = re.compile(r"истори|транзакц|операц|выписк|движени\w*\s+(?:средств|денег)|прибыл|оборот")
+_OUTCOME = re.compile(r"расход|трат|потратил|затрат|списани|списал|платил|плат[её]ж|покупк")
+_INCOME = re.compile(r"доход|поступлени|заработ|выручк|зачислени|приход")
+
+
+@dataclass(frozen=True)
+class EndpointPlan:
+    intents: Tuple[str, ...]
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+    type: Optional[str] = None
+    account: Optional[str] = None
+
+    @property
+    def needs_accounts(self) -> bool:
+        """Нужен список счетов: счёт не назван, а эндпоинт требует name."""
+        return self.account is None and any(intent != "balance" for intent in self.intents)
+
+    def endpoints(self, accounts: Sequence[str] = ()) -> List[str]:
+        names = [self.account] if self.account else list(accounts)[:MAX_ACCOUNTS]
+        endpoints = ["/api/amount/"] if "balance" in self.intents else []
+        for name in names:
+            if "latest" in self.intents:
+                endpoints.append(f"/api/amount/transaction?{urlencode({'name': name})}")
+            if "history" in self.intents:
+                params = {"name": name}
+                if self.from_date:
+                    params["from_date"] = self.from_date.isoformat()
+                if self.to_date:
+                    params["to_date"] = self.to_date.isoformat()
+                if self.type:
+                    params["type"] = self.type
+                endpoints.append(f"/api/amount/history?{urlencode(params)}")
+        return endpoints
+
+
+def plan(prompt: str, today: Optional[date] = None) -> Optional[EndpointPlan]:
+    """
+    Строит план эндпоинтов без LLM.
+
+    Args:
+        prompt: Запрос пользователя
+        today: Дата, от которой считаются относительные периоды
+
+    Returns:
+        План или None, если запрос разобран не полностью
+    """
+    today = today or date.today()
+    account = None
+    match = _ACCOUNT.search(prompt)
+    if match:
+        account = match.group(1).strip()
+        prompt = prompt[:match.start()] + prompt[match.end():]
+
+    text = normalize_prompt(prompt)
+    if _UNSUPPORTED.search(text):
+        return None
+
+    try:
+        ranges, text = _extract_ranges(text, today)
+    except ValueError:
+        # Несуществующая дата, например «с 30 по 31 февраля»
+        return None
+    if len(ranges) > 1 or _TEMPORAL.search(text):
+        return None
+    from_date, to_date = ranges[0] if ranges else (None, None)
+
+    intents = []
+    if _BALANCE.search(text):
+        intents.append("balance")
+    if _LATEST.search(text):
+        intents.append("latest")
+    outcome, income = bool(_OUTCOME.search(text)), bool(_INCOME.search(text))
+    if "latest" not in intents and (outcome or income or _HISTORY.search(text)):
+        intents.append("history")
+    if not intents:
+        return None
+    # Баланс и последняя транзакция не фильтруются по датам
+    if ranges and "history" not in intents:
+        return None
+
+    return EndpointPlan(
+        intents=tuple(intents),
+        from_date=from_date,
+        to_date=to_date,
+        type="outcome" if outcome and not income else "income" if income and not outcome else None,
+        account=account,
+    )
+
+
+def _ordered(start: date, end: date) -> Tuple[date, date]:
+    """Период «с 15 по 5 число» не угадываем — его разберёт LLM."""
+    if start > end:
+        raise ValueError(f"period starts after it ends: {start} > {end}")
+    return start, end
+
+
+def _extract_ranges(text: str, today: date) -> Tuple[List[Tuple[date, date]], str]:
+    """Находит периоды и вырезает их из текста, чтобы проверить остаток."""
+    ranges: List[Tuple[date, date]] = []
+
+    def explicit(match: re.Match) -> str:
+        ranges.append(_ordered(_parse_date(match.group(1)), _parse_date(match.group(2))))
+        return " "
+
+    def day_range(match: re.Match) -> str:
+        start_day, start_month, end_day, end_month, year, previous = match.groups()
+        anchor = _shift_month(today, -1) if previous else today
+        end_month_number = _month_number(end_month) if end_month else anchor.month
+        start_month_number = _month_number(start_month) if start_month else end_month_number
+        end_year = int(year) if year else anchor.year
+        if not year and end_month and end_month_number > today.month:
+            end_year -= 1
+        start_year = end_year - 1 if start_month_number > end_month_number else end_year
+        ranges.append(_ordered(
+            date(start_year, start_month_number, int(start_day)),
+            date(end_year, end_month_number, int(end_day)),
+        ))
+        return " "
+
+    def month_period(match: re.Match) -> str:
+        month = _month_number(match.group(1))
+        year = int(match.group(2)) if match.group(2) else today.year - (month > today.month)
+        ranges.append(_month_range(year, month))
+        return " "
+
+    def last_n(match: re.Match) -> str:
+        count, unit = int(match.group(1)), match.group(2)
+        if unit.startswith("мес"):
+            start = _shift_month(today, -count) + timedelta(days=1)
+        else:
+            start = today - timedelta(days=count * (7 if unit.startswith("недел") else 1) - 1)
+        ranges.append((start, today))
+        return " "
+
+    def last_unit(match: re.Match) -> str:
+        days = {"н": 7, "м": 30, "г": 365}[match.group(1)[0]]
+        ranges.append((today - timedelta(days=days - 1), today))
+        return " "
+
+    def relative(match: re.Match) -> str:
+        day, which, unit = match.groups()
+        if day:
+            shift = {"сегодня": 0, "вчера": 1, "позавчера": 2}[day]
+            ranges.append((today - timedelta(days=shift),) * 2)
+            return " "
+        previous = which.startswith("прошл")
+        if unit.startswith("недел"):
+            monday = today - timedelta(days=today.weekday())
+            ranges.append(
+                (monday - timedelta(days=7), monday - timedelta(days=1)) if previous else (monday, today)
+            )
+        elif unit.startswith("мес"):
+            if previous:
+                last = _shift_month(today, -1)
+                ranges.append(_month_range(last.year, last.month))
+            else:
+                ranges.append((today.replace(day=1), today))
+        else:
+            ranges.append(
+                (date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)) if previous
+                else (date(today.year, 1, 1), today)
+            )
+        return " "
+
+    for pattern, handler in (
+        (_EXPLICIT_RANGE, explicit),
+        (_DAY_RANGE, day_range),
+        (_MONTH_PERIOD, month_period),
+        (_LAST_N, last_n),
+        (_LAST_UNIT, last_unit),
+        (_RELATIVE, relative),
+    ):
+        text = pattern.sub(handler, text)
+    return ranges, text
+
+
+def _parse_date(value: str) -> date:
+    if "-" in value:
+        return date.fromisoformat(value)
+    day, month, year = (int(part) for part in value.split("."))
+    return date(year, month, day)
+
+
+def _month_number(word: str) -> int:
+    for number, month in enumerate(_MONTH_RES, start=1):
+        if month.match(word):
+            return number
+    raise ValueError(word)
+
+
+def _month_range(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _shift_month(day: date, months: int) -> date:
+    """Та же дата на months месяцев раньше/позже (число — не больше длины месяца)."""
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
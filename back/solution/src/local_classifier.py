@@ -0,0 +1,172 @@
+"""
+Локальный классификатор FIN/MRKT перед LLM.
+
+Два уровня:
+
+* правила: корни слов из LEXICON, совпадающие с началом слова. Если в
+  запросе есть корни только одного класса и модель с ними согласна, класс
+  определён; если модель возражает или есть корни обоих классов — решение
+  за LLM;
+* линейная модель (логистическая регрессия) на символьных n-граммах
+  нормализованного запроса, обучается при старте на размеченном файле
+  ``data/classification_prompts.jsonl`` (строки ``{"prompt", "label"}``).
+
+Без правил ответ возвращается, только если уверенность модели не ниже
+порога; иначе label=None, и запрос уходит в LLM.
+Признаков в запросе — сотни, поэтому оценка — проход по словарю весов
+за десятки микросекунд; NumPy для этого не нужен.
+"""
+import json
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .logger import get_logger
+from .prompt_cache import normalize_prompt
+
+logger = get_logger(__name__)
+
+LABELS = ("FIN", "MRKT")
+
+# Корни слов, однозначно указывающие на класс (регулярные выражения);
+# совпадают только с началом слова, чтобы «налог» не находился в «аналог»,
+# а «счёт» — в «расчёт»
+LEXICON: Dict[str, Tuple[str, ...]] = {
+    "FIN": (
+        "прибыл", "расход", "доход", "бюджет", "выручк", "затрат", "транзакц",
+        "баланс", "сч[её]т", "отч[её]тност", "потратил", "тратим", "траты",
+        "зарплат", "налог", "плат[её]ж", "поступлени", "денежн", "кэшфлоу",
+    ),
+    "MRKT": (
+        "конкурент", "рынок", "рынк", "рыночн", "тренд", "спрос", "потребител",
+        "аудитори", "покупател", r"ниш(?:а|е|и|у|ей|ев)", "маркетинг", "бренд", "соперник",
+    ),
+}
+LEXICON_PATTERNS: Dict[str, re.Pattern] = {
+    label: re.compile(r"\b(?:" + "|".join(stems) + ")") for label, stems in LEXICON.items()
+}
+
+NGRAM_RANGE = (2, 4)
+
+
+def extract_features(prompt: str) -> Dict[str, float]:
+    """Символьные n-граммы нормализованного запроса, вектор с единичной нормой."""
+    text = f" {normalize_prompt(prompt)} "
+    counts: Dict[str, float] = {}
+    for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            counts[gram] = counts.get(gram, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+    return {gram: value / norm for gram, value in counts.items()}
+
+
+def lexicon_labels(prompt: str) -> set:
+    text = normalize_prompt(prompt)
+    return {label for label, pattern in LEXICON_PATTERNS.items() if pattern.search(text)}
+
+
+@dataclass
+class Prediction:
+    label: Optional[str]
+    confidence: float
+    source: str
+
+
+class LocalClassifier:
+    """Логистическая регрессия FIN против MRKT; p — вероятность FIN."""
+
+    def __init__(self, threshold: float = 0.85) -> None:
+        self.threshold = threshold
+        self.weights: Dict[str, float] = {}
+        self.bias = 0.0
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.weights)
+
+    def load(self, path: str) -> None:
+        """Обучает модель на размеченном файле; без файла работают только правила."""
+        started = time.perf_counter()
+        try:
+            examples = load_examples(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("⚠️ Локальный классификатор работает только по правилам: %s", e)
+            return
+        self.train(examples)
+        logger.info(
+            "🧠 Локальный классификатор обучен на %s примерах за %.3fс",
+            len(examples), time.perf_counter() - started,
+        )
+
+    def train(
+        self,
+        examples: Iterable[Tuple[str, str]],
+        epochs: int = 30,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+    ) -> None:
+        """Обучает SGD в фиксированном порядке примеров, поэтому детерминированно."""
+        data = [(extract_features(prompt), 1.0 if label == "FIN" else 0.0) for prompt, label in examples]
+        weights: Dict[str, float] = {}
+        bias = 0.0
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch * 0.1)
+            for features, target in data:
+                error = self._sigmoid(bias + sum(weights.get(g, 0.0) * v for g, v in features.items())) - target
+                bias -= rate * error
+                for gram, value in features.items():
+                    weight = weights.get(gram, 0.0)
+                    weights[gram] = weight - rate * (error * value + l2 * weight)
+        # Модель обучается в потоке: подменяем её целиком, не по частям
+        self.weights, self.bias = weights, bias
+
+    def probability(self, prompt: str) -> float:
+        weights = self.weights
+        score = self.bias + sum(weights.get(g, 0.0) * v for g, v in extract_features(prompt).items())
+        return self._sigmoid(score)
+
+    def predict(self, prompt: str) -> Prediction:
+        """
+        Returns:
+            Prediction с label=None, если решение нужно отдать LLM
+        """
+        rules = lexicon_labels(prompt)
+        if not self.trained:
+            if len(rules) == 1:
+                return Prediction(next(iter(rules)), 1.0, "rules")
+            return Prediction(None, 0.0, "none")
+
+        p_fin = self.probability(prompt)
+        label = "FIN" if p_fin >= 0.5 else "MRKT"
+        confidence = max(p_fin, 1.0 - p_fin)
+        if len(rules) == 1:
+            (rule_label,) = rules
+            if label == rule_label:
+                return Prediction(label, confidence, "rules+model")
+            # Модель против правила — пусть решает LLM
+            return Prediction(None, confidence, "conflict")
+        if len(rules) > 1 or confidence < self.threshold:
+            return Prediction(None, confidence, "model")
+        return Prediction(label, confidence, "model")
+
+    @staticmethod
+    def _sigmoid(score: float) -> float:
+        if score >= 0:
+            return 1.0 / (1.0 + math.exp(-score))
+        exp = math.exp(score)
+        return exp / (1.0 + exp)
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item["label"] in LABELS:
+                examples.append((item["prompt"], item["label"]))
+    return examples
@@ -0,0 +1,113 @@
+"""
+Фасад над logging: ленивое %-форматирование и сэмплирование по логгерам.
+"""
+import logging
+import random
+import sys
+
+from .config import LOG_SAMPLE_RATES
+
+
+class SampledLogger:
+    """
+    Обёртка над logging.Logger с ленивым форматированием и сэмплированием.
+
+    - Сообщение форматируется только если запись реально будет записана,
+      поэтому аргументы передаются %-стилем: ``logger.info("url=%s", url)``.
+    - Записи ниже WARNING пропускаются с вероятностью ``1 - sample_rate``.
+    - WARNING и выше пишутся всегда; отдельную запись можно пометить
+      ``always=True`` (например, медленный этап), чтобы миновать сэмплирование.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = 1.0) -> None:
+        self.logger = logger
+        self.sample_rate = sample_rate
+
+    def sample(self) -> bool:
+        """
+        Бросает монетку с вероятностью sample_rate. Нужна, когда решение
+        «логировать или нет» должно быть общим для нескольких записей.
+        """
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def debug(self, msg, *args, **kwargs) -> None:
+        self._log(logging.DEBUG, msg, args, **kwargs)
+
+    def info(self, msg, *args, **kwargs) -> None:
+        self._log(logging.INFO, msg, args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs) -> None:
+        self._log(logging.WARNING, msg, args, **kwargs)
+
+    def error(self, msg, *args, **kwargs) -> None:
+        self._log(logging.ERROR, msg, args, **kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs) -> None:
+        self._log(logging.ERROR, msg, args, exc_info=exc_info, **kwargs)
+
+    def critical(self, msg, *args, **kwargs) -> None:
+        self._log(logging.CRITICAL, msg, args, **kwargs)
+
+    def _log(self, level: int, msg, args, always: bool = False, stacklevel: int = 1, **kwargs) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if (
+            level < logging.WARNING
+            and not always
+            and self.sample_rate < 1.0
+            and random.random() >= self.sample_rate
+        ):
+            return
+        # +2: пропускаем кадры info()/_log(), чтобы в записи был вызывающий код
+        self.logger._log(level, msg, args, stacklevel=stacklevel + 2, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.logger, name)
+
+
+def parse_sample_rates(raw: str) -> dict[str, float]:
+    """
+    Разбирает строку вида ``"src.views=0.01,src.services=0.1"``.
+    """
+    rates = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        name, rate = item.split("=", 1)
+        try:
+            value = float(rate)
+        except ValueError:
+            # Разбирается при импорте: опечатка в настройке не должна ронять сервис
+            sys.stderr.write(f"logging: ignoring LOG_SAMPLE_RATES entry {item.strip()!r}\n")
+            continue
+        rates[name.strip()] = min(max(value, 0.0), 1.0)
+    return rates
+
+
+_sample_rates = parse_sample_rates(LOG_SAMPLE_RATES)
+
+
+def _sample_rate_for(name: str) -> float:
+    # Самый длинный совпавший префикс побеждает
+    best, rate = -1, 1.0
+    for prefix, prefix_rate in _sample_rates.items():
+        if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+            best, rate = len(prefix), prefix_rate
+    return rate
+
+
+def get_logger(name: str, sample_rate: float | None = None) -> SampledLogger:
+    """
+    Получить логгер с указанным именем.
+
+    Args:
+        name: Имя логгера (обычно __name__)
+        sample_rate: Доля записываемых записей ниже WARNING (по умолчанию
+            берётся из LOG_SAMPLE_RATES, иначе 1.0)
+    """
+    if sample_rate is None:
+        sample_rate = _sample_rate_for(name)
+    return SampledLogger(logging.getLogger(name), sample_rate)
@@ -0,0 +1,104 @@
+"""
+Монитор задержки event loop и поиск блокирующих вызовов.
+
+Корутина-пульс раз в ``interval`` секунд засыпает и измеряет, насколько
+позже запланированного она проснулась: это задержка планирования, которую
+видит любой запрос в этот момент. Значения идут в гистограмму
+``event_loop_lag_seconds``.
+
+Если пульса нет дольше ``interval + threshold``, значит, loop занят
+синхронным кодом. Сторожевой поток снимает стек потока event loop
+(``sys._current_frames``) и пишет его в лог — в стеке видна функция,
+которая блокирует loop. На одну остановку пишется один стек.
+
+Стоимость: одно пробуждение корутины и потока за ``interval``, поэтому
+монитор можно держать включённым в продакшене.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from .logger import get_logger
+from .metrics import event_loop_lag, event_loop_stalls
+
+logger = get_logger(__name__)
+
+STACK_LIMIT = 25
+LAG_EWMA_ALPHA = 0.3
+
+# Запущенный монитор процесса: из него читает LoadShedMiddleware
+_active: Optional["LoopMonitor"] = None
+
+
+def current_lag() -> float:
+    """Сглаженная недавняя задержка loop в секундах (0, если монитор не запущен)."""
+    return _active.lag if _active is not None else 0.0
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.25, threshold: float = 0.1) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.last_stall_stack: Optional[str] = None
+        self.lag = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает пульс в текущем event loop и сторожевой поток."""
+        global _active
+        _active = self
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        global _active
+        if _active is self:
+            _active = None
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self._last_beat = time.monotonic()
+            self.lag += LAG_EWMA_ALPHA * (lag - self.lag)
+            event_loop_lag.observe(lag)
+            if lag >= self.threshold:
+                event_loop_stalls.inc()
+                logger.warning("🐢 Задержка event loop %.1fms (порог %.0fms)", lag * 1000, self.threshold * 1000)
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._last_beat
+            if beat == reported_beat or time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_beat = beat
+            self.last_stall_stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+            logger.warning(
+                "🧱 Event loop заблокирован дольше %.0fms, стек потока loop:\n%s",
+                (time.monotonic() - beat - self.interval) * 1000, self.last_stall_stack,
+            )
@@ -1,9 +1,50 @@
 # src/main.py
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from .config import (
+    LOAD_SHED_ENABLED,
+    LOCAL_CLASSIFIER_DATA,
+    LOCAL_CLASSIFIER_ENABLED,
+    LOOP_LAG_THRESHOLD_MS,
+    LOOP_MONITOR_ENABLED,
+    LOOP_MONITOR_INTERVAL,
+    PROFILING_ENABLED,
+    SHUTDOWN_DRAIN_TIMEOUT,
+)
+from .loop_monitor import LoopMonitor
+from .metrics import CONTENT_TYPE_LATEST, REGISTRY
+from .middleware import LoadShedMiddleware, MetricsMiddleware, TracingMiddleware
+from .ollama_client import ollama
+from .profiling import ProfilingMiddleware
 from .router import router
+from .shutdown import DrainMiddleware, finish_drain, start_drain_tracking
+from .views import classification_cache, local_classifier
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_drain_tracking()
+    if LOCAL_CLASSIFIER_ENABLED:
+        # Обучение занимает доли секунды, но не в event loop
+        await asyncio.to_thread(local_classifier.load, LOCAL_CLASSIFIER_DATA)
+    loop_monitor = None
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor = LoopMonitor(LOOP_MONITOR_INTERVAL, LOOP_LAG_THRESHOLD_MS / 1000)
+        loop_monitor.start()
+    yield
+    # uvicorn к этому моменту закрыл сокеты и дождался соединений (и стримов)
+    await finish_drain(SHUTDOWN_DRAIN_TIMEOUT)
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    await ollama.close()
+    classification_cache.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,5 +53,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Профайлер внутри трассировки: в имени файла профиля есть trace id
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TracingMiddleware)
+if LOAD_SHED_ENABLED:
+    app.add_middleware(LoadShedMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(DrainMiddleware)
 
 app.include_router(router)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
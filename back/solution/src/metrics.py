@@ -0,0 +1,375 @@
+"""
+Минимальный реестр метрик в формате Prometheus (text exposition 0.0.4).
+
+Метрики обновляются только из потока event loop, поэтому обходимся без
+блокировок. Для тестов Prometheus не нужен — достаточно ``REGISTRY.render()``.
+"""
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Границы бакетов по умолчанию (секунды): от 5 мс до 2 минут — покрывают
+# и быстрые запросы к БД, и долгие генерации LLM.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение будет вычисляться при каждом чтении метрики."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # Последний элемент — бакет +Inf; хранятся некумулятивные счётчики
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: "Registry | None" = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self.labels()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Возвращает дочернюю метрику для набора значений меток (кэшируется)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+            for values, child in self._children.items()
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS, registry: "Registry | None" = None) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Набор метрик, которые отдаются на /metrics."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ---------- HTTP ----------
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed",
+)
+
+load_shed_requests = Counter(
+    "load_shed_requests_total",
+    "Requests rejected with 503 by load shedding (reason=in_flight|loop_lag)",
+    ("reason",),
+)
+shutdown_drain_duration = Histogram(
+    "shutdown_drain_duration_seconds",
+    "Time from the shutdown signal until in-flight requests finished (outcome=drained|timeout)",
+    ("outcome",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+shutdown_requests = Counter(
+    "shutdown_requests_total",
+    "Requests affected by shutdown (result=rejected|aborted)",
+    ("result",),
+)
+
+
+
+# ---------- Event loop ----------
+
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between the scheduled and actual wake-up of the loop monitor heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+event_loop_stalls = Counter(
+    "event_loop_stalls_total",
+    "Heartbeats whose lag exceeded the loop monitor threshold",
+)
+
+# ---------- Ollama ----------
+
+ollama_request_duration = Histogram(
+    "ollama_request_duration_seconds",
+    "Ollama request latency by pipeline stage",
+    ("stage",),
+)
+ollama_tokens = Counter(
+    "ollama_tokens_total",
+    "Tokens processed by Ollama (kind=prompt|completion)",
+    ("stage", "kind"),
+)
+ollama_slots_busy = Gauge(
+    "ollama_slots_busy",
+    "Ollama scheduler slots currently held by requests",
+)
+ollama_queue_depth = Gauge(
+    "ollama_queue_depth",
+    "Requests waiting for an Ollama scheduler slot",
+)
+ollama_queue_wait = Histogram(
+    "ollama_queue_wait_seconds",
+    "Time a request waited for an Ollama scheduler slot by pipeline stage",
+    ("stage",),
+)
+ollama_queue_rejections = Counter(
+    "ollama_queue_rejections_total",
+    "Ollama requests rejected by the scheduler (reason=queue_full|wait_budget|timeout)",
+    ("stage", "reason"),
+)
+ollama_queue_cancellations = Counter(
+    "ollama_queue_cancellations_total",
+    "Ollama requests cancelled while waiting in the scheduler queue",
+    ("stage",),
+)
+
+local_classifications = Counter(
+    "local_classifications_total",
+    "FIN/MRKT classifications by where the decision was made (local|llm)",
+    ("decision",),
+)
+
+route_plans = Counter(
+    "route_plans_total",
+    "Single-call routing results (ok|repaired|failed)",
+    ("outcome",),
+)
+
+rule_plans = Counter(
+    "rule_plans_total",
+    "FIN prompts by rule-based endpoint planner result (planned|fallback)",
+    ("outcome",),
+)
+rule_planner_duration = Histogram(
+    "rule_planner_duration_seconds",
+    "Time to build an endpoint plan without the LLM",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01),
+)
+speculations = Counter(
+    "speculations_total",
+    "Speculative FIN branches (rule_planning|llm_planning|prefetch) by outcome (used|wasted|skipped)",
+    ("branch", "outcome"),
+)
+api_data_tokens = Histogram(
+    "api_data_tokens",
+    "Estimated tokens of API data in the final prompt before (raw) and after (summary) summarization",
+    ("form",),
+    buckets=(100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000),
+)
+prompt_tokens = Histogram(
+    "prompt_tokens",
+    "Estimated prompt tokens after budgeting by pipeline stage",
+    ("stage",),
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+prompt_truncations = Counter(
+    "prompt_truncations_total",
+    "Prompt parts that did not fit their token share (method=shrink|truncate)",
+    ("stage", "part", "method"),
+)
+
+
+def observe_ollama(stage: str, seconds: float, response: Optional[dict] = None) -> None:
+    """
+    Записывает длительность вызова Ollama и количество токенов из ответа
+    (поля prompt_eval_count / eval_count финального чанка).
+    """
+    ollama_request_duration.labels(stage).observe(seconds)
+    if response:
+        ollama_tokens.labels(stage, "prompt").inc(response.get("prompt_eval_count") or 0)
+        ollama_tokens.labels(stage, "completion").inc(response.get("eval_count") or 0)
+
+
+# ---------- Кэши ----------
+
+cache_requests = Counter(
+    "cache_requests_total",
+    "Cache lookups by result (hit|miss)",
+    ("cache", "result"),
+)
+cache_hit_ratio = Gauge(
+    "cache_hit_ratio",
+    "Share of cache lookups that were hits since start",
+    ("cache",),
+)
+
+coalesced_requests = Counter(
+    "coalesced_requests_total",
+    "Requests that joined an identical in-flight call instead of running their own",
+    ("flight",),
+)
+
+_cache_names: set = set()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Учитывает обращение к кэшу; при первом обращении регистрирует hit ratio."""
+    result = "hit" if hit else "miss"
+    if cache not in _cache_names:
+        _cache_names.add(cache)
+        hits = cache_requests.labels(cache, "hit")
+        misses = cache_requests.labels(cache, "miss")
+        cache_hit_ratio.labels(cache).set_function(
+            lambda: hits.value / (hits.value + misses.value) if hits.value + misses.value else 0.0
+        )
+    cache_requests.labels(cache, result).inc()
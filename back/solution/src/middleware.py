@@ -0,0 +1,167 @@
+"""
+ASGI middleware сервиса.
+"""
+import json
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import (
+    LOAD_SHED_MAX_IN_FLIGHT,
+    LOAD_SHED_MAX_LOOP_LAG_MS,
+    LOAD_SHED_PRIORITY_PATHS,
+    LOAD_SHED_RETRY_AFTER,
+)
+from .logger import get_logger
+from .loop_monitor import current_lag
+from .metrics import http_request_duration, http_requests_in_flight, load_shed_requests
+from .shutdown import drain_state
+from .tracing import SERVER, start_span, tracing_enabled
+
+logger = get_logger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Middleware для метрик HTTP: латентность по шаблону маршрута и число
+    запросов в обработке. Реализован как чистый ASGI middleware, чтобы не
+    мешать стримингу ответов; латентность считается до конца стрима.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # Роутер FastAPI кладёт найденный маршрут в scope
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            http_request_duration.labels(scope["method"], route, str(status_code)).observe(
+                time.perf_counter() - start_time
+            )
+
+
+class TracingMiddleware:
+    """
+    Открывает серверный спан на каждый HTTP запрос (с учётом входящего
+    ``traceparent``). Спан закрывается после отправки последнего чанка,
+    поэтому для стриминговых ответов включает и генерацию.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracing_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        method = scope["method"]
+        with start_span(
+            method,
+            kind=SERVER,
+            traceparent=traceparent,
+            **{"http.method": method, "http.target": scope["path"]},
+        ) as span:
+            first_byte_time = None
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal first_byte_time
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                elif message["type"] == "http.response.body" and first_byte_time is None:
+                    first_byte_time = time.perf_counter()
+                    span.set_attribute("http.ttfb_ms", round((first_byte_time - start_time) * 1000, 3))
+                await send(message)
+
+            start_time = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None:
+                    span.name = f"{method} {route}"
+                    span.set_attribute("http.route", route)
+
+
+class LoadShedMiddleware:
+    """
+    Сброс нагрузки. Когда Ollama не успевает, запросы копятся в сервисе,
+    и каждый ждёт минуты. Пока запросов в обработке больше
+    LOAD_SHED_MAX_IN_FLIGHT или сглаженная задержка event loop выше
+    LOAD_SHED_MAX_LOOP_LAG_MS, новые запросы сразу получают 503 с
+    Retry-After. Пути из LOAD_SHED_PRIORITY_PATHS обслуживаются всегда.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_in_flight: int = LOAD_SHED_MAX_IN_FLIGHT,
+        max_loop_lag_ms: float = LOAD_SHED_MAX_LOOP_LAG_MS,
+        retry_after: int = LOAD_SHED_RETRY_AFTER,
+        priority_paths: str = LOAD_SHED_PRIORITY_PATHS,
+    ) -> None:
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag_ms / 1000
+        self.priority_paths = tuple(path.strip() for path in priority_paths.split(",") if path.strip())
+        self.headers = [
+            (b"content-type", b"application/json"),
+            (b"retry-after", str(retry_after).encode()),
+        ]
+        self.body = json.dumps({"detail": "Сервис перегружен, повторите запрос позже"}, ensure_ascii=False).encode()
+        self.shedding: Optional[str] = None
+
+    def overload_reason(self) -> Optional[str]:
+        if self.max_in_flight and drain_state.in_flight > self.max_in_flight:
+            return "in_flight"
+        if self.max_loop_lag and current_lag() > self.max_loop_lag:
+            return "loop_lag"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.priority_paths):
+            await self.app(scope, receive, send)
+            return
+
+        reason = self.overload_reason()
+        if reason is None:
+            if self.shedding is not None:
+                logger.info("✅ Сброс нагрузки остановлен (%s)", self.shedding)
+                self.shedding = None
+            await self.app(scope, receive, send)
+            return
+
+        load_shed_requests.labels(reason).inc()
+        # В лог — только начало сброса, отказы считаются в метрике
+        if self.shedding != reason:
+            logger.warning("🚦 Сброс нагрузки (%s): запросов в обработке %s, задержка loop %.0fms",
+                           reason, drain_state.in_flight, current_lag() * 1000)
+            self.shedding = reason
+        await send({"type": "http.response.start", "status": 503, "headers": self.headers})
+        await send({"type": "http.response.body", "body": self.body})
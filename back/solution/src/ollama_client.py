@@ -0,0 +1,237 @@
+"""
+Общий асинхронный клиент Ollama.
+
+Один ``httpx.AsyncClient`` на процесс с пулом keep-alive соединений:
+этапы пайплайна (классификация, планирование, ответ, анализ конкурентов)
+больше не открывают новое TCP соединение на каждый вызов. Клиент
+создаётся при первом обращении и закрывается в shutdown lifespan.
+
+Каждый вызов открывает спан ``ollama.<stage>``, пишет длительность и
+токены в метрики и использует таймаут чтения своего этапа из
+STAGE_TIMEOUTS. Перед вызовом запрос ждёт слот в очереди с приоритетом
+этапа (src/ollama_scheduler.py). Стрим NDJSON разбирается по байтам: строки режутся по
+``\\n`` без декодирования в str, JSON разбирается прямо из bytes.
+"""
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+from .config import (
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_KEEPALIVE_EXPIRY,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MODEL,
+    OLLAMA_NUM_CTX,
+    OLLAMA_URL,
+)
+from .logger import get_logger
+from .metrics import observe_ollama
+from .ollama_scheduler import OllamaScheduler
+from .tracing import CLIENT, set_ollama_attributes, start_span
+
+logger = get_logger(__name__)
+
+# Таймаут чтения по этапам, секунды. У стрима он ограничивает паузу между
+# чанками, а не весь ответ.
+STAGE_TIMEOUTS: Dict[str, float] = {
+    "classification": 30.0,
+    "routing": 120.0,
+    "planning": 120.0,
+    "search_queries": 60.0,
+    "competitor_analysis": 120.0,
+    "answer": 120.0,
+    "mock": 120.0,
+}
+DEFAULT_TIMEOUT = 120.0
+
+
+class NDJSONParser:
+    """Разбирает поток байтов NDJSON на объекты; неполная строка ждёт следующего куска."""
+
+    def __init__(self) -> None:
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> Iterator[dict]:
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            chunk = self._parse(line)
+            if chunk is not None:
+                yield chunk
+
+    def flush(self) -> Iterator[dict]:
+        line, self._buffer = self._buffer, b""
+        chunk = self._parse(line)
+        if chunk is not None:
+            yield chunk
+
+    @staticmethod
+    def _parse(line: bytes) -> Optional[dict]:
+        if not line.strip():
+            return None
+        try:
+            return json.loads(line)
+        except ValueError as exc:
+            logger.debug("Skipping malformed stream line: %s", exc)
+            return None
+
+
+async def iter_ndjson(response: httpx.Response) -> AsyncIterator[dict]:
+    parser = NDJSONParser()
+    async for data in response.aiter_bytes():
+        for chunk in parser.feed(data):
+            yield chunk
+    for chunk in parser.flush():
+        yield chunk
+
+
+def _content(chunk: dict) -> str:
+    # /api/chat отдаёт текст в message.content, /api/generate — в response
+    message = chunk.get("message")
+    if message is not None:
+        return message.get("content") or ""
+    return chunk.get("response") or ""
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        base_url: str = OLLAMA_URL,
+        model: str = OLLAMA_MODEL,
+        max_connections: int = OLLAMA_MAX_CONNECTIONS,
+        keepalive_expiry: float = OLLAMA_KEEPALIVE_EXPIRY,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        num_ctx: Optional[int] = OLLAMA_NUM_CTX,
+        keep_alive: Optional[str] = OLLAMA_KEEP_ALIVE,
+        scheduler: Optional[OllamaScheduler] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        # Контекст, под который считаются бюджеты промптов (src/token_budget.py)
+        self.num_ctx = num_ctx
+        # Сколько модель (и KV-кэш префиксов промптов) остаётся в памяти Ollama
+        self.keep_alive = keep_alive
+        self.scheduler = scheduler if scheduler is not None else OllamaScheduler()
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._connect_timeout = connect_timeout
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self._limits,
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=self._connect_timeout),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _options(self, options: Dict[str, Any]) -> Dict[str, Any]:
+        if self.keep_alive:
+            options = {"keep_alive": self.keep_alive, **options}
+        if not self.num_ctx:
+            return options
+        return {**options, "options": {"num_ctx": self.num_ctx, **options.get("options", {})}}
+
+    def _timeout(self, stage: str) -> httpx.Timeout:
+        return httpx.Timeout(STAGE_TIMEOUTS.get(stage, DEFAULT_TIMEOUT), connect=self._connect_timeout)
+
+    async def generate(self, prompt: str, stage: str, **options: Any) -> dict:
+        """
+        Вызов /api/generate без стрима.
+
+        Returns:
+            Ответ Ollama целиком (текст в поле ``response``)
+
+        Raises:
+            httpx.HTTPError: Ошибка соединения, таймаут или статус ответа
+            OllamaOverloaded: Слот не получен за бюджет ожидания
+        """
+        data = None
+        with start_span(f"ollama.{stage}", kind=CLIENT, **{"ai.stage": stage}) as span:
+            async with self.scheduler.slot(stage) as ticket:
+                await ticket.wait()
+                _set_queue_wait(span, ticket.wait_seconds)
+                started = time.perf_counter()
+                try:
+                    response = await self.client.post(
+                        "/api/generate",
+                        json={"model": self.model, "prompt": prompt, "stream": False, **self._options(options)},
+                        timeout=self._timeout(stage),
+                    )
+                    response.raise_for_status()
+                    data = response.json()
+                    set_ollama_attributes(span, data)
+                    return data
+                finally:
+                    observe_ollama(stage, time.perf_counter() - started, data)
+
+    async def chat_stream(
+        self,
+        messages: List[dict],
+        stage: str,
+        queue_notice: Optional[Callable[[int], str]] = None,
+        **options: Any,
+    ) -> AsyncIterator[str]:
+        """
+        Вызов /api/chat со стримом: отдаёт непустые куски текста ответа.
+
+        Args:
+            queue_notice: Текст для клиента о позиции в очереди; отдаётся
+                в стрим при каждом её изменении, пока слот не получен
+
+        Raises:
+            httpx.HTTPError: Ошибка соединения, таймаут или статус ответа
+            OllamaOverloaded: Слот не получен за бюджет ожидания
+        """
+        final_chunk = None
+        with start_span(f"ollama.{stage}", kind=CLIENT, **{"ai.stage": stage}) as span:
+            async with self.scheduler.slot(stage) as ticket:
+                async for position in ticket.positions():
+                    if queue_notice is not None:
+                        yield queue_notice(position)
+                _set_queue_wait(span, ticket.wait_seconds)
+                started = time.perf_counter()
+                try:
+                    async with self.client.stream(
+                        "POST",
+                        "/api/chat",
+                        json={"model": self.model, "messages": messages, "stream": True, **self._options(options)},
+                        timeout=self._timeout(stage),
+                    ) as response:
+                        response.raise_for_status()
+                        async for chunk in iter_ndjson(response):
+                            if chunk.get("done"):
+                                final_chunk = chunk
+                            content = _content(chunk)
+                            if content:
+                                if span is not None and "ollama.ttft_ms" not in span.attributes:
+                                    span.set_attribute(
+                                        "ollama.ttft_ms", round((time.perf_counter() - started) * 1000, 3)
+                                    )
+                                yield content
+                finally:
+                    observe_ollama(stage, time.perf_counter() - started, final_chunk)
+                    set_ollama_attributes(span, final_chunk)
+
+def _set_queue_wait(span, seconds: float) -> None:
+    if span is not None:
+        span.set_attribute("ollama.queue_wait_ms", round(seconds * 1000, 3))
+
+
+ollama = OllamaClient()
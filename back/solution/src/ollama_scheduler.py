@@ -0,0 +1,257 @@
+"""
+Очередь запросов к Ollama.
+
+Сервер Ollama одновременно обрабатывает несколько запросов
+(OLLAMA_NUM_PARALLEL), остальные ждут внутри него, и под нагрузкой
+замедляются все сразу, пока не сработают таймауты httpx. Поэтому
+запросы занимают один из OLLAMA_SLOTS слотов в сервисе, а остальные
+ждут в очереди с приоритетом этапа: классификация и маршрутизация —
+первыми (они короткие и от них зависит весь запрос), затем планирование
+и поисковые запросы, спекулятивное планирование и анализ конкурентов,
+в конце генерация ответа.
+Внутри приоритета — по времени прихода.
+
+Ожидание ограничено OLLAMA_QUEUE_MAX_WAIT: если по средней длительности
+занятия слота ожидание заведомо дольше (или очередь заполнена), запрос
+сразу получает OllamaOverloaded, а не ждёт, чтобы упасть по таймауту.
+Ожидание, которое всё же вышло за бюджет (например, из-за более
+приоритетных запросов), тоже завершается OllamaOverloaded. Отменённый
+запрос (клиент отключился, спекулятивная ветка не понадобилась)
+покидает очередь сразу.
+"""
+import asyncio
+import math
+import time
+from bisect import insort
+from typing import AsyncIterator, Dict, List, Optional
+
+from .config import OLLAMA_QUEUE_LIMIT, OLLAMA_QUEUE_MAX_WAIT, OLLAMA_SLOTS
+from .logger import get_logger
+from .metrics import (
+    ollama_queue_cancellations,
+    ollama_queue_depth,
+    ollama_queue_rejections,
+    ollama_queue_wait,
+    ollama_slots_busy,
+)
+
+logger = get_logger(__name__)
+
+# Меньше — раньше; этапы не из списка идут последними
+STAGE_PRIORITIES: Dict[str, int] = {
+    "classification": 0,
+    "routing": 0,
+    "routing_repair": 0,
+    "planning": 1,
+    "search_queries": 1,
+    "speculative_planning": 2,
+    "competitor_analysis": 2,
+    "answer": 3,
+    "mock": 3,
+}
+LOWEST_PRIORITY = max(STAGE_PRIORITIES.values())
+
+# Текст о позиции в очереди для стриминговых ответов
+QUEUE_NOTICE = "⏳ Запрос в очереди к модели, позиция {position}\n\n"
+
+# Вес нового замера в средней длительности занятия слота
+HOLD_SMOOTHING = 0.2
+
+
+class OllamaOverloaded(Exception):
+    """Запрос к Ollama отклонён: ожидание слота дольше бюджета."""
+
+    def __init__(self, stage: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"Ollama перегружена ({stage}: {reason})")
+        self.stage = stage
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def queue_notice(position: int) -> str:
+    return QUEUE_NOTICE.format(position=position)
+
+
+class Ticket:
+    """
+    Место запроса в очереди; как async context manager освобождает слот
+    (или место в очереди) при выходе, в том числе при отмене.
+    """
+
+    def __init__(self, scheduler: "OllamaScheduler", stage: str, seq: int) -> None:
+        self.stage = stage
+        self.key = (STAGE_PRIORITIES.get(stage, LOWEST_PRIORITY + 1), seq)
+        self.granted = False
+        self.holding = False
+        self.queued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self._scheduler = scheduler
+        self._changed = asyncio.Event()
+
+    def __lt__(self, other: "Ticket") -> bool:
+        return self.key < other.key
+
+    @property
+    def wait_seconds(self) -> float:
+        return (self.granted_at or time.monotonic()) - self.queued_at
+
+    async def __aenter__(self) -> "Ticket":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._scheduler.release(self)
+
+    async def positions(self) -> AsyncIterator[int]:
+        """
+        Позиция в очереди (с 1) при каждом изменении, пока слот не получен.
+
+        Raises:
+            OllamaOverloaded: Ожидание вышло за OLLAMA_QUEUE_MAX_WAIT
+        """
+        deadline = self.queued_at + self._scheduler.max_wait
+        last = None
+        while not self.granted:
+            self._changed.clear()
+            position = self._scheduler.position(self)
+            if position != last:
+                last = position
+                yield position
+                continue
+            try:
+                await asyncio.wait_for(self._changed.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                if not self.granted:
+                    self._scheduler.reject(self, "timeout")
+
+    async def wait(self) -> None:
+        async for _ in self.positions():
+            pass
+
+
+class OllamaScheduler:
+    def __init__(
+        self,
+        slots: int = OLLAMA_SLOTS,
+        max_wait: float = OLLAMA_QUEUE_MAX_WAIT,
+        queue_limit: int = OLLAMA_QUEUE_LIMIT,
+    ) -> None:
+        """
+        Args:
+            slots: Одновременных запросов к Ollama (0 — без ограничения)
+            max_wait: Бюджет ожидания слота, секунды
+            queue_limit: Максимум запросов в очереди (0 — без ограничения)
+        """
+        self.slots = slots
+        self.max_wait = max_wait
+        self.queue_limit = queue_limit
+        self.busy = 0
+        self.hold_seconds = 0.0
+        self.rejecting = False
+        self._queue: List[Ticket] = []
+        self._seq = 0
+
+    def slot(self, stage: str) -> Ticket:
+        """
+        Ставит запрос в очередь или сразу выдаёт слот.
+
+        Raises:
+            OllamaOverloaded: Очередь заполнена или ожидание заведомо дольше бюджета
+        """
+        self._seq += 1
+        ticket = Ticket(self, stage, self._seq)
+        if not self.slots or (self.busy < self.slots and not self._queue):
+            self._grant(ticket)
+        else:
+            reason = self._admission(ticket)
+            if reason is not None:
+                self._reject(ticket, reason)
+            insort(self._queue, ticket)
+            self._queue_changed()
+        if self.rejecting:
+            logger.info("✅ Запросы к Ollama снова принимаются")
+            self.rejecting = False
+        return ticket
+
+    def check(self, stage: str) -> None:
+        """
+        Отклоняет запрос заранее, не ставя в очередь: до начала стрима
+        клиенту ещё можно ответить 503.
+
+        Raises:
+            OllamaOverloaded: Запрос этапа stage сейчас был бы отклонён
+        """
+        if not self.slots or self.busy < self.slots:
+            return
+        ticket = Ticket(self, stage, self._seq + 1)
+        reason = self._admission(ticket)
+        if reason is not None:
+            self._reject(ticket, reason)
+
+    def _admission(self, ticket: Ticket) -> Optional[str]:
+        if self.queue_limit and len(self._queue) >= self.queue_limit:
+            return "queue_full"
+        position = sum(1 for queued in self._queue if queued.key < ticket.key) + 1
+        if self.estimate_wait(position) > self.max_wait:
+            return "wait_budget"
+        return None
+
+    def position(self, ticket: Ticket) -> int:
+        return self._queue.index(ticket) + 1
+
+    def estimate_wait(self, position: int) -> float:
+        """Ожидание слота с позиции position по средней длительности занятия."""
+        return math.ceil(position / self.slots) * self.hold_seconds
+
+    def release(self, ticket: Ticket) -> None:
+        """Освобождает слот или убирает запрос из очереди; повторный вызов ничего не делает."""
+        if ticket.holding:
+            ticket.holding = False
+            hold = time.monotonic() - ticket.granted_at
+            self.hold_seconds = hold if not self.hold_seconds else (
+                HOLD_SMOOTHING * hold + (1 - HOLD_SMOOTHING) * self.hold_seconds
+            )
+            if self.slots:
+                self.busy -= 1
+                ollama_slots_busy.set(self.busy)
+            self._grant_next()
+        elif not ticket.granted and ticket in self._queue:
+            ollama_queue_cancellations.labels(ticket.stage).inc()
+            self._queue.remove(ticket)
+            self._queue_changed()
+
+    def reject(self, ticket: Ticket, reason: str) -> None:
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            self._queue_changed()
+        self._reject(ticket, reason)
+
+    def _reject(self, ticket: Ticket, reason: str) -> None:
+        ollama_queue_rejections.labels(ticket.stage, reason).inc()
+        # В лог — только начало отказов, отказы считаются в метрике
+        if not self.rejecting:
+            logger.warning(
+                "🚦 Запросы к Ollama отклоняются (%s, %s): занято слотов %s из %s, в очереди %s",
+                ticket.stage, reason, self.busy, self.slots, len(self._queue),
+            )
+            self.rejecting = True
+        retry_after = max(math.ceil(self.estimate_wait(len(self._queue) + 1)), 1)
+        raise OllamaOverloaded(ticket.stage, reason, retry_after)
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted = ticket.holding = True
+        ticket.granted_at = time.monotonic()
+        ollama_queue_wait.labels(ticket.stage).observe(ticket.wait_seconds)
+        if self.slots:
+            self.busy += 1
+            ollama_slots_busy.set(self.busy)
+        ticket._changed.set()
+
+    def _grant_next(self) -> None:
+        if self._queue and self.busy < self.slots:
+            self._grant(self._queue.pop(0))
+            self._queue_changed()
+
+    def _queue_changed(self) -> None:
+        ollama_queue_depth.set(len(self._queue))
+        for ticket in self._queue:
+            ticket._changed.set()
@@ -0,0 +1,136 @@
+"""
+Кэш ответов модели по тексту запроса (классификация FIN/MRKT).
+
+Ключ — запрос после нормализации: Unicode NFKC, casefold и схлопывание
+пробелов, поэтому «Какая прибыль?» и «  какая  ПРИБЫЛЬ? » дают одну
+запись. В памяти держится не больше ``maxsize`` записей (вытесняется
+давно не использованная), запись живёт ``ttl`` секунд.
+
+Если задан ``path``, записи дублируются в файл SQLite и загружаются из
+него при старте, так что кэш переживает перезапуск. Запись в файл идёт
+только при промахе, то есть после вызова модели, который на порядки
+дольше.
+"""
+import hashlib
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .logger import get_logger
+from .metrics import record_cache_lookup
+
+logger = get_logger(__name__)
+
+
+def normalize_prompt(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class PromptCache:
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 1024,
+        ttl: float = 3600.0,
+        path: Optional[str] = None,
+        namespace: str = "",
+    ) -> None:
+        """
+        Args:
+            name: Имя кэша в метриках cache_requests_total
+            maxsize: Максимум записей в памяти (0 — кэш выключен)
+            ttl: Время жизни записи в секундах
+            path: Файл SQLite для хранения между перезапусками
+            namespace: Входит в ключ (модель, версия промпта): при его
+                смене старые записи не используются
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        if path and maxsize > 0:
+            self._open(path)
+
+    def _key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{normalize_prompt(prompt)}".encode()).hexdigest()
+
+    def get(self, prompt: str) -> Optional[str]:
+        if self.maxsize <= 0:
+            return None
+        key = self._key(prompt)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.time():
+            del self._entries[key]
+            entry = None
+        record_cache_lookup(self.name, entry is not None)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, prompt: str, value: str) -> None:
+        if self.maxsize <= 0:
+            return
+        key = self._key(prompt)
+        expires_at = time.time() + self.ttl
+        self._put(key, value, expires_at)
+        if self._db is not None:
+            try:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO prompt_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, expires_at),
+                    )
+            except sqlite3.Error as e:
+                logger.warning("⚠️ Не удалось сохранить запись кэша %s: %s", self.name, e)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM prompt_cache")
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, key: str, value: str, expires_at: float) -> None:
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _open(self, path: str) -> None:
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS prompt_cache "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                # Истёкшие и не помещающиеся в память записи файлу не нужны
+                self._db.execute(
+                    "DELETE FROM prompt_cache WHERE expires_at <= ? OR key NOT IN "
+                    "(SELECT key FROM prompt_cache ORDER BY expires_at DESC LIMIT ?)",
+                    (time.time(), self.maxsize),
+                )
+            rows = self._db.execute(
+                "SELECT key, value, expires_at FROM prompt_cache ORDER BY expires_at DESC LIMIT ?",
+                (self.maxsize,),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Кэш %s работает без файла %s: %s", self.name, path, e)
+            self.close()
+            return
+        # Самые свежие записи — в конец, как недавно использованные
+        for key, value, expires_at in reversed(rows):
+            self._put(key, value, expires_at)
+        logger.info("📦 Кэш %s: загружено %s записей из %s", self.name, len(rows), path)
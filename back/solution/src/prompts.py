@@ -0,0 +1,134 @@
+"""
+Шаблоны промптов по этапам пайплайна.
+
+Ollama переиспользует KV-кэш уже вычисленного начала промпта, если новый
+промпт начинается с тех же байтов, и заново считает только остаток.
+Поэтому каждый шаблон — неизменный префикс (роль, инструкции, формат
+ответа) и суффикс с пользовательскими данными в самом конце. Префикс не
+форматируется: фигурные скобки в примерах JSON пишутся как есть, а
+подставленные значения не могут его изменить.
+
+Меняя текст префикса, меняйте и версию в namespace кэша классификации
+(src/views.py).
+"""
+from dataclasses import dataclass
+from typing import Dict
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    stage: str
+    prefix: str
+    suffix: str = "{input}"
+
+    def render(self, **values: str) -> str:
+        return self.prefix + self.suffix.format(**values)
+
+
+PROMPTS: Dict[str, PromptTemplate] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    if template.stage in PROMPTS:
+        raise ValueError(f"prompt for stage {template.stage} is already registered")
+    PROMPTS[template.stage] = template
+    return template
+
+
+CLASSIFICATION = register(PromptTemplate("classification", """\
+ROLE: Ты — алгоритм классификации. Ты не даешь ответов на вопросы, а только классифицируешь их.
+TASK: Проанализируй текст после "INPUT:" и верни ровно один из двух тегов: `[FIN]` или `[MRKT]`.
+CRITERIA:
+- `[FIN]` (Finance): Вопросы о денежных потоках, бюджете, прибыли, затратах, отчетности компании.
+- `[MRKT]` (Market): Вопросы о конкурентах, доле рынка, трендах, потребителях, спросе.
+OUTPUT_FORMAT: [FIN] или [MRKT]
+
+INPUT: """))
+
+ROUTING = register(PromptTemplate("routing", """\
+ROLE: Ты — маршрутизатор запросов финансового ассистента. Ты не отвечаешь на вопрос.
+TASK: Определи сегмент запроса после "INPUT:", а для сегмента FIN — эндпоинты API, данные которых нужны для ответа.
+CRITERIA:
+- FIN: вопросы о денежных потоках, бюджете, прибыли, затратах, отчетности, счетах и транзакциях.
+- MRKT: вопросы о конкурентах, доле рынка, трендах, потребителях, спросе.
+ENDPOINTS (только для FIN):
+1. GET /api/amount/ - данные по счету (name, count)
+2. GET /api/amount/transaction - данные об одной транзакции (amount_id, created_at, type, category, count)
+3. GET /api/amount/history - история транзакций; параметры amount_id, from_date, to_date, type, category, count.
+   Пример: /api/amount/history?amount_id=1&from_date=2024-01-01&to_date=2024-01-31&type=income
+OUTPUT_FORMAT: JSON {"segment": "FIN" или "MRKT", "endpoints": [...]}; для MRKT endpoints пустой.
+
+INPUT: """))
+
+PLANNING = register(PromptTemplate("planning", """\
+Ты - интеллектуальный агент, который помогает пользователю, взаимодействуя с внешним API.
+Твоя задача - анализировать запрос пользователя и решать, какие эндпоинты вызвать.
+
+Доступные эндпоинты:
+1. GET /api/amount/ - данные по счету (name, count)
+2. GET /api/amount/transaction - данные об одной транзакции (amount_id, created_at, type, category, count)
+3. GET /api/amount/history - история транзакций (amount_id, created_at, type, category, count)
+
+Эндпоинт history поддерживает параметры amount_id, from_date, to_date, type, category, count.
+Пример: /api/amount/history?amount_id=1&from_date=2024-01-01&to_date=2024-01-31&type=income
+
+Верни JSON строго в формате:
+{
+    "endpoints": ["/здесь_нужный_эндпоинт1", "/здесь_нужный_эндпоинт2", ...]
+}
+
+Если вызов API не требуется, ответь как обычный помощник.
+
+Текущий запрос пользователя: """))
+
+ANSWER = register(PromptTemplate("answer", """\
+Ниже — результаты запросов к API, выполненных для ответа на вопрос пользователя, и сам вопрос.
+Проанализируй все полученные данные и дай развернутый ответ на вопрос пользователя.
+Если в некоторых запросах были ошибки, учти это при формировании ответа.
+
+ДАННЫЕ API:
+""", "{api_data}\n\nВОПРОС ПОЛЬЗОВАТЕЛЯ: {question}"))
+
+SEARCH_QUERIES = register(PromptTemplate("search_queries", """\
+ROLE: Ты — помощник для генерации поисковых запросов.
+TASK: На основе запроса пользователя сгенерируй 3-5 конкретных поисковых запросов для анализа конкурентов.
+
+ИНСТРУКЦИЯ:
+1. Проанализируй запрос пользователя
+2. Определи, какие поисковые запросы помогут найти информацию о конкурентах
+3. Верни ТОЛЬКО JSON массив строк с запросами, без дополнительных объяснений
+4. Запросы должны быть на русском языке
+5. Запросы должны быть конкретными и релевантными
+
+ФОРМАТ ОТВЕТА (только JSON, без markdown):
+["запрос 1", "запрос 2", "запрос 3"]
+
+ЗАПРОС ПОЛЬЗОВАТЕЛЯ: """))
+
+# Оптимизированный промпт - короче и эффективнее для ускорения
+COMPETITOR_ANALYSIS = register(PromptTemplate("competitor_analysis", """\
+Проанализируй конкурентов по запросу пользователя, используя информацию со страниц.
+
+Ответь кратко:
+1. Ключевые конкуренты
+2. Их особенности
+3. Выводы
+
+""", "ИНФОРМАЦИЯ:\n{pages}\n\nЗАПРОС: {request}"))
+
+# Без текстов страниц — анализ по общему знанию о рынке
+GENERAL_ANALYSIS = register(PromptTemplate("general_analysis", """\
+Проанализируй конкурентов в сфере из запроса пользователя.
+
+На основе общего знания о рынке ответь:
+1. Ключевые конкуренты в этой сфере
+2. Их типичные особенности
+3. Общие выводы о рынке
+
+Ответ должен быть полезным, даже без конкретных данных.
+
+""", "ЗАПРОС: {request}"))
+
+GREETING = register(PromptTemplate(
+    "mock", "Поздоровайся максимально вежливо и попроси пользователя ввести запрос", "",
+))
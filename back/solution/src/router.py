@@ -8,4 +8,4 @@ router = APIRouter(prefix="/api")
 router.add_api_route("/ai/message/", get_ai_message, methods=["POST"], response_model=None)
 router.add_api_route("/health_check/", lambda: {"status": "ok"}, methods=["GET"])
 router.add_api_route("/ai/message/mock/", get_ai_message_mock, methods=["POST"])
-router.add_api_route("/competitors/analyze/", analyze_competitors, methods=["POST"])
\ No newline at end of file
+router.add_api_route("/competitors/analyze/", analyze_competitors, methods=["POST"], response_model=None)
\ No newline at end of file
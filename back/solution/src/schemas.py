@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field, field_validator
 
 
 class PromptRequest(BaseModel):
@@ -8,3 +10,18 @@ class PromptRequest(BaseModel):
 class AIResponse(BaseModel):
     message: str
 
+
+class RoutePlan(BaseModel):
+    """Ответ объединённого вызова: сегмент запроса и эндпоинты для FIN."""
+
+    segment: Literal["FIN", "MRKT"]
+    endpoints: list[str] = Field(default_factory=list, max_length=5)
+
+    @field_validator("endpoints")
+    @classmethod
+    def only_amount_api(cls, endpoints: list[str]) -> list[str]:
+        # Эндпоинты запрашиваются с токеном пользователя: только API счетов
+        for endpoint in endpoints:
+            if not endpoint.startswith("/api/amount"):
+                raise ValueError(f"endpoint must start with /api/amount: {endpoint}")
+        return endpoints
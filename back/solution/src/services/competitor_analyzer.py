@@ -2,18 +2,39 @@
 Сервис для анализа конкурентов с использованием AI
 """
 import asyncio
-import httpx
-import logging
 import time
 from typing import List, Dict
 from ..config import (
-    OLLAMA_URL, MAX_TEXT_LENGTH, MAX_SEARCH_RESULTS, 
+    MAX_TEXT_LENGTH, MAX_SEARCH_RESULTS,
     MAX_URLS_TO_ANALYZE, MAX_TEXT_FOR_AI, PARALLEL_PARSING
 )
+from .. import prompts
+from ..logger import get_logger
+from ..ollama_client import ollama
+from ..ollama_scheduler import queue_notice
+from ..token_budget import PromptPart, chars_to_tokens, token_budget
 from .google_search import search_google_async, generate_search_queries
 from .html_parser import get_text_from_url
 
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
+
+
+def build_analysis_prompt(user_request: str, texts: List[Dict[str, str]]) -> str:
+    """
+    Промпт анализа в пределах контекста модели: страницы делят бюджет,
+    оставшийся после запроса, поровну; MAX_TEXT_FOR_AI — потолок на страницу.
+    """
+    template = prompts.COMPETITOR_ANALYSIS if texts else prompts.GENERAL_ANALYSIS
+    parts = token_budget.fit("competitor_analysis", [
+        PromptPart("system", template.prefix, 0),
+        PromptPart("user", user_request, 1, max_tokens=token_budget.available // 4),
+        *(
+            PromptPart(f"page{i}", item["text"], 2, max_tokens=chars_to_tokens(MAX_TEXT_FOR_AI))
+            for i, item in enumerate(texts)
+        ),
+    ])
+    pages = "\n".join(f"• {item['url']}: {parts[f'page{i}']}" for i, item in enumerate(texts))
+    return template.render(request=parts["user"], pages=pages)
 
 
 async def analyze_competitors(user_request: str) -> Dict[str, any]:
@@ -30,10 +51,8 @@ async def analyze_competitors(user_request: str) -> Dict[str, any]:
     Returns:
         Словарь с результатами анализа
     """
-    ollama_url = OLLAMA_URL.rstrip('/')
-    
     # Шаг 1: Генерируем поисковые запросы
-    search_queries = await generate_search_queries(user_request, ollama_url)
+    search_queries = await generate_search_queries(user_request)
     
     # Шаг 2: Ищем ссылки для каждого запроса
     all_urls = []
@@ -51,43 +70,21 @@ async def analyze_competitors(user_request: str) -> Dict[str, any]:
         texts = []
         for url, result in zip(unique_urls, results):
             if not isinstance(result, Exception) and result:
-                text_for_ai = result[:MAX_TEXT_FOR_AI] if len(result) > MAX_TEXT_FOR_AI else result
-                texts.append({"url": url, "text": text_for_ai})
+                texts.append({"url": url, "text": result})
     else:
         texts = []
         for url in unique_urls:
             text = await get_text_from_url(url, max_length=MAX_TEXT_LENGTH)
             if text:
-                text_for_ai = text[:MAX_TEXT_FOR_AI] if len(text) > MAX_TEXT_FOR_AI else text
-                texts.append({"url": url, "text": text_for_ai})
+                texts.append({"url": url, "text": text})
     
     # Шаг 4: Анализируем через AI (оптимизированный промпт)
     texts_for_ai = texts[:MAX_URLS_TO_ANALYZE]
-    analysis_prompt = f"""Проанализируй конкурентов: {user_request}
-
-ИНФОРМАЦИЯ:
-{chr(10).join([f"• {item['url']}: {item['text']}" for item in texts_for_ai])}
-
-Ответь кратко:
-1. Ключевые конкуренты
-2. Их особенности  
-3. Выводы"""
+    analysis_prompt = build_analysis_prompt(user_request, texts_for_ai)
     
     # Отправляем запрос в AI
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{ollama_url}/api/generate",
-            json={
-                "model": "bambucha/saiga-llama3",
-                "prompt": analysis_prompt,
-                "stream": False
-            },
-            timeout=120.0
-        )
-        response.raise_for_status()
-        
-        result = response.json()
-        analysis = result.get("response", "Не удалось получить анализ")
+    result = await ollama.generate(analysis_prompt, stage="competitor_analysis")
+    analysis = result.get("response", "Не удалось получить анализ")
     
     return {
         "search_queries": search_queries,
@@ -108,19 +105,18 @@ async def analyze_competitors_streaming(user_request: str):
         Части ответа для streaming
     """
     total_start_time = time.time()
-    ollama_url = OLLAMA_URL.rstrip('/')
     
-    logger.info(f"🚀 Начинаю анализ конкурентов для запроса: '{user_request[:100]}...'")
+    logger.info("🚀 Начинаю анализ конкурентов для запроса: '%s...'", user_request[:100])
     
     # Шаг 1: Генерируем поисковые запросы
     step_start = time.time()
     yield "🔍 Генерирую поисковые запросы...\n\n"
     logger.info("📝 Этап 1/4: Генерация поисковых запросов")
     
-    search_queries = await generate_search_queries(user_request, ollama_url)
+    search_queries = await generate_search_queries(user_request)
     step_elapsed = time.time() - step_start
     yield f"✅ Найдено {len(search_queries)} запросов для поиска (заняло {step_elapsed:.1f}с)\n\n"
-    logger.info(f"✅ Этап 1 завершен за {step_elapsed:.2f}с")
+    logger.info("✅ Этап 1 завершен за %.2fс", step_elapsed)
     
     # Шаг 2: Ищем ссылки
     step_start = time.time()
@@ -141,13 +137,13 @@ async def analyze_competitors_streaming(user_request: str):
                 yield f"  ⚠️ Не найдено ссылок ({query_elapsed:.1f}с) - возможно, Google блокирует запросы\n"
         except Exception as e:
             query_elapsed = time.time() - query_start
-            logger.error(f"❌ Ошибка при поиске '{query}': {e}")
+            logger.error("❌ Ошибка при поиске '%s': %s", query, e)
             yield f"  ❌ Ошибка при поиске ({query_elapsed:.1f}с): {str(e)[:50]}\n"
     
     unique_urls = list(dict.fromkeys(all_urls))[:MAX_URLS_TO_ANALYZE]
     step_elapsed = time.time() - step_start
     yield f"\n📊 Всего уникальных ссылок: {len(unique_urls)} (будет проанализировано максимум {MAX_URLS_TO_ANALYZE}) (поиск занял {step_elapsed:.1f}с)\n\n"
-    logger.info(f"✅ Этап 2 завершен за {step_elapsed:.2f}с, найдено {len(unique_urls)} ссылок")
+    logger.info("✅ Этап 2 завершен за %.2fс, найдено %s ссылок", step_elapsed, len(unique_urls))
     
     # Если не найдено ссылок, предупреждаем пользователя
     if not unique_urls:
@@ -161,7 +157,7 @@ async def analyze_competitors_streaming(user_request: str):
     # Шаг 3: Получаем текст со страниц (параллельно или последовательно)
     step_start = time.time()
     yield "📄 Получаю содержимое страниц...\n\n"
-    logger.info(f"📝 Этап 3/4: Парсинг {len(unique_urls)} страниц (параллельно: {PARALLEL_PARSING})")
+    logger.info("📝 Этап 3/4: Парсинг %s страниц (параллельно: %s)", len(unique_urls), PARALLEL_PARSING)
     
     texts = []
     
@@ -173,13 +169,11 @@ async def analyze_competitors_streaming(user_request: str):
         
         for i, (url, result) in enumerate(zip(unique_urls, results), 1):
             if isinstance(result, Exception):
-                logger.warning(f"⚠️ Ошибка при обработке {url}: {result}")
+                logger.warning("⚠️ Ошибка при обработке %s: %s", url, result)
                 yield f"  ⚠️ Ошибка при обработке {i}/{len(unique_urls)}: {url[:50]}...\n"
             elif result:
-                # Ограничиваем текст для AI
-                text_for_ai = result[:MAX_TEXT_FOR_AI] if len(result) > MAX_TEXT_FOR_AI else result
-                texts.append({"url": url, "text": text_for_ai})
-                yield f"  ✅ Обработано {i}/{len(unique_urls)}: {len(text_for_ai)} символов\n"
+                texts.append({"url": url, "text": result})
+                yield f"  ✅ Обработано {i}/{len(unique_urls)}: {len(result)} символов\n"
             else:
                 yield f"  ⚠️ Пустой результат {i}/{len(unique_urls)}: {url[:50]}...\n"
     else:
@@ -190,16 +184,14 @@ async def analyze_competitors_streaming(user_request: str):
             text = await get_text_from_url(url, max_length=MAX_TEXT_LENGTH)
             url_elapsed = time.time() - url_start
             if text:
-                # Ограничиваем текст для AI
-                text_for_ai = text[:MAX_TEXT_FOR_AI] if len(text) > MAX_TEXT_FOR_AI else text
-                texts.append({"url": url, "text": text_for_ai})
-                yield f"  ✅ Получено {len(text_for_ai)} символов ({url_elapsed:.1f}с)\n"
+                texts.append({"url": url, "text": text})
+                yield f"  ✅ Получено {len(text)} символов ({url_elapsed:.1f}с)\n"
             else:
                 yield f"  ⚠️ Не удалось получить текст ({url_elapsed:.1f}с)\n"
     
     step_elapsed = time.time() - step_start
     yield f"\n📚 Обработано {len(texts)} страниц из {len(unique_urls)} (парсинг занял {step_elapsed:.1f}с)\n\n"
-    logger.info(f"✅ Этап 3 завершен за {step_elapsed:.2f}с, обработано {len(texts)} страниц")
+    logger.info("✅ Этап 3 завершен за %.2fс, обработано %s страниц", step_elapsed, len(texts))
     
     # Шаг 4: Анализируем через AI со streaming
     step_start = time.time()
@@ -208,71 +200,33 @@ async def analyze_competitors_streaming(user_request: str):
     # Ограничиваем количество текста для ускорения
     texts_for_ai = texts[:MAX_URLS_TO_ANALYZE]
     total_chars = sum(len(t['text']) for t in texts_for_ai)
-    logger.info(f"📝 Этап 4/4: AI-анализ ({len(texts_for_ai)} страниц, ~{total_chars} символов)")
+    logger.info("📝 Этап 4/4: AI-анализ (%s страниц, ~%s символов)", len(texts_for_ai), total_chars)
     
     # Если нет данных, используем только запрос пользователя
     if not texts_for_ai:
         yield "⚠️ Нет данных для анализа (не удалось получить информацию с веб-страниц).\n"
         yield "Провожу анализ на основе общего знания о рынке...\n\n"
-        analysis_prompt = f"""Проанализируй конкурентов в сфере: {user_request}
-
-На основе общего знания о рынке ответь:
-1. Ключевые конкуренты в этой сфере
-2. Их типичные особенности
-3. Общие выводы о рынке
-
-Ответ должен быть полезным, даже без конкретных данных."""
-    else:
-        # Оптимизированный промпт - короче и эффективнее для ускорения
-        analysis_prompt = f"""Проанализируй конкурентов: {user_request}
-
-ИНФОРМАЦИЯ:
-{chr(10).join([f"• {item['url']}: {item['text']}" for item in texts_for_ai])}
-
-Ответь кратко:
-1. Ключевые конкуренты
-2. Их особенности  
-3. Выводы"""
+    analysis_prompt = build_analysis_prompt(user_request, texts_for_ai)
     
     # Отправляем streaming запрос в AI
     try:
-        async with httpx.AsyncClient() as client:
-            async with client.stream(
-                "POST",
-                f"{ollama_url}/api/chat",
-                json={
-                    "model": "bambucha/saiga-llama3",
-                    "messages": [{"role": "user", "content": analysis_prompt}],
-                    "stream": True
-                },
-                timeout=120.0
-            ) as response:
-                response.raise_for_status()
+        chunk_count = 0
+        messages = [{"role": "user", "content": analysis_prompt}]
+        async for content in ollama.chat_stream(messages, stage="competitor_analysis", queue_notice=queue_notice):
+            if chunk_count == 0:
                 logger.info("✅ AI начал генерировать ответ (streaming)")
-                chunk_count = 0
-                async for line in response.aiter_lines():
-                    if line.strip():
-                        try:
-                            import json
-                            chunk = json.loads(line)
-                            if "message" in chunk and "content" in chunk["message"]:
-                                content = chunk["message"]["content"]
-                                if content:
-                                    yield content
-                                    chunk_count += 1
-                        except Exception as e:
-                            logger.debug(f"Ошибка при парсинге chunk: {e}")
-                            continue
-                
-                step_elapsed = time.time() - step_start
-                logger.info(f"✅ Этап 4 завершен за {step_elapsed:.2f}с, получено {chunk_count} chunks")
+            yield content
+            chunk_count += 1
+
+        step_elapsed = time.time() - step_start
+        logger.info("✅ Этап 4 завершен за %.2fс, получено %s chunks", step_elapsed, chunk_count)
     except Exception as e:
         step_elapsed = time.time() - step_start
-        logger.error(f"❌ Ошибка при AI-анализе за {step_elapsed:.2f}с: {e}")
+        logger.error("❌ Ошибка при AI-анализе за %.2fс: %s", step_elapsed, e)
         yield f"\n\n❌ Ошибка при анализе через AI: {str(e)}\n"
         raise
     
     total_elapsed = time.time() - total_start_time
-    logger.info(f"🎉 Анализ конкурентов завершен за {total_elapsed:.2f}с ({total_elapsed/60:.1f} минут)")
+    logger.info("🎉 Анализ конкурентов завершен за %.2fс (%.1f минут)", total_elapsed, total_elapsed/60)
     yield f"\n\n⏱️ Общее время анализа: {total_elapsed:.1f}с ({total_elapsed/60:.1f} минут)\n"
 
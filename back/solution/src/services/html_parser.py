@@ -2,13 +2,14 @@
 Сервис для парсинга HTML и извлечения текста
 """
 import httpx
-import logging
 import time
 from bs4 import BeautifulSoup
 from typing import Optional
 from ..config import MAX_HTML_LENGTH
+from ..logger import get_logger
+from ..tracing import CLIENT, start_span
 
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 
 async def fetch_html(url: str, timeout: float = 10.0) -> Optional[str]:
@@ -23,24 +24,27 @@ async def fetch_html(url: str, timeout: float = 10.0) -> Optional[str]:
         HTML содержимое или None при ошибке
     """
     start_time = time.time()
-    logger.debug(f"📥 Загружаю HTML с {url[:60]}...")
+    logger.debug("📥 Загружаю HTML с %s...", url[:60])
     
-    try:
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-            response = await client.get(url, headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            })
-            response.raise_for_status()
-            html = response.text[:MAX_HTML_LENGTH]  # Ограничиваем длину
+    with start_span("fetch_html", kind=CLIENT, **{"http.url": url[:200]}) as span:
+        try:
+            async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+                response = await client.get(url, headers={
+                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+                })
+                response.raise_for_status()
+                html = response.text[:MAX_HTML_LENGTH]  # Ограничиваем длину
             
-            elapsed = time.time() - start_time
-            logger.debug(f"✅ HTML загружен ({len(html)} символов) за {elapsed:.2f}с")
+                elapsed = time.time() - start_time
+                logger.debug("✅ HTML загружен (%s символов) за %.2fс", len(html), elapsed)
             
-            return html
-    except Exception as e:
-        elapsed = time.time() - start_time
-        logger.warning(f"⚠️ Ошибка при загрузке HTML с {url[:60]} за {elapsed:.2f}с: {e}")
-        return None
+                return html
+        except Exception as e:
+            if span is not None:
+                span.record_exception(e)
+            elapsed = time.time() - start_time
+            logger.warning("⚠️ Ошибка при загрузке HTML с %s за %.2fс: %s", url[:60], elapsed, e)
+            return None
 
 
 def extract_text_from_html(html: str, max_length: int = 5000) -> str:
@@ -73,11 +77,11 @@ def extract_text_from_html(html: str, max_length: int = 5000) -> str:
         original_length = len(text)
         if len(text) > max_length:
             text = text[:max_length] + "..."
-            logger.debug(f"📝 Текст обрезан с {original_length} до {max_length} символов")
+            logger.debug("📝 Текст обрезан с %s до %s символов", original_length, max_length)
         
         return text
     except Exception as e:
-        logger.error(f"❌ Ошибка при парсинге HTML: {e}")
+        logger.error("❌ Ошибка при парсинге HTML: %s", e)
         return ""
 
 
@@ -93,16 +97,16 @@ async def get_text_from_url(url: str, max_length: int = 5000) -> str:
         Извлеченный текст
     """
     start_time = time.time()
-    logger.info(f"📄 Обрабатываю страницу: {url[:60]}...")
+    logger.info("📄 Обрабатываю страницу: %s...", url[:60])
     
     html = await fetch_html(url)
     if html:
         text = extract_text_from_html(html, max_length)
         elapsed = time.time() - start_time
-        logger.info(f"✅ Текст извлечен ({len(text)} символов) за {elapsed:.2f}с")
+        logger.info("✅ Текст извлечен (%s символов) за %.2fс", len(text), elapsed)
         return text
     
     elapsed = time.time() - start_time
-    logger.warning(f"⚠️ Не удалось получить текст за {elapsed:.2f}с")
+    logger.warning("⚠️ Не удалось получить текст за %.2fс", elapsed)
     return ""
 
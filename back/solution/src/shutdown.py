@@ -0,0 +1,150 @@
+"""
+Плавная остановка: учёт запросов в обработке и их дренаж (вместе
+со стримингом ответов Ollama).
+
+uvicorn по SIGTERM сам закрывает слушающие сокеты, дожидается открытых
+соединений (не дольше ``--timeout-graceful-shutdown``, после чего отменяет
+их задачи) и только потом вызывает shutdown lifespan. Здесь:
+
+* обработчик сигнала встраивается перед обработчиком uvicorn и запоминает
+  момент начала остановки;
+* DrainMiddleware считает запросы (вместе со стримингом ответа), отвечает
+  503 на запросы, пришедшие после сигнала, и учитывает прерванные;
+* ``finish_drain`` в shutdown lifespan дожидается оставшихся запросов
+  и записывает длительность дренажа в метрики.
+"""
+import asyncio
+import signal
+import threading
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .logger import get_logger
+from .metrics import shutdown_drain_duration, shutdown_requests
+
+logger = get_logger(__name__)
+
+HANDLED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class DrainState:
+    """Запросы в обработке и момент начала остановки (только из event loop)."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.draining_since: Optional[float] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def draining(self) -> bool:
+        return self.draining_since is not None
+
+    def begin(self) -> None:
+        if self.draining_since is None:
+            self.draining_since = time.monotonic()
+
+    def enter(self) -> None:
+        self.in_flight += 1
+        self._idle.clear()
+
+    def exit(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+drain_state = DrainState()
+
+
+def start_drain_tracking(state: DrainState = drain_state) -> None:
+    """
+    Сбрасывает состояние остановки и встраивает его отметку перед текущими
+    обработчиками SIGINT/SIGTERM. Вызывается при старте lifespan: к этому
+    моменту uvicorn уже поставил свои обработчики, и они вызываются следом.
+    """
+    state.draining_since = None
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in HANDLED_SIGNALS:
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            if not state.draining:
+                state.begin()
+                logger.info("🛑 Получен сигнал остановки, запросов в обработке: %s", state.in_flight)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+async def finish_drain(timeout: float, state: DrainState = drain_state) -> bool:
+    """
+    Дожидается запросов, которые ещё не завершились (например, отменённых
+    uvicorn по таймауту), и записывает длительность дренажа.
+
+    Returns:
+        True, если все запросы завершились до таймаута.
+    """
+    state.begin()
+    drained = await state.wait_idle(timeout)
+    duration = time.monotonic() - state.draining_since
+    outcome = "drained" if drained else "timeout"
+    shutdown_drain_duration.labels(outcome).observe(duration)
+    if drained:
+        logger.info("✅ Запросы завершены за %.3fs", duration)
+    else:
+        logger.warning("⚠️ Дренаж прерван через %.3fs, не завершено запросов: %s", duration, state.in_flight)
+    return drained
+
+
+class DrainMiddleware:
+    """
+    Считает запросы в обработке до конца отправки ответа. После сигнала
+    остановки новые запросы получают 503 с ``Connection: close``, чтобы
+    клиент или балансировщик повторил их на другом экземпляре.
+    """
+
+    def __init__(self, app: ASGIApp, state: DrainState = drain_state) -> None:
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.state.draining:
+            shutdown_requests.labels("rejected").inc()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"connection", b"close"),
+                    (b"retry-after", b"1"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Service is shutting down"}'})
+            return
+
+        self.state.enter()
+        try:
+            await self.app(scope, receive, send)
+        except asyncio.CancelledError:
+            if self.state.draining:
+                shutdown_requests.labels("aborted").inc()
+            raise
+        finally:
+            self.state.exit()
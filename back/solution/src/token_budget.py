@@ -0,0 +1,139 @@
+"""
+Бюджет токенов промптов LLM.
+
+Контекст модели (OLLAMA_NUM_CTX) делится между частями промпта по
+приоритету: сначала служебный текст, затем запрос пользователя, затем
+данные (ответы API, тексты страниц). Части одного приоритета делят
+остаток поровну, а то, что не занял короткий, достаётся длинным. Часть
+больше своей доли сжимается своим ``shrink`` (например, сводкой данных),
+а если его нет или он не помог — обрезается. Из контекста заранее
+вычитается резерв под ответ (OLLAMA_RESPONSE_RESERVE).
+
+Токены оцениваются по длине текста без токенизатора модели: оценка
+грубая, поэтому резерв и бюджеты берутся с запасом.
+"""
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+from .config import OLLAMA_NUM_CTX, OLLAMA_RESPONSE_RESERVE
+from .logger import get_logger
+from .metrics import prompt_tokens, prompt_truncations
+
+logger = get_logger(__name__)
+
+# Около 3 символов на токен для русского текста и JSON
+CHARS_PER_TOKEN = 3
+TRUNCATION_MARK = " …"
+
+
+def estimate_tokens(text: str) -> int:
+    return chars_to_tokens(len(text))
+
+
+def chars_to_tokens(chars: int) -> int:
+    """Токены для лимитов, заданных в символах."""
+    return math.ceil(chars / CHARS_PER_TOKEN)
+
+
+def truncate(text: str, tokens: int) -> str:
+    """Обрезает текст до tokens токенов по границе слова."""
+    if estimate_tokens(text) <= tokens:
+        return text
+    limit = max(tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARK), 0)
+    cut = text[:limit]
+    if " " in cut[limit // 2:]:
+        cut = cut[:cut.rindex(" ")]
+    return cut + TRUNCATION_MARK if cut else ""
+
+
+@dataclass
+class PromptPart:
+    """
+    Часть промпта.
+
+    Attributes:
+        name: Имя части в логах и метриках
+        text: Текст части
+        priority: Меньше — важнее; такие части получают бюджет первыми
+        max_tokens: Потолок части, даже если контекст позволяет больше
+        shrink: Сжимает часть до заданного числа токенов лучше обрезки
+    """
+
+    name: str
+    text: str
+    priority: int
+    max_tokens: Optional[int] = None
+    shrink: Optional[Callable[[int], str]] = None
+
+
+class TokenBudget:
+    def __init__(
+        self,
+        context_tokens: int = OLLAMA_NUM_CTX,
+        reserve_tokens: int = OLLAMA_RESPONSE_RESERVE,
+    ) -> None:
+        """
+        Args:
+            context_tokens: Контекст модели (num_ctx)
+            reserve_tokens: Резерв под ответ модели
+        """
+        self.context_tokens = context_tokens
+        self.reserve_tokens = reserve_tokens
+
+    @property
+    def available(self) -> int:
+        return max(self.context_tokens - self.reserve_tokens, 0)
+
+    def fit(self, stage: str, parts: Sequence[PromptPart]) -> Dict[str, str]:
+        """
+        Распределяет бюджет и приводит части к своим долям.
+
+        Returns:
+            Тексты частей по имени
+        """
+        remaining = self.available
+        result: Dict[str, str] = {}
+        sizes: Dict[str, int] = {}
+        for priority in sorted({part.priority for part in parts}):
+            group = sorted((part for part in parts if part.priority == priority), key=self._need)
+            for index, part in enumerate(group):
+                share = remaining // (len(group) - index)
+                text = self._fit_part(stage, part, share)
+                sizes[part.name] = estimate_tokens(text)
+                remaining = max(remaining - sizes[part.name], 0)
+                result[part.name] = text
+
+        total = sum(sizes.values())
+        prompt_tokens.labels(stage).observe(total)
+        logger.info(
+            "🧮 Токены %s: %s (%s из %s)",
+            stage, ", ".join(f"{name}={size}" for name, size in sizes.items()), total, self.available,
+        )
+        return result
+
+    def fit_user_prompt(self, stage: str, template: str, prompt: str) -> str:
+        """Запрос пользователя, обрезанный так, чтобы вместе с шаблоном войти в контекст."""
+        parts = self.fit(stage, [PromptPart("system", template, 0), PromptPart("user", prompt, 1)])
+        return parts["user"]
+
+    def _need(self, part: PromptPart) -> int:
+        need = estimate_tokens(part.text)
+        return min(need, part.max_tokens) if part.max_tokens is not None else need
+
+    def _fit_part(self, stage: str, part: PromptPart, share: int) -> str:
+        limit = min(share, part.max_tokens) if part.max_tokens is not None else share
+        text = part.text
+        if estimate_tokens(text) <= limit:
+            return text
+        if part.shrink is not None:
+            text = part.shrink(limit)
+            if estimate_tokens(text) <= limit:
+                prompt_truncations.labels(stage, part.name, "shrink").inc()
+                return text
+        prompt_truncations.labels(stage, part.name, "truncate").inc()
+        logger.warning("✂️ %s: часть %s обрезана до %s токенов", stage, part.name, limit)
+        return truncate(text, limit)
+
+
+token_budget = TokenBudget()
@@ -1,52 +1,309 @@
 import asyncio
-import json
-import logging
+import time
+from datetime import date, timedelta
 from typing import Any
 
 import httpx
 from fastapi import Request
 from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
 
 from src.utils import parse_model_response
-from .config import API_BASE_URL, OLLAMA_URL, SERVICE_API_TOKEN
-from .schemas import PromptRequest
+from .config import (
+    API_BASE_URL,
+    API_DATA_TOKEN_BUDGET,
+    CLASSIFICATION_CACHE_PATH,
+    CLASSIFICATION_CACHE_SIZE,
+    CLASSIFICATION_CACHE_TTL,
+    LOCAL_CLASSIFIER_ENABLED,
+    LOCAL_CLASSIFIER_THRESHOLD,
+    OLLAMA_MODEL,
+    ROUTE_SINGLE_CALL,
+    RULE_PLANNER_ENABLED,
+    SPECULATIVE_EXECUTION,
+    SPECULATIVE_LLM_LIMIT,
+    SPECULATIVE_PREFETCH_DAYS,
+    SERVICE_API_TOKEN,
+)
+from . import endpoint_planner, prompts
+from .api_summary import dump, summarize_api_data
+from .local_classifier import LocalClassifier
+from .logger import get_logger
+from .metrics import local_classifications, route_plans, rule_planner_duration, rule_plans, speculations
+from .ollama_client import ollama
+from .ollama_scheduler import OllamaOverloaded, queue_notice
+from .prompt_cache import PromptCache
+from .schemas import PromptRequest, RoutePlan
+from .singleflight import SingleFlight
+from .token_budget import PromptPart, token_budget
+from .tracing import CLIENT, inject_traceparent, start_span
 from .services.competitor_analyzer import analyze_competitors_streaming
 
-from ollama import Client
+logger = get_logger(__name__)
+
+# Одинаковые одновременные GET к backend (тот же endpoint и токен) выполняются один раз
+_backend_reads = SingleFlight("backend_reads")
+
+CLASSIFICATION_TAGS = ("[FIN]", "[MRKT]")
+# Версию в namespace нужно менять вместе с промптом классификации
+classification_cache = PromptCache(
+    "classification",
+    maxsize=CLASSIFICATION_CACHE_SIZE,
+    ttl=CLASSIFICATION_CACHE_TTL,
+    path=CLASSIFICATION_CACHE_PATH or None,
+    namespace=f"{OLLAMA_MODEL}/classification/v2",
+)
+# Обучается в lifespan (src/main.py)
+local_classifier = LocalClassifier(LOCAL_CLASSIFIER_THRESHOLD)
+
+ROUTE_SCHEMA = RoutePlan.model_json_schema()
+
+
+def classify_locally(prompt: str) -> str | None:
+    """Тег классификации из кэша или от уверенного локального классификатора."""
+    cached = classification_cache.get(prompt)
+    if cached is not None:
+        logger.info("✅ Категория из кэша: %s", cached)
+        return cached
+
+    if LOCAL_CLASSIFIER_ENABLED:
+        prediction = local_classifier.predict(prompt)
+        if prediction.label is not None:
+            local_classifications.labels("local").inc()
+            logger.info(
+                "✅ Категория определена локально: [%s] (%s, %.2f)",
+                prediction.label, prediction.source, prediction.confidence,
+            )
+            return f"[{prediction.label}]"
+        local_classifications.labels("llm").inc()
+    return None
+
+
+async def classify_with_llm(prompt: str) -> str:
+    user_prompt = token_budget.fit_user_prompt("classification", prompts.CLASSIFICATION.prefix, prompt)
+    classification_prompt = prompts.CLASSIFICATION.render(input=user_prompt)
+    response_data = await ollama.generate(classification_prompt, stage="classification")
+    classification_result = response_data.get("response", "").strip()
+    logger.info("✅ Категория определена: %s", classification_result)
+    if classification_result in CLASSIFICATION_TAGS:
+        classification_cache.set(prompt, classification_result)
+    return classification_result
+
+
+async def plan_route(prompt: str) -> RoutePlan | None:
+    """
+    Один вызов LLM вместо классификации и выбора эндпоинтов. Ответ
+    ограничен JSON схемой RoutePlan (параметр format Ollama) и проверяется;
+    невалидный ответ один раз отправляется модели на исправление.
+
+    Returns:
+        План или None, если и исправленный ответ не прошёл проверку
+    """
+    route_prompt = prompts.ROUTING.render(input=token_budget.fit_user_prompt("routing", prompts.ROUTING.prefix, prompt))
+    options = {"format": ROUTE_SCHEMA, "options": {"temperature": 0}}
+    raw = (await ollama.generate(route_prompt, stage="routing", **options)).get("response", "")
+    try:
+        plan = RoutePlan.model_validate_json(raw)
+        outcome = "ok"
+    except ValidationError as exc:
+        logger.warning("⚠️ Ответ маршрутизации не прошёл проверку, прошу исправить: %s", exc.errors()[0]["msg"])
+        repair_prompt = (
+            f"{route_prompt}\nТвой предыдущий ответ:\n{raw}\n"
+            f"Он не соответствует схеме: {exc.errors()[0]['msg']}. Верни исправленный JSON."
+        )
+        raw = (await ollama.generate(repair_prompt, stage="routing_repair", **options)).get("response", "")
+        try:
+            plan = RoutePlan.model_validate_json(raw)
+            outcome = "repaired"
+        except ValidationError:
+            route_plans.labels("failed").inc()
+            logger.warning("⚠️ Маршрутизация не удалась, перехожу к раздельным вызовам")
+            return None
+    route_plans.labels(outcome).inc()
+    classification_cache.set(prompt, f"[{plan.segment}]")
+    logger.info("✅ Маршрут: %s, эндпоинты: %s", plan.segment, plan.endpoints)
+    return plan
+
+
+def plan_by_rules(prompt: str) -> endpoint_planner.EndpointPlan | None:
+    started = time.perf_counter()
+    plan = endpoint_planner.plan(prompt)
+    rule_planner_duration.observe(time.perf_counter() - started)
+    rule_plans.labels("planned" if plan else "fallback").inc()
+    if plan is not None:
+        logger.info("✅ Эндпоинты выбраны правилами: %s", plan)
+    return plan
+
+
+def account_names(api_data: list[dict[str, Any]]) -> list[str]:
+    """Имена счетов из ответа /api/amount/ среди данных API."""
+    for item in api_data:
+        if item["endpoint"] == "/api/amount/":
+            return [amount["name"] for amount in item.get("data", {}).get("amounts", [])]
+    return []
+
+
+async def fetch_planned_data(prompt: str, authorization_header: str | None) -> list[dict[str, Any]] | None:
+    """
+    Данные API по плану endpoint_planner, без LLM.
+
+    Returns:
+        Данные эндпоинтов или None, если эндпоинты должна выбрать LLM
+    """
+    plan = plan_by_rules(prompt)
+    if plan is None:
+        return None
+
+    accounts_data: list[dict[str, Any]] = []
+    if plan.needs_accounts:
+        # Счёт не назван: берём счета пользователя, их ответ заодно идёт в контекст
+        accounts_data = await fetch_api_data(["/api/amount/"], authorization_header=authorization_header)
+    return await fetch_missing(plan.endpoints(account_names(accounts_data)), accounts_data, authorization_header)
+
 
-ollama_client = Client(host=OLLAMA_URL)
-logger = logging.getLogger(__name__)
+async def fetch_missing(
+    endpoints: list[str],
+    fetched: list[dict[str, Any]],
+    authorization_header: str | None,
+) -> list[dict[str, Any]]:
+    """Данные fetched плюс данные тех endpoints, которых среди них нет."""
+    known = {item["endpoint"] for item in fetched}
+    missing = [endpoint for endpoint in dict.fromkeys(endpoints) if endpoint not in known]
+    return fetched + await fetch_api_data(missing, authorization_header=authorization_header)
+
+
+# Одновременные спекулятивные вызовы LLM для выбора эндпоинтов
+_speculative_planning = asyncio.Semaphore(max(SPECULATIVE_LLM_LIMIT, 0))
+
+
+class FinSpeculation:
+    """
+    FIN ветка, запущенная до окончания LLM классификации: выбор эндпоинтов
+    (правилами или, в пределах SPECULATIVE_LLM_LIMIT, вызовом LLM) и
+    предвыборка дешёвых данных — баланса и операций за
+    SPECULATIVE_PREFETCH_DAYS дней. Если запрос не FIN, ветка отменяется.
+    """
+
+    def __init__(self, payload: PromptRequest, authorization_header: str | None, llm_planning: bool) -> None:
+        self.payload = payload
+        self.authorization_header = authorization_header
+        # Кто выбирает эндпоинты: rule_planning | llm_planning; None — никто
+        self.planner: str | None = None
+        self._finished = False
+        self.prefetch = asyncio.create_task(self._prefetch())
+        self.planning = asyncio.create_task(self._plan(llm_planning))
+
+    async def _prefetch(self) -> list[dict[str, Any]]:
+        accounts_data = await fetch_api_data(["/api/amount/"], authorization_header=self.authorization_header)
+        if SPECULATIVE_PREFETCH_DAYS <= 0:
+            return accounts_data
+        today = date.today()
+        recent = endpoint_planner.EndpointPlan(
+            ("history",),
+            from_date=today - timedelta(days=SPECULATIVE_PREFETCH_DAYS - 1),
+            to_date=today,
+        )
+        endpoints = recent.endpoints(account_names(accounts_data))
+        return await fetch_missing(endpoints, accounts_data, self.authorization_header)
+
+    async def _plan(self, llm_planning: bool) -> list[str] | None:
+        if RULE_PLANNER_ENABLED:
+            plan = plan_by_rules(self.payload.prompt)
+            if plan is not None:
+                self.planner = "rule_planning"
+                accounts = account_names(await asyncio.shield(self.prefetch)) if plan.needs_accounts else []
+                return plan.endpoints(accounts)
+        if not llm_planning:
+            return None
+        if _speculative_planning.locked():
+            speculations.labels("llm_planning", "skipped").inc()
+            return None
+        async with _speculative_planning:
+            self.planner = "llm_planning"
+            try:
+                requests_data = await get_requests(self.payload, stage="speculative_planning")
+            except OllamaOverloaded:
+                # Модель занята — эндпоинты выберет обычное планирование
+                self.planner = None
+                speculations.labels("llm_planning", "skipped").inc()
+                return None
+        if isinstance(requests_data, Response):
+            return None
+        return requests_data.get("endpoints", [])
+
+    async def collect(self, endpoints: list[str] | None) -> list[dict[str, Any]] | Response:
+        """
+        Данные для FIN ответа: предвыборка и данные эндпоинтов.
+
+        Args:
+            endpoints: Эндпоинты, уже выбранные маршрутизацией; None — берём
+                выбранные спекулятивно, а если их нет — спрашиваем LLM
+        """
+        if endpoints is None:
+            endpoints = await self.planning
+            if self.planner is not None:
+                speculations.labels(self.planner, "used" if endpoints is not None else "wasted").inc()
+        else:
+            await self._cancel(self.planning, self.planner)
+        self.planner = None
+        if endpoints is None:
+            requests_data = await get_requests(self.payload)
+            if isinstance(requests_data, Response):
+                return requests_data
+            endpoints = requests_data.get("endpoints", [])
+
+        prefetched = await self.prefetch
+        # Предвыборка пригодилась, только если выбран хотя бы один из её эндпоинтов
+        known = {item["endpoint"] for item in prefetched}
+        reused = any(endpoint in known for endpoint in endpoints)
+        speculations.labels("prefetch", "used" if reused else "wasted").inc()
+        self._finished = True
+        return await fetch_missing(endpoints, prefetched, self.authorization_header)
+
+    async def close(self) -> None:
+        """Отменяет незавершённую ветку; после collect ничего не делает."""
+        if self._finished:
+            return
+        self._finished = True
+        await self._cancel(self.planning, self.planner)
+        await self._cancel(self.prefetch, "prefetch")
+
+    @staticmethod
+    async def _cancel(task: asyncio.Task, branch: str | None) -> None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if branch is not None:
+            speculations.labels(branch, "wasted").inc()
+
+
+def overloaded_response(exc: OllamaOverloaded) -> Response:
+    return Response(
+        status_code=503,
+        content="Модель перегружена, повторите запрос позже.",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def stream_answer(messages: list[dict[str, str]], stage: str):
+    """Стрим ответа модели; пока запрос в очереди, клиент видит свою позицию."""
+    try:
+        async for content in ollama.chat_stream(messages, stage=stage, queue_notice=queue_notice):
+            yield content
+            await asyncio.sleep(0)
+    except OllamaOverloaded:
+        yield "\n\n⚠️ Модель перегружена, повторите запрос позже.\n"
 
 
 async def get_ai_message_mock(payload: PromptRequest):
-    async def stream_generator():
-        async with httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0)) as client:
-            async with client.stream(
-                "POST",
-                f"{OLLAMA_URL.rstrip('/')}/api/chat",
-                json={
-                    "model": "bambucha/saiga-llama3",
-                    "messages": [{"role": "user", "content": "Поздоровайся максимально вежливо и попроси пользователя ввести запрос"}],
-                    "stream": True,
-                },
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if not line.strip():
-                        continue
-                    try:
-                        chunk = json.loads(line)
-                        message = chunk.get("message", {})
-                        content = message.get("content")
-                        if content:
-                            yield content
-                            await asyncio.sleep(0)
-                    except json.JSONDecodeError as exc:
-                        logger.debug("JSON decode error: %s", exc)
-                        continue
+    try:
+        ollama.scheduler.check("mock")
+    except OllamaOverloaded as exc:
+        return overloaded_response(exc)
+
+    messages = [{"role": "user", "content": prompts.GREETING.render()}]
 
     return StreamingResponse(
-        stream_generator(),
+        stream_answer(messages, "mock"),
         media_type="text/plain; charset=utf-8",
         headers={
             "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -70,18 +327,31 @@ async def fetch_api_data(endpoints: list[str], authorization_header: str | None
 
     async with httpx.AsyncClient() as api_client:
         async def fetch_endpoint(endpoint: str):
-            try:
-                response = await api_client.get(
-                    f"{API_BASE_URL}{endpoint}",
-                    headers=headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return {"endpoint": endpoint, "data": response.json(), "success": True}
-            except Exception as exc:
-d                return {"endpoint": endpoint, "error": str(exc), "success": False}
-
-        results = await asyncio.gather(*(fetch_endpoint(endpoint) for endpoint in endpoints))
+            return await _backend_reads.do(
+                (endpoint, authorization_header),
+                lambda: request_endpoint(endpoint),
+            )
+
+        async def request_endpoint(endpoint: str):
+            # Спан запроса к backend; traceparent продолжает трассу на стороне backend
+            with start_span("backend GET", kind=CLIENT, **{"http.url": endpoint}) as span:
+                try:
+                    response = await api_client.get(
+                        f"{API_BASE_URL}{endpoint}",
+                        headers=inject_traceparent(dict(headers)),
+                        timeout=30.0
+                    )
+                    if span is not None:
+                        span.set_attribute("http.status_code", response.status_code)
+                    response.raise_for_status()
+                    return {"endpoint": endpoint, "data": response.json(), "success": True}
+                except Exception as exc:
+                    if span is not None:
+                        span.record_exception(exc)
+                    return {"endpoint": endpoint, "error": str(exc), "success": False}
+
+        with start_span("fetch_api_data", endpoints=len(endpoints)):
+            results = await asyncio.gather(*(fetch_endpoint(endpoint) for endpoint in endpoints))
 
     aggregated: list[dict[str, Any]] = []
     for result in results:
@@ -92,45 +362,31 @@ d                return {"endpoint": endpoint, "error": str(exc), "success": Fal
     return aggregated
 
 
-async def receive_final_prompt(all_api_data: list[dict[str, Any]], user_prompt: str) -> StreamingResponse:
-    final_prompt = f"""
-    Пользователь задал вопрос: {user_prompt}
+def build_final_prompt(all_api_data: list[dict[str, Any]], user_prompt: str) -> str:
+    """Финальный промпт: вопрос и данные API в пределах контекста модели."""
+    api_data = summarize_api_data(all_api_data, API_DATA_TOKEN_BUDGET)
+    parts = token_budget.fit("answer", [
+        PromptPart("system", prompts.ANSWER.prefix, 0),
+        # Запрос не вытесняет данные: не больше четверти контекста
+        PromptPart("user", user_prompt, 1, max_tokens=token_budget.available // 4),
+        PromptPart(
+            "api_data", dump(api_data), 2,
+            shrink=lambda tokens: dump(summarize_api_data(all_api_data, tokens)),
+        ),
+    ])
+    return prompts.ANSWER.render(api_data=parts["api_data"], question=parts["user"])
 
-    Для ответа на этот вопрос были выполнены следующие запросы к API:
-    {json.dumps(all_api_data, ensure_ascii=False, indent=2)}
 
-    Проанализируй все полученные данные и дай развернутый ответ на вопрос пользователя.
-    Если в некоторых запросах были ошибки, учти это при формировании ответа.
-    """
-
-    async def stream_generator():
-        async with httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0)) as client:
-            async with client.stream(
-                "POST",
-                f"{OLLAMA_URL.rstrip('/')}/api/chat",
-                json={
-                    "model": "bambucha/saiga-llama3",
-                    "messages": [{"role": "user", "content": final_prompt}],
-                    "stream": True,
-                },
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if not line.strip():
-                        continue
-                    try:
-                        chunk = json.loads(line)
-                        message = chunk.get("message", {})
-                        content = message.get("content")
-                        if content:
-                            yield content
-                            await asyncio.sleep(0)
-                    except json.JSONDecodeError as exc:
-                        logger.debug("JSON decode error: %s", exc)
-                        continue
+async def receive_final_prompt(all_api_data: list[dict[str, Any]], user_prompt: str) -> StreamingResponse:
+    # История транзакций — сводкой: размер промпта не зависит от её длины.
+    # На тысячах транзакций это десятки миллисекунд, поэтому не в event loop
+    final_prompt = await asyncio.to_thread(build_final_prompt, all_api_data, user_prompt)
+    # Заведомо не дождётся слота — 503 до начала стрима
+    ollama.scheduler.check("answer")
 
+    messages = [{"role": "user", "content": final_prompt}]
     return StreamingResponse(
-        stream_generator(),
+        stream_answer(messages, "answer"),
         media_type="text/plain; charset=utf-8",
         headers={
             "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -143,51 +399,22 @@ async def receive_final_prompt(all_api_data: list[dict[str, Any]], user_prompt:
     )
 
 
-async def get_requests(payload: PromptRequest) -> dict[str, list[str]] | Response:
-    system_prompt = f"""
-        Ты - интеллектуальный агент, который помогает пользователю, взаимодействуя с внешним API.
-        Твоя задача - анализировать запрос пользователя и решать, какие эндпоинты вызвать.
+async def get_requests(payload: PromptRequest, stage: str = "planning") -> dict[str, list[str]] | Response:
+    user_prompt = token_budget.fit_user_prompt(stage, prompts.PLANNING.prefix, payload.prompt)
+    system_prompt = prompts.PLANNING.render(input=user_prompt)
 
-        Доступные эндпоинты:
-        1. GET /api/amount/ - данные по счету (name, count)
-        2. GET /api/amount/transaction - данные об одной транзакции (amount_id, created_at, type, category, count)
-        3. GET /api/amount/history - история транзакций (amount_id, created_at, type, category, count)
+    try:
+        response_data = await ollama.generate(system_prompt, stage=stage)
+    except httpx.ReadTimeout:
+        return Response(status_code=504, content="Таймаут при запросе к модели. Попробуйте позже.")
+    except httpx.HTTPError as exc:
+        return Response(status_code=500, content=f"Ошибка при запросе к модели: {str(exc)}")
 
-        Эндпоинт history поддерживает параметры amount_id, from_date, to_date, type, category, count.
-        Пример: /api/amount/history?amount_id=1&from_date=2024-01-01&to_date=2024-01-31&type=income
-
-        Верни JSON строго в формате:
-        {{
-            "endpoints": ["/здесь_нужный_эндпоинт1", "/здесь_нужный_эндпоинт2", ...]
-        }}
-
-        Если вызов API не требуется, ответь как обычный помощник.
-
-        Текущий запрос пользователя: {payload.prompt}
-    """
-
-    async with httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0)) as client:
-        try:
-            response = await client.post(
-                f"{OLLAMA_URL.rstrip('/')}/api/generate",
-                json={
-                    "model": "bambucha/saiga-llama3",
-                    "prompt": system_prompt,
-                    "stream": False,
-                },
-            )
-            response.raise_for_status()
-            response_data = response.json()
+    action_data = parse_model_response(response_data.get("response", ""))
+    if action_data:
+        return action_data
 
-            action_data = parse_model_response(response_data.get("response", ""))
-            if action_data:
-                return action_data
-
-            return Response(status_code=200, content=response_data.get("response", ""))
-        except httpx.ReadTimeout:
-            return Response(status_code=504, content="Таймаут при запросе к модели. Попробуйте позже.")
-        except httpx.HTTPError as exc:
-            return Response(status_code=500, content=f"Ошибка при запросе к модели: {str(exc)}")
+    return Response(status_code=200, content=response_data.get("response", ""))
 
 
 async def get_ai_message(payload: PromptRequest, request: Request) -> Response | StreamingResponse:
@@ -199,58 +426,71 @@ async def get_ai_message(payload: PromptRequest, request: Request) -> Response |
     # Принимаем заголовок Authorization как есть
     authorization_header = request.headers.get("Authorization")
 
-    classification_prompt = f"""
-        ROLE: Ты — алгоритм классификации. Ты не даешь ответов на вопросы, а только классифицируешь их.
-        TASK: Проанализируй текст после "INPUT:" и верни ровно один из двух тегов: `[FIN]` или `[MRKT]`.
-        CRITERIA:
-        - `[FIN]` (Finance): Вопросы о денежных потоках, бюджете, прибыли, затратах, отчетности компании.
-        - `[MRKT]` (Market): Вопросы о конкурентах, доле рынка, трендах, потребителях, спросе.
-        OUTPUT_FORMAT: [FIN] или [MRKT]
-
-        INPUT: {payload.prompt}
-    """
-
-    async with httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0)) as client:
-        try:
-            response = await client.post(
-                f"{OLLAMA_URL.rstrip('/')}/api/generate",
-                json={
-                    "model": "bambucha/saiga-llama3",
-                    "prompt": classification_prompt,
-                    "stream": False,
-                },
-            )
-            response.raise_for_status()
-
-            classification_result = response.json().get("response", "").strip()
-            logger.info("✅ Категория определена: %s", classification_result)
 
-            if classification_result == "[FIN]":
+    speculation = None
+    try:
+        classification_result = classify_locally(payload.prompt)
+        endpoints = None
+        if classification_result is None and SPECULATIVE_EXECUTION:
+            # FIN ветка идёт параллельно с LLM классификацией; при объединённом
+            # вызове эндпоинты выбирает он, и LLM в ветке не нужна
+            speculation = FinSpeculation(payload, authorization_header, llm_planning=not ROUTE_SINGLE_CALL)
+        if classification_result is None and ROUTE_SINGLE_CALL:
+            # Сегмент и эндпоинты одним вызовом: данные FIN запрашиваются
+            # на одну генерацию раньше
+            plan = await plan_route(payload.prompt)
+            if plan is not None:
+                classification_result = f"[{plan.segment}]"
+                endpoints = plan.endpoints
+        if classification_result is None:
+            classification_result = await classify_with_llm(payload.prompt)
+
+        if classification_result == "[FIN]":
+            if speculation is not None:
+                api_data = await speculation.collect(endpoints)
+                if isinstance(api_data, Response):
+                    return api_data
+                return await receive_final_prompt(api_data, payload.prompt)
+            if endpoints is None and RULE_PLANNER_ENABLED:
+                api_data = await fetch_planned_data(payload.prompt, authorization_header)
+                if api_data is not None:
+                    return await receive_final_prompt(api_data, payload.prompt)
+            if endpoints is None:
                 requests_data = await get_requests(payload)
                 if isinstance(requests_data, Response):
                     return requests_data
                 endpoints = requests_data.get("endpoints", [])
-                api_data = await fetch_api_data(endpoints, authorization_header=authorization_header)
-                return await receive_final_prompt(api_data, payload.prompt)
-
-            if classification_result == "[MRKT]":
-                return await analyze_competitors(payload)
-
-            logger.warning("⚠️ Неизвестный результат классификации: %s", classification_result)
-            return Response(status_code=400, content=f"Не удалось определить категорию запроса: {classification_result}")
-        except httpx.ReadTimeout:
-            logger.error("⏱️ Таймаут при классификации запроса")
-            return Response(status_code=504, content="Таймаут при классификации запроса. Попробуйте позже.")
-        except httpx.HTTPError as exc:
-            logger.error("❌ Ошибка при классификации запроса: %s", exc)
-            return Response(status_code=500, content=f"Ошибка при классификации запроса: {str(exc)}")
-
-
-async def analyze_competitors(payload: PromptRequest) -> StreamingResponse:
+            api_data = await fetch_api_data(endpoints, authorization_header=authorization_header)
+            return await receive_final_prompt(api_data, payload.prompt)
+
+        if classification_result == "[MRKT]":
+            return await analyze_competitors(payload)
+
+        logger.warning("⚠️ Неизвестный результат классификации: %s", classification_result)
+        return Response(status_code=400, content=f"Не удалось определить категорию запроса: {classification_result}")
+    except OllamaOverloaded as exc:
+        logger.warning("🚦 Запрос отклонён: %s", exc)
+        return overloaded_response(exc)
+    except httpx.ReadTimeout:
+        logger.error("⏱️ Таймаут при классификации запроса")
+        return Response(status_code=504, content="Таймаут при классификации запроса. Попробуйте позже.")
+    except httpx.HTTPError as exc:
+        logger.error("❌ Ошибка при классификации запроса: %s", exc)
+        return Response(status_code=500, content=f"Ошибка при классификации запроса: {str(exc)}")
+    finally:
+        if speculation is not None:
+            await speculation.close()
+
+
+async def analyze_competitors(payload: PromptRequest) -> Response | StreamingResponse:
     """
     Запускает streaming-анализ конкурентов.
     """
     logger.info("📥 Получен запрос на анализ конкурентов: '%s...'", payload.prompt[:100])
+    try:
+        ollama.scheduler.check("search_queries")
+    except OllamaOverloaded as exc:
+        return overloaded_response(exc)
 
     async def generate():
         try:
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.api_summary import dump, estimate_tokens, summarize_api_data, summarize_history
+
+
+def make_history(days: int, per_day: int) -> dict:
+    transactions = [
+        {
+            "type": "income" if i % 5 == 0 else "outcome",
+            "category": f"category-{i % 12}",
+            "count": float(10 + i % 97),
+            "created_at": f"2025-{1 + day // 28:02d}-{1 + day % 28:02d}T12:00:00",
+        }
+        for day in range(days)
+        for i in range(per_day)
+    ]
+    return {"name": "main", "transaction": transactions, "limit_data": 1}
+
+
+def test_summary_totals_and_categories():
+    history = {"name": "main", "limit_data": 1, "transaction": [
+        {"type": "income", "category": "salary", "count": 1000.0, "created_at": "2025-03-01T09:00:00"},
+        {"type": "outcome", "category": "food", "count": 300.0, "created_at": "2025-03-02T10:00:00"},
+        {"type": "outcome", "category": "rent", "count": 500.0, "created_at": "2025-03-10T10:00:00"},
+    ]}
+
+    summary = summarize_history(history, top=1)
+
+    assert summary["totals"] == {"income": 1000.0, "outcome": 800.0, "net": 200.0}
+    assert summary["period"] == ["2025-03-01", "2025-03-10"]
+    assert summary["by_category"][1] == {"type": "outcome", "category": "rent", "total": 500.0, "count": 1, "share": 0.625}
+    assert summary["by_day"][0] == ["2025-03-01", 1000.0, 0.0]
+    assert summary["largest"][0]["count"] == 1000.0
+    assert summary["change"]["outcome"]["second_half"] == 500.0
+
+
+def test_prompt_size_does_not_grow_with_history():
+    sizes = []
+    for per_day in (5, 50):
+        api_data = [
+            {"endpoint": "/api/amount/", "data": {"amounts": [{"name": "main", "count": 1.0}]}},
+            {"endpoint": "/api/amount/history?name=main", "data": make_history(112, per_day)},
+        ]
+        result = summarize_api_data(api_data, token_budget=1500)
+        assert result[0] == api_data[0]
+        assert "summary" in result[1]
+        sizes.append((estimate_tokens(dump(api_data)), estimate_tokens(dump(result))))
+
+    # Сырые данные растут с историей, сводка остаётся в бюджете
+    assert sizes[1][0] > 5 * sizes[0][0]
+    assert sizes[1][0] > 1500
+    assert all(summary <= 1500 for _, summary in sizes)
@@ -0,0 +1,44 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.endpoint_planner import plan
+
+TODAY = date(2025, 3, 12)
+
+
+def test_relative_and_absolute_periods():
+    assert plan("Какие расходы за прошлый месяц?", TODAY).endpoints(["main"]) == [
+        "/api/amount/history?name=main&from_date=2025-02-01&to_date=2025-02-28&type=outcome"
+    ]
+    assert plan("Доходы с 1 по 15 число", TODAY).endpoints(["main"]) == [
+        "/api/amount/history?name=main&from_date=2025-03-01&to_date=2025-03-15&type=income"
+    ]
+    # Май ещё не наступил — прошлогодний
+    period = plan("Сколько мы потратили в мае?", TODAY)
+    assert (period.from_date, period.to_date) == (date(2024, 5, 1), date(2024, 5, 31))
+    period = plan("Выписка с 25 декабря по 5 января", TODAY)
+    assert (period.from_date, period.to_date, period.type) == (date(2024, 12, 25), date(2025, 1, 5), None)
+
+
+def test_balance_and_named_account():
+    balance = plan("Покажи баланс", TODAY)
+    assert not balance.needs_accounts
+    assert balance.endpoints() == ["/api/amount/"]
+
+    latest = plan('Последняя транзакция по счёту "Основной"', TODAY)
+    assert latest.account == "Основной"
+    assert latest.endpoints() == ["/api/amount/transaction?name=%D0%9E%D1%81%D0%BD%D0%BE%D0%B2%D0%BD%D0%BE%D0%B9"]
+
+
+def test_unparsed_prompts_fall_back_to_llm():
+    assert plan("Сравни расходы за май и июнь", TODAY) is None
+    assert plan("Расходы за 3 квартал", TODAY) is None
+    assert plan("Расходы больше 1000 рублей", TODAY) is None
+    assert plan("Баланс за прошлый месяц", TODAY) is None
+    assert plan("Расходы с 30 по 31 февраля", TODAY) is None
+    assert plan("Расходы с 15 по 5 число", TODAY) is None
+    assert plan("Расходы с 2025-03-15 по 2025-03-05", TODAY) is None
+    assert plan("Как дела?", TODAY) is None
@@ -0,0 +1,52 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.metrics import load_shed_requests
+from src.middleware import LoadShedMiddleware
+from src.shutdown import DrainMiddleware
+
+
+async def call(app, path):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "http", "method": "POST", "path": path}, receive, send)
+    return sent[0]
+
+
+def test_sheds_above_in_flight_limit_but_keeps_priority_paths():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            if scope["path"] == "/api/ai/message/":
+                await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        stack = DrainMiddleware(LoadShedMiddleware(
+            app, max_in_flight=1, max_loop_lag_ms=0, retry_after=7, priority_paths="/api/health_check/",
+        ))
+        shed_before = load_shed_requests.labels("in_flight").value
+        slow = asyncio.create_task(call(stack, "/api/ai/message/"))
+        await asyncio.sleep(0)
+
+        rejected = await call(stack, "/api/ai/message/")
+        assert rejected["status"] == 503
+        assert (b"retry-after", b"7") in rejected["headers"]
+        assert (await call(stack, "/api/health_check/"))["status"] == 200
+        assert load_shed_requests.labels("in_flight").value == shed_before + 1
+
+        release.set()
+        assert (await slow)["status"] == 200
+        assert (await call(stack, "/api/competitors/analyze/"))["status"] == 200
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.local_classifier import LocalClassifier, load_examples
+
+DATA = Path(__file__).parent.parent / "data" / "classification_prompts.jsonl"
+
+
+def test_confident_prompts_are_classified_locally():
+    classifier = LocalClassifier(threshold=0.85)
+    classifier.load(str(DATA))
+
+    assert classifier.predict("Сколько мы потратили на аренду в прошлом месяце?").label == "FIN"
+    assert classifier.predict("Кто главные конкуренты в доставке цветов?").label == "MRKT"
+
+
+def test_uncertain_and_mixed_prompts_go_to_llm():
+    classifier = LocalClassifier(threshold=0.85)
+    classifier.train(load_examples(str(DATA)))
+
+    assert classifier.predict("Привет").label is None
+    # Корни обоих классов: прибыль и конкуренты
+    assert classifier.predict("Какая прибыль у наших конкурентов?").label is None
+
+
+def test_untrained_classifier_uses_only_lexicon_rules():
+    classifier = LocalClassifier()
+    classifier.load("missing.jsonl")
+
+    assert not classifier.trained
+    assert classifier.predict("Покажи баланс счета").label == "FIN"
+    assert classifier.predict("Как дела?").label is None
+
+
+def test_rule_and_model_disagreement_goes_to_llm():
+    classifier = LocalClassifier(threshold=0.85)
+    classifier.train([("Какой бюджет на рекламу у соседей", "MRKT"), ("Сколько денег на счету", "FIN")])
+
+    prediction = classifier.predict("Какой бюджет на рекламу у соседей?")
+
+    assert prediction.label is None
+    assert prediction.source == "conflict"
+
+
+def test_lexicon_stems_match_word_starts():
+    classifier = LocalClassifier()
+
+    # «налог» внутри «аналог», «счет» внутри «расчет»
+    assert classifier.predict("Найди аналоги нашего продукта").label is None
+    assert classifier.predict("Покажи расчет доставки").label is None
+    assert classifier.predict("Сколько налогов мы заплатили?").label == "FIN"
@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.logger import parse_sample_rates
+
+
+def test_malformed_sample_rates_are_skipped():
+    rates = parse_sample_rates("src.views=0.01,src.services=abc,broken,src.utils=2")
+
+    assert rates == {"src.views": 0.01, "src.utils": 1.0}
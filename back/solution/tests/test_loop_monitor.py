@@ -0,0 +1,30 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.loop_monitor import LoopMonitor
+from src.metrics import event_loop_lag, event_loop_stalls
+
+
+def blocking_parse():
+    time.sleep(0.3)
+
+
+def test_monitor_reports_blocking_call():
+    async def scenario():
+        monitor = LoopMonitor(interval=0.02, threshold=0.05)
+        stalls_before = event_loop_stalls.labels().value
+        monitor.start()
+        await asyncio.sleep(0.1)
+        blocking_parse()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+        return monitor, stalls_before
+
+    monitor, stalls_before = asyncio.run(scenario())
+    assert "blocking_parse" in monitor.last_stall_stack
+    assert event_loop_stalls.labels().value == stalls_before + 1
+    assert sum(event_loop_lag.labels().counts) > 0
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.metrics import ollama_tokens
+from src.ollama_client import NDJSONParser, OllamaClient
+
+
+def test_parser_joins_lines_split_across_chunks():
+    parser = NDJSONParser()
+    line = json.dumps({"message": {"content": "привет"}}, ensure_ascii=False).encode()
+
+    assert list(parser.feed(line[:7])) == []
+    assert list(parser.feed(line[7:] + b"\n\nnot json\n" + b'{"done": tr')) == [{"message": {"content": "привет"}}]
+    assert list(parser.feed(b"ue}")) == []
+    assert list(parser.flush()) == [{"done": True}]
+
+
+def test_client_reuses_one_pool_for_generate_and_stream():
+    clients = set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        assert body["model"] == "test-model"
+        if request.url.path == "/api/generate":
+            return httpx.Response(200, json={"response": "[FIN]", "prompt_eval_count": 3, "eval_count": 2})
+        lines = [
+            {"message": {"content": "При"}, "done": False},
+            {"message": {"content": "вет"}, "done": False},
+            {"message": {"content": ""}, "done": True, "prompt_eval_count": 5, "eval_count": 7},
+        ]
+        return httpx.Response(200, content=b"".join(json.dumps(line).encode() + b"\n" for line in lines))
+
+    async def scenario():
+        client = OllamaClient("http://ollama:11434/", model="test-model", transport=httpx.MockTransport(handler))
+        data = await client.generate("prompt", stage="test_generate")
+        clients.add(id(client.client))
+        parts = [part async for part in client.chat_stream([{"role": "user", "content": "hi"}], stage="test_stream")]
+        clients.add(id(client.client))
+        await client.close()
+        return data, parts
+
+    data, parts = asyncio.run(scenario())
+
+    assert data["response"] == "[FIN]"
+    assert parts == ["При", "вет"]
+    assert len(clients) == 1
+    assert ollama_tokens.labels("test_generate", "completion").value == 2
+    assert ollama_tokens.labels("test_stream", "completion").value == 7
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.metrics import ollama_queue_cancellations, ollama_queue_rejections
+from src.ollama_client import OllamaClient
+from src.ollama_scheduler import OllamaOverloaded, OllamaScheduler, queue_notice
+
+
+def test_slots_go_to_stages_by_priority():
+    order = []
+
+    async def request(scheduler, stage):
+        async with scheduler.slot(stage) as ticket:
+            await ticket.wait()
+            order.append(stage)
+
+    async def scenario():
+        scheduler = OllamaScheduler(slots=1, max_wait=5)
+        running = scheduler.slot("answer")
+        tasks = [asyncio.create_task(request(scheduler, stage)) for stage in ("answer", "competitor_analysis", "classification")]
+        await asyncio.sleep(0.01)
+        assert scheduler.busy == 1 and len(scheduler._queue) == 3
+        scheduler.release(running)
+        await asyncio.gather(*tasks)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+
+    assert order == ["classification", "competitor_analysis", "answer"]
+    assert scheduler.busy == 0
+
+
+def test_cancelled_request_leaves_queue():
+    async def scenario():
+        scheduler = OllamaScheduler(slots=1, max_wait=5)
+        running = scheduler.slot("classification")
+        first = scheduler.slot("answer")
+        second = scheduler.slot("answer")
+        positions = []
+
+        async def watch():
+            async with second:
+                async for position in second.positions():
+                    positions.append(position)
+
+        async def wait_first():
+            async with first:
+                await first.wait()
+
+        watcher = asyncio.create_task(watch())
+        waiting = asyncio.create_task(wait_first())
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        scheduler.release(running)
+        await watcher
+        return scheduler, positions
+
+    scheduler, positions = asyncio.run(scenario())
+
+    assert positions == [2, 1]
+    assert scheduler.busy == 0 and not scheduler._queue
+    assert ollama_queue_cancellations.labels("answer").value >= 1
+
+
+def test_rejects_fast_over_wait_budget():
+    async def scenario():
+        scheduler = OllamaScheduler(slots=1, max_wait=5)
+        scheduler.slot("answer")
+        scheduler.hold_seconds = 4.0
+        # Первый в очереди дождётся за ~4 с, второй — уже нет
+        scheduler.slot("classification")
+        with pytest.raises(OllamaOverloaded) as rejected:
+            scheduler.slot("answer")
+        with pytest.raises(OllamaOverloaded):
+            scheduler.check("answer")
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+
+    assert rejected.reason == "wait_budget"
+    assert rejected.retry_after >= 1
+    assert ollama_queue_rejections.labels("answer", "wait_budget").value >= 2
+
+
+def test_wait_over_budget_times_out():
+    async def scenario():
+        scheduler = OllamaScheduler(slots=1, max_wait=0.05)
+        scheduler.slot("answer")
+        with pytest.raises(OllamaOverloaded) as rejected:
+            async with scheduler.slot("classification") as ticket:
+                await ticket.wait()
+        return scheduler, rejected.value
+
+    scheduler, rejected = asyncio.run(scenario())
+
+    assert rejected.reason == "timeout"
+    assert not scheduler._queue
+
+
+def test_stream_reports_queue_position():
+    def handler(request: httpx.Request) -> httpx.Response:
+        lines = [{"message": {"content": "Ответ"}, "done": False}, {"message": {"content": ""}, "done": True}]
+        return httpx.Response(200, content=b"".join(json.dumps(line).encode() + b"\n" for line in lines))
+
+    async def scenario():
+        scheduler = OllamaScheduler(slots=1, max_wait=5)
+        client = OllamaClient("http://ollama", transport=httpx.MockTransport(handler), scheduler=scheduler)
+        running = scheduler.slot("classification")
+        asyncio.get_running_loop().call_later(0.02, scheduler.release, running)
+        parts = [
+            part async for part in client.chat_stream([{"role": "user", "content": "hi"}], stage="answer", queue_notice=queue_notice)
+        ]
+        await client.close()
+        return parts
+
+    parts = asyncio.run(scenario())
+
+    assert parts == [queue_notice(1), "Ответ"]
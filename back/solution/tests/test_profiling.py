@@ -0,0 +1,49 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.profiling import ProfilingMiddleware
+
+
+def busy_parse():
+    started = time.perf_counter()
+    while time.perf_counter() - started < 0.1:
+        sum(range(1000))
+
+
+async def call(app, headers):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "http", "method": "POST", "path": "/api/ai/message/", "headers": headers}, receive, send)
+    return dict(sent[0]["headers"])
+
+
+def test_profiles_only_requests_with_valid_token(tmp_path):
+    async def app(scope, receive, send):
+        busy_parse()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = ProfilingMiddleware(app)
+    middleware.directory = str(tmp_path)
+    middleware.token = b"secret"
+
+    assert b"x-profile-file" not in asyncio.run(call(middleware, []))
+    assert b"x-profile-file" not in asyncio.run(call(middleware, [(b"x-profile", b"wrong")]))
+    assert list(tmp_path.iterdir()) == []
+
+    headers = asyncio.run(call(middleware, [(b"x-profile", b"secret")]))
+    profile = tmp_path / headers[b"x-profile-file"].decode()
+    assert profile.name.startswith(time.strftime("%Y%m%d-")) and "-POST-api_ai_message-" in profile.name
+    lines = profile.read_text(encoding="utf-8").splitlines()
+    assert any(";busy_parse (" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
@@ -0,0 +1,51 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.metrics import cache_requests
+from src.prompt_cache import PromptCache, normalize_prompt
+
+
+def test_normalized_prompts_share_an_entry():
+    cache = PromptCache("test_normalized", maxsize=8, ttl=60)
+    cache.set("Какая  ПРИБЫЛЬ за месяц? ", "[FIN]")
+
+    assert normalize_prompt(" какая прибыль\tза месяц?") == "какая прибыль за месяц?"
+    assert cache.get("какая прибыль за месяц?") == "[FIN]"
+    assert cache.get("какие конкуренты?") is None
+    assert cache_requests.labels("test_normalized", "hit").value == 1
+    assert cache_requests.labels("test_normalized", "miss").value == 1
+
+
+def test_lru_eviction_and_ttl():
+    cache = PromptCache("test_lru", maxsize=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    expiring = PromptCache("test_ttl", maxsize=2, ttl=0.01)
+    expiring.set("a", "1")
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+    assert len(expiring) == 0
+
+
+def test_entries_survive_restart_with_persistent_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PromptCache("test_persist", maxsize=8, ttl=60, path=path, namespace="model/v1")
+    cache.set("Прибыль за месяц", "[FIN]")
+    cache.close()
+
+    reopened = PromptCache("test_persist", maxsize=8, ttl=60, path=path, namespace="model/v1")
+    assert reopened.get("прибыль за месяц") == "[FIN]"
+    reopened.close()
+
+    other_prompt_version = PromptCache("test_persist", maxsize=8, ttl=60, path=path, namespace="model/v2")
+    assert other_prompt_version.get("прибыль за месяц") is None
+    other_prompt_version.close()
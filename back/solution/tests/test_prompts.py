@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import prompts
+from src.views import build_final_prompt
+
+
+def test_user_data_goes_after_prefix():
+    for template in prompts.PROMPTS.values():
+        values = {"input": "{x}", "api_data": "{}", "question": "вопрос", "pages": "", "request": "запрос"}
+        assert template.render(**values).startswith(template.prefix)
+
+
+def test_final_prompt_prefix_does_not_depend_on_question():
+    first = build_final_prompt([{"endpoint": "/api/amount/", "data": {"count": 1}}], "сколько денег?")
+    second = build_final_prompt([], "какие расходы в марте?")
+
+    assert first.startswith(prompts.ANSWER.prefix)
+    assert second.startswith(prompts.ANSWER.prefix)
+    assert first.endswith("сколько денег?")
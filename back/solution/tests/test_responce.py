@@ -9,6 +9,6 @@ from src.main import app
 client = TestClient(app)
 
 def test_health_check():
-    response = client.get("/health_check/")
+    response = client.get("/api/health_check/")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
\ No newline at end of file
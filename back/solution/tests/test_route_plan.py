@@ -0,0 +1,59 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import views
+from src.metrics import route_plans
+from src.ollama_client import OllamaClient
+
+
+def fake_ollama(monkeypatch, answers):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        return httpx.Response(200, json={"response": answers[len(requests) - 1]})
+
+    monkeypatch.setattr(views, "ollama", OllamaClient("http://ollama", transport=httpx.MockTransport(handler)))
+    return requests
+
+
+def test_single_call_returns_segment_and_endpoints(monkeypatch):
+    requests = fake_ollama(monkeypatch, ['{"segment": "FIN", "endpoints": ["/api/amount/history?name=test"]}'])
+
+    plan = asyncio.run(views.plan_route("Сколько я потратил в мае? #route-ok"))
+
+    assert plan.segment == "FIN"
+    assert plan.endpoints == ["/api/amount/history?name=test"]
+    assert requests[0]["format"]["properties"]["segment"]["enum"] == ["FIN", "MRKT"]
+    assert views.classification_cache.get("Сколько я потратил в мае? #route-ok") == "[FIN]"
+
+
+def test_invalid_answer_is_repaired_once(monkeypatch):
+    repaired_before = route_plans.labels("repaired").value
+    requests = fake_ollama(monkeypatch, [
+        '{"segment": "FINANCE"}',
+        '{"segment": "MRKT", "endpoints": []}',
+    ])
+
+    plan = asyncio.run(views.plan_route("Кто конкуренты? #route-repair"))
+
+    assert plan.segment == "MRKT"
+    assert len(requests) == 2
+    assert '{"segment": "FINANCE"}' in requests[1]["prompt"]
+    assert route_plans.labels("repaired").value == repaired_before + 1
+
+
+def test_foreign_endpoints_fail_validation(monkeypatch):
+    fake_ollama(monkeypatch, [
+        '{"segment": "FIN", "endpoints": ["http://evil.example/steal"]}',
+        '{"segment": "FIN", "endpoints": ["/admin/users"]}',
+    ])
+
+    assert asyncio.run(views.plan_route("Баланс? #route-fail")) is None
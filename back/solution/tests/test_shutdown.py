@@ -0,0 +1,64 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.metrics import shutdown_drain_duration, shutdown_requests
+from src.shutdown import DrainMiddleware, DrainState, finish_drain
+
+
+async def call(middleware, sent):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware({"type": "http", "method": "GET", "path": "/"}, receive, send)
+
+
+def test_drain_waits_for_stream_and_rejects_new_requests():
+    async def scenario():
+        state = DrainState()
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"chunk", "more_body": True})
+            await release.wait()
+            await send({"type": "http.response.body", "body": b""})
+
+        middleware = DrainMiddleware(app, state)
+        streamed, rejected = [], []
+        stream = asyncio.create_task(call(middleware, streamed))
+        await asyncio.sleep(0)
+        assert state.in_flight == 1
+
+        drained_before = sum(shutdown_drain_duration.labels("drained").counts)
+        rejected_before = shutdown_requests.labels("rejected").value
+        drain = asyncio.create_task(finish_drain(1.0, state))
+        await asyncio.sleep(0)
+        await call(middleware, rejected)
+        assert rejected[0]["status"] == 503
+        assert (b"connection", b"close") in rejected[0]["headers"]
+        assert shutdown_requests.labels("rejected").value == rejected_before + 1
+        assert not drain.done()
+
+        release.set()
+        assert await drain is True
+        await stream
+        assert streamed[-1]["body"] == b""
+        assert state.in_flight == 0
+        assert sum(shutdown_drain_duration.labels("drained").counts) == drained_before + 1
+
+    asyncio.run(scenario())
+
+
+def test_drain_timeout():
+    async def scenario():
+        state = DrainState()
+        state.enter()
+        assert await finish_drain(0.01, state) is False
+
+    asyncio.run(scenario())
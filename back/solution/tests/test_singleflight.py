@@ -0,0 +1,109 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.metrics import coalesced_requests
+from src.singleflight import SingleFlight
+
+
+def test_identical_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight("test_share")
+        calls = 0
+        release = asyncio.Event()
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"value": calls}
+
+        tasks = [asyncio.create_task(flight.do("key", load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls == 1
+        assert all(result is results[0] for result in results)
+        assert coalesced_requests.labels("test_share").value == 4
+
+        # Завершённый вызов не кэшируется
+        assert await flight.do("key", load) == {"value": 2}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    async def scenario():
+        flight = SingleFlight("test_cancel")
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return "done"
+
+        owner = asyncio.create_task(flight.do("key", load))
+        follower = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await owner == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+
+    asyncio.run(scenario())
+
+
+def test_work_is_cancelled_when_every_waiter_is_gone():
+    async def scenario():
+        flight = SingleFlight("test_cancel_all")
+        cancelled = asyncio.Event()
+
+        async def load():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.create_task(flight.do("key", load)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1.0)
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter_and_forget_starts_fresh_call():
+    async def scenario():
+        flight = SingleFlight("test_error")
+        release = asyncio.Event()
+
+        async def fail():
+            await release.wait()
+            raise ValueError("backend down")
+
+        async def load():
+            return "fresh"
+
+        tasks = [asyncio.create_task(flight.do("key", fail)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        # После записи новый запрос не присоединяется к старому вызову
+        flight.forget()
+        assert await flight.do("key", load) == "fresh"
+
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(scenario())
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import views
+from src.metrics import speculations
+from src.ollama_client import OllamaClient
+from src.schemas import PromptRequest
+
+
+def fake_backend(monkeypatch):
+    fetched = []
+
+    async def fetch_api_data(endpoints, authorization_header=None):
+        fetched.extend(endpoints)
+        await asyncio.sleep(0)
+        if endpoints == ["/api/amount/"]:
+            return [{"endpoint": "/api/amount/", "data": {"amounts": [{"name": "main", "count": 10.0}]}}]
+        return [{"endpoint": endpoint, "data": {}} for endpoint in endpoints]
+
+    monkeypatch.setattr(views, "fetch_api_data", fetch_api_data)
+    return fetched
+
+
+def fake_ollama(monkeypatch, delay: float, answer: str):
+    started = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        started.append(json.loads(request.content))
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={"response": answer})
+
+    monkeypatch.setattr(views, "ollama", OllamaClient("http://ollama", transport=httpx.MockTransport(handler)))
+    return started
+
+
+def test_fin_answer_uses_speculative_plan_and_prefetch(monkeypatch):
+    fetched = fake_backend(monkeypatch)
+    fake_ollama(monkeypatch, 0.01, '{"endpoints": ["/api/amount/transaction?name=main"]}')
+    used_before = speculations.labels("llm_planning", "used").value
+    prefetch_wasted_before = speculations.labels("prefetch", "wasted").value
+
+    async def scenario():
+        speculation = views.FinSpeculation(PromptRequest(prompt="Что с деньгами?"), None, llm_planning=True)
+        try:
+            return await speculation.collect(None)
+        finally:
+            await speculation.close()
+
+    api_data = asyncio.run(scenario())
+
+    endpoints = [item["endpoint"] for item in api_data]
+    assert endpoints[0] == "/api/amount/"
+    assert endpoints[1].startswith("/api/amount/history?name=main&from_date=")
+    assert endpoints[2] == "/api/amount/transaction?name=main"
+    # Предвыборка не запрашивается повторно
+    assert len(fetched) == len(set(fetched)) == 3
+    assert speculations.labels("llm_planning", "used").value == used_before + 1
+    # Ни один выбранный эндпоинт не был среди предвыбранных
+    assert speculations.labels("prefetch", "wasted").value == prefetch_wasted_before + 1
+
+
+def test_prefetch_counts_as_used_when_its_endpoint_is_chosen(monkeypatch):
+    fetched = fake_backend(monkeypatch)
+    fake_ollama(monkeypatch, 0.01, '{"endpoints": []}')
+    used_before = speculations.labels("prefetch", "used").value
+
+    async def scenario():
+        speculation = views.FinSpeculation(PromptRequest(prompt="Что с деньгами?"), None, llm_planning=False)
+        try:
+            return await speculation.collect(["/api/amount/"])
+        finally:
+            await speculation.close()
+
+    api_data = asyncio.run(scenario())
+
+    assert api_data[0]["endpoint"] == "/api/amount/"
+    assert fetched.count("/api/amount/") == 1
+    assert speculations.labels("prefetch", "used").value == used_before + 1
+
+
+def test_non_fin_request_cancels_the_branch(monkeypatch):
+    fake_backend(monkeypatch)
+    started = fake_ollama(monkeypatch, 10, '{"endpoints": []}')
+    wasted_before = speculations.labels("llm_planning", "wasted").value
+
+    async def scenario():
+        speculation = views.FinSpeculation(PromptRequest(prompt="Что с деньгами?"), None, llm_planning=True)
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(speculation.close(), timeout=1)
+        return speculation
+
+    speculation = asyncio.run(scenario())
+
+    assert len(started) == 1
+    assert speculation.planning.cancelled()
+    assert speculations.labels("llm_planning", "wasted").value == wasted_before + 1
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.token_budget import PromptPart, TokenBudget, estimate_tokens
+
+
+def test_parts_fit_by_priority():
+    budget = TokenBudget(context_tokens=1100, reserve_tokens=100)
+    system = "инструкция " * 60
+    parts = budget.fit("test", [
+        PromptPart("pages", "страница " * 1000, 2),
+        PromptPart("system", system, 0),
+        PromptPart("user", "вопрос " * 30, 1),
+    ])
+
+    assert parts["system"] == system
+    assert parts["user"] == "вопрос " * 30
+    assert parts["pages"].endswith(" …")
+    assert sum(estimate_tokens(text) for text in parts.values()) <= budget.available
+
+
+def test_equal_priority_parts_share_the_rest():
+    budget = TokenBudget(context_tokens=600, reserve_tokens=0)
+    parts = budget.fit("test", [
+        PromptPart("short", "a" * 90, 1),
+        PromptPart("long1", "b " * 1000, 1),
+        PromptPart("long2", "c " * 1000, 1),
+    ])
+
+    # Короткая часть целиком, остальное — двум длинным поровну
+    assert parts["short"] == "a" * 90
+    assert abs(estimate_tokens(parts["long1"]) - estimate_tokens(parts["long2"])) <= 1
+    assert estimate_tokens(parts["long1"]) > 250
+
+
+def test_shrink_is_preferred_to_truncation():
+    budget = TokenBudget(context_tokens=100, reserve_tokens=0)
+    parts = budget.fit("test", [PromptPart("data", "x" * 3000, 0, shrink=lambda tokens: "сводка")])
+
+    assert parts["data"] == "сводка"
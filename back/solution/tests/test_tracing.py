@@ -0,0 +1,58 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from src import tracing
+from src.main import app
+
+client = TestClient(app)
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+PARENT_ID = "b7ad6b7169203331"
+
+
+def read_spans(path):
+    tracing.shutdown_tracing()
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_parse_traceparent():
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00") == (TRACE_ID, PARENT_ID, False)
+    assert tracing.parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert tracing.parse_traceparent("00-xyz-abc-01") is None
+    assert tracing.parse_traceparent(None) is None
+
+
+def test_nested_spans_and_injection(tmp_path):
+    trace_file = tmp_path / "traces.jsonl"
+    tracing.configure_tracing("file", str(trace_file))
+    with tracing.start_span("request") as root:
+        with tracing.start_span("ollama.planning", kind=tracing.CLIENT) as child:
+            headers = tracing.inject_traceparent({})
+    assert tracing.current_span() is None
+    assert headers["traceparent"] == f"00-{root.trace_id}-{child.span_id}-01"
+
+    spans = {span["name"]: span for span in read_spans(trace_file)}
+    assert spans["ollama.planning"]["parent_id"] == spans["request"]["span_id"]
+    assert spans["ollama.planning"]["trace_id"] == spans["request"]["trace_id"]
+
+
+def test_middleware_continues_incoming_trace(tmp_path):
+    trace_file = tmp_path / "traces.jsonl"
+    tracing.configure_tracing("file", str(trace_file))
+    response = client.get("/api/health_check/", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    assert response.status_code == 200
+
+    [span] = read_spans(trace_file)
+    assert span["trace_id"] == TRACE_ID
+    assert span["parent_id"] == PARENT_ID
+    assert span["name"] == "GET /api/health_check/"
+    assert span["attributes"]["http.status_code"] == 200
+
+    report = tracing.summarize_traces(trace_file.read_text(encoding="utf-8").splitlines())
+    assert f"trace {TRACE_ID}" in report
+    assert "[solution] GET /api/health_check/" in report
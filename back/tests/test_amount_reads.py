@@ -0,0 +1,57 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core import session as db_session
+from app.schemas.amount import AmountListResponse, AmountResponse
+from app.services.amount import AmountService
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.info = {"primary": "primary", "replica": "replica"}
+
+
+class FakeRepo:
+    """Возвращает баланс с того узла, куда ушло бы чтение сессии."""
+
+    def __init__(self, release: asyncio.Event) -> None:
+        self.session = FakeSession()
+        self.release = release
+        self.calls = 0
+
+    async def get_all_amounts(self):
+        self.calls += 1
+        target = db_session.read_target(self.session)
+        await self.release.wait()
+        return [AmountResponse(name="main", count=100.0 if target == "primary" else 0.0)]
+
+
+def test_recent_writer_does_not_join_replica_flight():
+    async def read_as(user, repo):
+        db_session.set_session_user(user)
+        result: AmountListResponse = await AmountService(repo).get_all_amounts()
+        return result.amounts[0].count
+
+    async def writer(repo):
+        db_session.set_session_user("writer")
+        db_session._mark_write()
+        return await read_as("writer", repo)
+
+    async def scenario():
+        release = asyncio.Event()
+        reader_repo, writer_repo = FakeRepo(release), FakeRepo(release)
+        reader = asyncio.create_task(read_as("reader", reader_repo))
+        await asyncio.sleep(0)
+        written = asyncio.create_task(writer(writer_repo))
+        await asyncio.sleep(0)
+        release.set()
+        return await reader, await written, reader_repo.calls, writer_repo.calls
+
+    reader_count, writer_count, reader_calls, writer_calls = asyncio.run(scenario())
+
+    assert reader_count == 0.0
+    assert writer_count == 100.0
+    assert (reader_calls, writer_calls) == (1, 1)
@@ -0,0 +1,42 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.session import LazySession
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.info = {}
+        self.closed = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def test_session_is_created_on_first_use():
+    created = []
+
+    def factory():
+        created.append(FakeSession())
+        return created[-1]
+
+    session = LazySession(factory, primary_only=True)
+    assert not session.started and not created
+
+    assert session.info == {"primary_only": True}
+    asyncio.run(session.close())
+
+    assert len(created) == 1 and created[0].closed
+
+
+def test_unused_session_is_never_created():
+    def factory():
+        raise AssertionError("session must not be created")
+
+    session = LazySession(factory)
+    asyncio.run(session.close())
+
+    assert not session.started
@@ -0,0 +1,48 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core import middleware
+from app.core.middleware import LoggingMiddleware
+
+
+class FakeLogger:
+    def __init__(self) -> None:
+        self.records = []
+
+    def sample(self) -> bool:
+        return True
+
+    def isEnabledFor(self, level) -> bool:
+        return True
+
+    def info(self, message, *args, **kwargs) -> None:
+        self.records.append(message % args)
+
+    error = info
+
+
+def test_streaming_body_is_passed_through_and_counted(monkeypatch):
+    fake_logger = FakeLogger()
+    monkeypatch.setattr(middleware, "logger", fake_logger)
+    received = []
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"first", "more_body": True})
+        # Первый кусок уже у клиента: middleware не буферизует тело
+        assert received[-1]["body"] == b"first"
+        await send({"type": "http.response.body", "body": b"second", "more_body": False})
+
+    async def send(message):
+        received.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/stream", "query_string": b"a=1", "client": ("1.2.3.4", 1)}
+    asyncio.run(LoggingMiddleware(streaming_app)(scope, None, send))
+
+    assert [message.get("body") for message in received] == [None, b"first", b"second"]
+    assert fake_logger.records[0] == "Request started: GET /stream?a=1 from 1.2.3.4"
+    assert fake_logger.records[1].startswith("Request completed: GET /stream - Status: 200")
+    assert "Bytes: 11" in fake_logger.records[1]
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core import logger as app_logger
+from app.core.metrics import REGISTRY
+
+
+def test_dropped_log_records_are_a_counter(monkeypatch):
+    monkeypatch.setattr(app_logger, "_queue_handler", SimpleNamespace(dropped=3))
+
+    lines = REGISTRY.render().splitlines()
+
+    assert "# TYPE log_records_dropped_total counter" in lines
+    assert "log_records_dropped_total 3" in lines
@@ -0,0 +1,52 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core import pool as app_pool
+
+
+class FakeConnection:
+    def __init__(self, error) -> None:
+        self.error = error
+
+    async def __aenter__(self):
+        if self.error is not None:
+            raise self.error
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    async def exec_driver_sql(self, statement, execution_options=None) -> None:
+        return None
+
+
+class FakeEngine:
+    def __init__(self, checked_in: int, error=None) -> None:
+        self.sync_engine = SimpleNamespace(pool=SimpleNamespace(checkedin=lambda: checked_in))
+        self.error = error
+        self.connects = 0
+
+    def connect(self) -> FakeConnection:
+        self.connects += 1
+        return FakeConnection(self.error)
+
+
+def test_busy_pool_is_not_checked():
+    engine = FakeEngine(checked_in=0)
+
+    assert asyncio.run(app_pool.check_pool_liveness(engine, "busy"))
+    assert engine.connects == 0
+
+
+def test_liveness_result_is_recorded():
+    alive = FakeEngine(checked_in=1)
+    broken = FakeEngine(checked_in=1, error=ConnectionResetError("connection reset"))
+
+    assert asyncio.run(app_pool.check_pool_liveness(alive, "alive"))
+    assert not asyncio.run(app_pool.check_pool_liveness(broken, "broken"))
+    assert app_pool._liveness["alive"]["ok"] is True
+    assert app_pool._liveness["broken"]["ok"] is False
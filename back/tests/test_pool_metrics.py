@@ -0,0 +1,64 @@
+import asyncio
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.metrics import (
+    InstrumentedAsyncAdaptedQueuePool,
+    db_pool_checkout_failures,
+    db_pool_checkouts,
+    db_pool_wait,
+    pool_recent_wait,
+)
+
+
+def make_pool(name, creator=lambda: sqlite3.connect(":memory:")):
+    return InstrumentedAsyncAdaptedQueuePool(creator, pool_size=1, max_overflow=0, timeout=0.01, logging_name=name)
+
+
+def checkout(pool):
+    async def scenario():
+        return await greenlet_spawn(pool.connect)
+
+    return asyncio.run(scenario())
+
+
+def test_successful_checkout_is_counted():
+    connection = checkout(make_pool("ok"))
+
+    assert db_pool_checkouts.labels("ok").value == 1
+    assert sum(db_pool_wait.labels("ok").counts) == 1
+    assert "ok" in pool_recent_wait
+    connection.invalidate()
+
+
+def test_pool_timeout_is_a_failure_not_a_checkout():
+    pool = make_pool("busy")
+    held = checkout(pool)
+
+    with pytest.raises(exc.TimeoutError):
+        checkout(pool)
+
+    assert db_pool_checkouts.labels("busy").value == 1
+    assert sum(db_pool_wait.labels("busy").counts) == 1
+    assert db_pool_checkout_failures.labels("busy", "timeout").value == 1
+    held.invalidate()
+
+
+def test_connect_error_is_a_failure_not_a_checkout():
+    def refuse():
+        raise sqlite3.OperationalError("connection refused")
+
+    with pytest.raises(sqlite3.OperationalError):
+        checkout(make_pool("down", refuse))
+
+    assert db_pool_checkouts.labels("down").value == 0
+    assert sum(db_pool_wait.labels("down").counts) == 0
+    assert "down" not in pool_recent_wait
+    assert db_pool_checkout_failures.labels("down", "error").value == 1
@@ -0,0 +1,55 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core import query_log
+from app.core.query_log import EXPLAIN_INTERVAL, QueryStats, normalize_sql, parameter_shape
+
+
+def test_normalize_sql_collapses_literals_and_lists():
+    assert normalize_sql("SELECT *  FROM amounts\n WHERE name = 'main' AND count > 10.5") == (
+        "SELECT * FROM amounts WHERE name = ? AND count > ?"
+    )
+    assert normalize_sql("SELECT * FROM amounts WHERE id IN ($1::INTEGER, $2::INTEGER, $3::INTEGER)") == (
+        "SELECT * FROM amounts WHERE id IN (...)"
+    )
+    assert normalize_sql("SELECT * FROM amounts WHERE id IN ($1, $2) AND name = $3") == (
+        normalize_sql("SELECT * FROM amounts WHERE id IN ($1, $2, $3, $4) AND name = $5")
+    )
+
+
+def test_parameter_shape_hides_values():
+    assert parameter_shape({"name": "main", "count": 1}) == "{name: str, count: int}"
+    assert parameter_shape(("main", datetime(2024, 1, 1))) == "(str, datetime)"
+    assert parameter_shape([(1, "a"), (2, "b")], executemany=True) == "2 x (int, str)"
+
+
+def test_query_stats_stop_tracking_new_statements_at_max_entries():
+    stats = QueryStats(max_entries=2)
+    stats.record("main", "SELECT ?", 0.1, 1, None)
+    stats.record("main", "SELECT ? FROM amounts", 0.1, 1, None)
+
+    assert stats.record("main", "SELECT ? FROM transactions", 0.1, 1, None) is None
+    assert stats.record("main", "SELECT ?", 0.2, 1, "AmountRepository.get").calls == 2
+    assert stats.untracked_calls == 1
+    assert len(stats.snapshot()) == 2
+
+
+def test_explain_only_for_select_at_most_once_per_interval():
+    stats = QueryStats()
+    select = stats.record("main", "SELECT * FROM amounts", 1.0, 1, None)
+    locking = stats.record("main", "SELECT * FROM amounts WHERE id = $? FOR UPDATE", 1.0, 1, None)
+    update = stats.record("main", "UPDATE amounts SET count = $?", 1.0, 1, None)
+
+    assert query_log._should_explain(select, select.statement, False, 1.0)
+    assert not query_log._should_explain(select, select.statement, False, 1.0)
+    select.last_plan_at -= EXPLAIN_INTERVAL + 1
+    assert query_log._should_explain(select, select.statement, False, 1.0)
+
+    assert not query_log._should_explain(locking, locking.statement, False, 1.0)
+    assert not query_log._should_explain(update, update.statement, False, 1.0)
+    select.last_plan_at = 0.0
+    assert not query_log._should_explain(select, select.statement, True, 1.0)
+    assert not query_log._should_explain(select, select.statement, False, 0.0)
@@ -0,0 +1,106 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select, update
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core import session as db_session
+from app.core.session import ReadYourWritesMiddleware, RoutingSession, read_target
+
+primary = create_engine("sqlite://")
+replica = create_engine("sqlite://")
+amounts = Table("amounts", MetaData(), Column("id", Integer, primary_key=True), Column("count", Integer))
+
+
+def routing_session(**info) -> RoutingSession:
+    return RoutingSession(info={"primary": primary, "replica": replica, **info})
+
+
+def in_window(until: float, check):
+    """Вызывает check с окном read-your-writes клиента до until."""
+    token = db_session._request_writes.set({"until": until, "wrote": False})
+    try:
+        return check()
+    finally:
+        db_session._request_writes.reset(token)
+
+
+def test_writes_and_locking_reads_go_to_primary():
+    assert routing_session().get_bind(clause=update(amounts).values(count=1)) is primary
+    assert routing_session().get_bind(clause=select(amounts).with_for_update()) is primary
+
+
+def test_reads_go_to_replica():
+    session = routing_session()
+
+    assert session.get_bind(clause=select(amounts)) is replica
+    assert read_target(session) == "replica"
+
+
+def test_reads_after_write_stay_on_primary():
+    session = routing_session()
+    session.get_bind(clause=update(amounts).values(count=1))
+
+    assert session.get_bind(clause=select(amounts)) is primary
+    assert read_target(session) == "primary"
+
+
+def test_non_get_requests_are_primary_only():
+    async def open_session(method):
+        sessions = db_session.get_session(SimpleNamespace(method=method))
+        session = await anext(sessions)
+        info = dict(session.info)
+        await sessions.aclose()
+        return info
+
+    assert asyncio.run(open_session("POST"))["primary_only"] is True
+    assert "primary_only" not in asyncio.run(open_session("GET"))
+
+
+def test_read_in_sticky_window_goes_to_primary():
+    read = lambda: routing_session().get_bind(clause=select(amounts))
+
+    assert in_window(time.time() + 5, read) is primary
+    assert in_window(time.time() - 1, read) is replica
+
+
+def test_without_replica_everything_goes_to_primary():
+    session = RoutingSession(bind=primary, info={"primary": primary, "replica": None})
+
+    assert session.get_bind(clause=update(amounts).values(count=1)) is primary
+    assert session.get_bind(clause=select(amounts)) is primary
+    assert read_target(session) == "primary"
+
+
+def test_sticky_window_travels_in_cookie():
+    async def write_app(scope, receive, send):
+        db_session._mark_write()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def read_app(scope, receive, send):
+        reads.append(db_session._recently_wrote())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def call(app, headers):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+        await ReadYourWritesMiddleware(app)(scope, None, send)
+        return dict(messages[0]["headers"])
+
+    reads = []
+    written = asyncio.run(call(write_app, []))
+    cookie = written[b"set-cookie"].split(b";")[0]
+    asyncio.run(call(read_app, [(b"cookie", b"theme=dark; " + cookie)]))
+    asyncio.run(call(read_app, []))
+    asyncio.run(call(read_app, [(b"cookie", b"rw_until=" + str(time.time() - 1).encode())]))
+
+    assert cookie.startswith(b"rw_until=")
+    assert reads == [True, False, False]